@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AdministrasiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'administrasi'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,109 @@
+from collections import Counter
+
+from django.db import models, transaction
+from django.db.models import F, ProtectedError, RestrictedError
+from django.utils import timezone
+
+from diginus.model_versions import bump_version
+
+from .models import ChangeLog, RenderJob
+from .signals import CHANGE_LOG_MODELS
+
+# Operasi massal untuk API admin: satu transaksi, delete()/update() berbasis
+# himpunan id, dan hasil per id ('deleted', 'updated', 'not_found', 'protected').
+
+
+def parse_ids(values):
+    """Daftar id unik (urutan dipertahankan); ValueError jika ada yang bukan angka"""
+    return list(dict.fromkeys(int(value) for value in values))
+
+
+def protected_ids(model, ids):
+    """
+    Id `model` yang masih direferensikan relasi PROTECT/RESTRICT langsung,
+    misal DocumentType yang masih dipakai surat. Hasil: {id: nama model pengguna}.
+    """
+    blocked = {}
+    for rel in model._meta.related_objects:
+        if rel.on_delete not in (models.PROTECT, models.RESTRICT):
+            continue
+        refs = (
+            rel.related_model._base_manager.filter(**{f'{rel.field.name}__in': ids})
+            .values_list(rel.field.attname, flat=True).distinct()
+        )
+        for pk in refs:
+            blocked.setdefault(pk, str(rel.related_model._meta.verbose_name))
+    return blocked
+
+
+def bulk_delete(model, ids):
+    """
+    Hapus banyak baris `model` dalam satu transaksi. Id yang terlindungi
+    PROTECT dilewati (tidak menggagalkan yang lain). Mengembalikan
+    (hasil per id, jumlah baris terhapus per model termasuk cascade).
+    """
+    results, blocked, counts = {}, {}, Counter()
+    with transaction.atomic():
+        existing = set(model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        blocked.update(protected_ids(model, existing))
+        deletable = sorted(existing - set(blocked))
+        if deletable:
+            try:
+                with transaction.atomic():
+                    counts.update(model.objects.filter(pk__in=deletable).delete()[1])
+            except (ProtectedError, RestrictedError):
+                # Proteksi lebih dalam (lewat cascade): ulangi per id dengan savepoint
+                for pk in deletable:
+                    try:
+                        with transaction.atomic():
+                            counts.update(model.objects.filter(pk=pk).delete()[1])
+                    except (ProtectedError, RestrictedError) as e:
+                        blocked[pk] = ', '.join(sorted({str(obj._meta.verbose_name) for obj in e.args[1]}))
+
+    for pk in ids:
+        if pk not in existing:
+            results[pk] = {'status': 'not_found'}
+        elif pk in blocked:
+            results[pk] = {'status': 'protected', 'message': f"Masih dipakai oleh {blocked[pk]}"}
+        else:
+            results[pk] = {'status': 'deleted'}
+    return results, {label: count for label, count in counts.items() if count}
+
+
+def clean_values(model, allowed, data):
+    """
+    Ambil dan validasi field yang boleh diubah massal dari `data`.
+    Melempar ValidationError jika nilainya tidak valid.
+    """
+    values = {}
+    for name in allowed:
+        if name in data:
+            field = model._meta.get_field(name)
+            value = data[name]
+            values[name] = None if value == '' and field.null else field.clean(value, None)
+    return values
+
+
+def bulk_update(model, ids, values):
+    """
+    Satu UPDATE untuk semua id. Karena queryset.update() tidak memicu signal,
+    auto_now, versi optimistic (kolom `version`), ChangeLog, antrean render,
+    dan versi ETag diperbarui di sini.
+    """
+    values = dict(values)
+    for field in model._meta.concrete_fields:
+        if getattr(field, 'auto_now', False):
+            values[field.name] = timezone.now()
+    if any(field.name == 'version' for field in model._meta.concrete_fields):
+        values['version'] = F('version') + 1
+
+    with transaction.atomic():
+        rows = model.objects.filter(pk__in=ids)
+        rows.update(**values)
+        updated = set(rows.values_list('pk', flat=True))
+        if model in CHANGE_LOG_MODELS:
+            ChangeLog.record(model, sorted(updated))
+        # Perihal, customer, atau template ikut menentukan isi arsip surat
+        RenderJob.enqueue_related(model, updated)
+        bump_version(model)
+    return {pk: {'status': 'updated' if pk in updated else 'not_found'} for pk in ids}
@@ -0,0 +1,221 @@
+import base64
+import json
+from collections import namedtuple
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+from django.http import JsonResponse
+
+from diginus.model_versions import cached_count
+
+from .models import ChangeLog
+
+# Definisi satu kolom tabel: `field` = path ORM yang diproyeksikan,
+# `lookup` = lookup untuk pencarian (global maupun per kolom).
+Column = namedtuple('Column', 'field searchable orderable lookup', defaults=(True, True, 'icontains'))
+
+
+class DataTable:
+    """
+    Mesin server-side untuk protokol DataTables (draw/start/length/search/order).
+    Hanya kolom yang terdaftar di `columns` yang bisa dicari dan di-sort,
+    dan hanya field-nya (plus `extra_fields`) yang diambil dari database.
+
+    Tanpa parameter `draw` (klien lama), seluruh baris dikembalikan
+    dalam format {'data': [...]} seperti sebelumnya. Dengan `since=<cursor>`
+    hanya baris yang berubah sejak cursor itu yang dikirim (lihat delta_payload).
+
+    Halaman dalam bisa diambil dengan keyset: klien yang mengirim `keyset=1`
+    menerima token `next`, dan `after=<token>` menggantikan OFFSET `start`.
+    `cache_total=True` menyimpan jumlah total (tanpa filter) per versi model.
+    """
+
+    def __init__(self, queryset, columns, default_order=('-id',), extra_fields=(), max_length=100, cache_total=False):
+        self.queryset = queryset
+        self.columns = columns
+        self.default_order = list(default_order)
+        self.extra_fields = list(extra_fields)
+        self.max_length = max_length
+        self.cache_total = cache_total
+
+    # --- Parsing parameter DataTables ---
+    @staticmethod
+    def _int(params, key, default):
+        try:
+            return int(params.get(key, default))
+        except (TypeError, ValueError):
+            return default
+
+    def _request_columns(self, params):
+        """Map indeks kolom DataTables -> (nama, Column) yang diizinkan"""
+        result, i = {}, 0
+        while f'columns[{i}][data]' in params:
+            name = params.get(f'columns[{i}][data]')
+            if name in self.columns:
+                result[i] = (name, self.columns[name])
+            i += 1
+        return result
+
+    def filter(self, queryset, params):
+        """Terapkan pencarian global dan per kolom; kembalikan (queryset, ada_filter)"""
+        request_columns = self._request_columns(params)
+        applied = False
+
+        search = params.get('search[value]', '').strip()
+        if search:
+            condition = Q()
+            for column in self.columns.values():
+                if column.searchable:
+                    condition |= Q(**{f'{column.field}__{column.lookup}': search})
+            queryset = queryset.filter(condition)
+            applied = True
+
+        # Filter per kolom: columns[i][search][value]
+        for i, (name, column) in request_columns.items():
+            value = params.get(f'columns[{i}][search][value]', '').strip()
+            if value and column.searchable:
+                queryset = queryset.filter(**{f'{column.field}__{column.lookup}': value})
+                applied = True
+        return queryset, applied
+
+    def ordering(self, params):
+        request_columns = self._request_columns(params)
+        order, j = [], 0
+        while f'order[{j}][column]' in params:
+            entry = request_columns.get(self._int(params, f'order[{j}][column]', -1))
+            if entry and entry[1].orderable:
+                prefix = '-' if params.get(f'order[{j}][dir]') == 'desc' else ''
+                order.append(f'{prefix}{entry[1].field}')
+            j += 1
+        # Kolom default ikut di belakang agar urutan antar-halaman stabil
+        return order + [o for o in self.default_order if o.lstrip('-') not in {x.lstrip('-') for x in order}]
+
+    def filtered(self, params):
+        """Queryset dengan pencarian dan urutan yang sama seperti tabel, tanpa paging (untuk ekspor)"""
+        queryset, _ = self.filter(self.queryset, params)
+        return queryset.order_by(*self.ordering(params))
+
+    def fields(self):
+        fields = self.extra_fields + [c.field for c in self.columns.values()]
+        return list(dict.fromkeys(fields))
+
+    # --- Keyset pagination ---
+    def _nullable(self, path):
+        model, field = self.queryset.model, None
+        for name in path.split(LOOKUP_SEP):
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                return True
+            model = field.related_model or model
+        return field.null
+
+    def keyset_order(self, order):
+        """Urutan yang bisa dipakai keyset (ditutup pk agar unik), atau None jika ada kolom nullable"""
+        pk = self.queryset.model._meta.pk.name
+        if not any(o.lstrip('-') in (pk, 'pk') for o in order):
+            order = order + [pk]
+        if any(self._nullable(o.lstrip('-')) for o in order if o.lstrip('-') != 'pk'):
+            return None
+        return order
+
+    @staticmethod
+    def encode_key(order, row):
+        values = [row[o.lstrip('-')] for o in order]
+        # isoformat() penuh: DjangoJSONEncoder memotong mikrodetik, kunci jadi tidak presisi
+        raw = json.dumps([order, values], default=lambda v: v.isoformat() if hasattr(v, 'isoformat') else str(v), separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def after(queryset, order, token):
+        """
+        Baris setelah token `next` untuk urutan yang sama:
+        (a > x) OR (a = x AND b > y) OR ... sesuai arah tiap kolom.
+        """
+        try:
+            token_order, values = json.loads(base64.urlsafe_b64decode(token.encode()))
+        except (ValueError, TypeError):
+            raise ValueError("Token halaman tidak valid")
+        if token_order != order:
+            raise ValueError("Token halaman berasal dari urutan lain")
+
+        condition, equal = Q(), {}
+        for spec, value in zip(order, values):
+            field = spec.lstrip('-')
+            condition |= Q(**equal, **{f"{field}__{'lt' if spec.startswith('-') else 'gt'}": value})
+            equal[field] = value
+        return queryset.filter(condition)
+
+    # --- Eksekusi ---
+    def response(self, request, serialize=None):
+        params = request.POST if request.method == 'POST' else request.GET
+        serialize = serialize or (lambda row: row)
+
+        if 'since' in params:
+            try:
+                since = int(params['since'])
+            except ValueError:
+                return JsonResponse({'status': 'error', 'message': 'Cursor tidak valid'}, status=400)
+            return JsonResponse(delta_payload(self.queryset, since, self.fields(), serialize))
+
+        # Cursor dibaca sebelum data: perubahan yang menyusul ikut di delta berikutnya
+        cursor = ChangeLog.cursor()
+        if 'draw' not in params:
+            rows = self.queryset.order_by(*self.default_order).values(*self.fields())
+            return JsonResponse({'data': [serialize(r) for r in rows], 'cursor': cursor})
+
+        draw = self._int(params, 'draw', 1)
+        start = max(self._int(params, 'start', 0), 0)
+        length = self._int(params, 'length', 10)
+        length = self.max_length if length < 0 else min(max(length, 1), self.max_length)
+
+        records_total = cached_count(self.queryset) if self.cache_total else self.queryset.count()
+        filtered, applied = self.filter(self.queryset, params)
+        # Tanpa filter, jumlah hasil filter sama dengan total: hemat satu COUNT
+        records_filtered = filtered.count() if applied else records_total
+
+        order = self.ordering(params)
+        keyset = self.keyset_order(order) if ('keyset' in params or 'after' in params) else None
+        if keyset:
+            order = keyset
+        rows = filtered.order_by(*order).values(*dict.fromkeys(self.fields() + [o.lstrip('-') for o in order]))
+        if keyset and params.get('after'):
+            try:
+                rows = list(self.after(rows, order, params['after'])[:length])
+            except ValueError as e:
+                return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+        else:
+            rows = list(rows[start:start + length])
+
+        payload = {
+            'draw': draw,
+            'recordsTotal': records_total,
+            'recordsFiltered': records_filtered,
+            'data': [serialize(r) for r in rows],
+            'cursor': cursor,
+        }
+        if keyset:
+            payload['next'] = self.encode_key(order, rows[-1]) if len(rows) == length else None
+        return JsonResponse(payload)
+
+
+def delta_payload(queryset, since, fields, serialize):
+    """
+    Delta-sync: baris `queryset` yang berubah sejak cursor `since` plus daftar
+    id yang harus dibuang klien (terhapus, atau kini tidak lolos filter
+    queryset). `reset` berarti cursor terlalu lama dan klien harus memuat ulang penuh.
+    """
+    changes = ChangeLog.changes_since(queryset.model, since)
+    if changes is None:
+        return {'reset': True, 'cursor': ChangeLog.cursor(), 'data': [], 'deleted': []}
+
+    cursor, changed, removed = changes
+    rows = list(queryset.filter(pk__in=changed).values(*dict.fromkeys(['id', *fields]))) if changed else []
+    visible = {row['id'] for row in rows}
+    return {
+        'reset': False,
+        'cursor': cursor,
+        'data': [serialize(row) for row in rows],
+        'deleted': removed + [pk for pk in changed if pk not in visible],
+    }
@@ -0,0 +1,227 @@
+import re
+import zlib
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+from django.db.models import Count
+
+from diginus.model_versions import bump_version
+
+from .bulk import bulk_update
+from .models import ChangeLog, Correspondence, Customer, Invoice
+from .reconciliation import COMPANY_PREFIXES, WORD_RE
+
+# Deteksi customer ganda. Tidak membandingkan semua pasangan (O(n²)):
+# customer dikelompokkan per kunci blocking (nomor WA, email, perusahaan,
+# awalan nama), hanya pasangan di dalam satu blok yang dinilai, dan
+# kemiripan nama dihitung sekaligus untuk semua pasangan dengan numpy
+# (Jaccard trigram atas bitmask 256 bit per nama).
+
+DEFAULT_THRESHOLD = 0.8
+# Blok sebesar ini terlalu umum untuk berarti (misal awalan nama "muha|")
+MAX_BLOCK = 200
+MASK_BYTES = 32
+PAIR_BATCH = 200_000
+
+HONORIFICS = {'bapak', 'bpk', 'pak', 'ibu', 'bu', 'sdr', 'sdri', 'h', 'hj', 'dr', 'ir'}
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint16)
+
+
+def normalize_phone(value):
+    """'0812-3456 789', '+62 812...' dan '812...' menjadi '62812...'"""
+    digits = re.sub(r'\D', '', value or '')
+    if digits.startswith('0'):
+        return '62' + digits[1:]
+    if digits.startswith('8'):
+        return '62' + digits
+    return digits
+
+
+def normalize_name(value):
+    words = WORD_RE.findall((value or '').lower())
+    return ' '.join(w for w in words if w not in COMPANY_PREFIXES and w not in HONORIFICS)
+
+
+def _trigram_mask(text):
+    mask = np.zeros(MASK_BYTES * 8, dtype=bool)
+    padded = f'  {text} '
+    for i in range(len(padded) - 2):
+        mask[zlib.crc32(padded[i:i + 3].encode()) % mask.size] = True
+    return np.packbits(mask)
+
+
+def _masks(values):
+    return np.stack([_trigram_mask(v) for v in values]) if len(values) else np.zeros((0, MASK_BYTES), np.uint8)
+
+
+def _jaccard(masks, left, right):
+    """Kemiripan trigram untuk setiap pasangan (left[k], right[k]) sekaligus"""
+    a, b = masks[left], masks[right]
+    inter = POPCOUNT[a & b].sum(axis=1)
+    union = POPCOUNT[a | b].sum(axis=1)
+    return np.divide(inter, union, out=np.zeros(len(left)), where=union > 0)
+
+
+def load_customers():
+    rows = Customer.objects.order_by('id').values_list('id', 'name', 'company', 'email', 'whatsapp')
+    frame = pd.DataFrame(list(rows.iterator(chunk_size=5000)), columns=['id', 'name', 'company', 'email', 'whatsapp'])
+    frame['name_key'] = frame['name'].map(normalize_name)
+    frame['company_key'] = frame['company'].map(normalize_name)
+    frame['phone'] = frame['whatsapp'].map(normalize_phone)
+    frame['email'] = frame['email'].str.strip().str.lower()
+    return frame
+
+
+def _block_keys(frame):
+    """Pasangan (indeks baris, kunci blok); satu customer bisa masuk beberapa blok"""
+    words = frame['name_key'].str.split()
+    name_block = words.str[0].str.slice(0, 4) + '|' + words.str[-1].str.slice(0, 1)
+    keys = [
+        'p:' + frame['phone'].where(frame['phone'].str.len() >= 9),
+        'e:' + frame['email'].where(frame['email'] != ''),
+        'c:' + frame['company_key'].where(frame['company_key'].str.len() >= 3),
+        'n:' + name_block,
+    ]
+    blocks = pd.concat([pd.DataFrame({'row': np.arange(len(frame)), 'key': key}) for key in keys])
+    return blocks.dropna().drop_duplicates()
+
+
+def candidate_pairs(frame, max_block=MAX_BLOCK):
+    """Semua pasangan unik (kiri < kanan) yang berbagi minimal satu blok"""
+    blocks = _block_keys(frame)
+    sizes = blocks.groupby('key')['row'].transform('size')
+    skipped = blocks.loc[sizes > max_block, 'key'].nunique()
+    blocks = blocks[(sizes >= 2) & (sizes <= max_block)].sort_values(['key', 'row'])
+
+    # Setelah diurutkan, anggota satu blok bersebelahan: potong di setiap pergantian kunci
+    keys = pd.factorize(blocks['key'])[0]
+    left, right, triu = [], [], {}
+    for members in np.split(blocks['row'].to_numpy(), np.flatnonzero(np.diff(keys)) + 1):
+        size = len(members)
+        if size < 2:
+            continue
+        if size not in triu:
+            triu[size] = np.triu_indices(size, k=1)
+        i, j = triu[size]
+        left.append(members[i])
+        right.append(members[j])
+    if not left:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64), skipped
+
+    codes = np.unique(np.concatenate(left).astype(np.int64) * len(frame) + np.concatenate(right))
+    return codes // len(frame), codes % len(frame), skipped
+
+
+def score_pairs(frame, left, right):
+    """
+    Skor 0..1 per pasangan. Nama dan perusahaan dibandingkan per trigram;
+    nomor WA atau email yang sama menaikkan skor, tapi tidak cukup sendirian
+    (satu nomor kantor bisa dipakai beberapa orang).
+    """
+    name_masks, company_masks = _masks(frame['name_key'].tolist()), _masks(frame['company_key'].tolist())
+    phone, email = frame['phone'].to_numpy(), frame['email'].to_numpy()
+    has_company = (frame['company_key'] != '').to_numpy()
+
+    scores = []
+    for start in range(0, len(left), PAIR_BATCH):
+        l, r = left[start:start + PAIR_BATCH], right[start:start + PAIR_BATCH]
+        name_sim = _jaccard(name_masks, l, r)
+        both_company = has_company[l] & has_company[r]
+        company_sim = np.where(both_company, _jaccard(company_masks, l, r), 0.0)
+        contact = ((phone[l] == phone[r]) & (phone[l] != '')) | ((email[l] == email[r]) & (email[l] != ''))
+
+        identity = np.where(both_company, 0.6 * name_sim + 0.4 * company_sim, name_sim)
+        scores.append(np.where(contact, 0.5 + 0.5 * np.maximum(name_sim, company_sim), identity))
+    return np.concatenate(scores) if scores else np.zeros(0)
+
+
+def _components(pairs):
+    """Union-find: pasangan cocok -> kelompok id yang saling terhubung"""
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in pairs:
+        parent[find(a)] = find(b)
+    groups = {}
+    for x in parent:
+        groups.setdefault(find(x), []).append(x)
+    return list(groups.values())
+
+
+def find_duplicates(threshold=DEFAULT_THRESHOLD, max_block=MAX_BLOCK):
+    """
+    Kelompok calon customer ganda, terurut dari skor tertinggi. Tiap kelompok
+    menyarankan `primary_id`: customer dengan surat terbanyak (seri: yang terlama).
+    Mengembalikan (kelompok, statistik).
+    """
+    frame = load_customers()
+    left, right, skipped = candidate_pairs(frame, max_block)
+    scores = score_pairs(frame, left, right)
+    matched = scores >= threshold
+    ids = frame['id'].to_numpy()
+    pairs = list(zip(ids[left[matched]].tolist(), ids[right[matched]].tolist()))
+    best = {}
+    for (a, b), score in zip(pairs, scores[matched].tolist()):
+        best[a] = max(best.get(a, 0), score)
+        best[b] = max(best.get(b, 0), score)
+
+    components = _components(pairs)
+    member_ids = [pk for group in components for pk in group]
+    doc_counts = dict(
+        Customer.objects.filter(pk__in=member_ids).annotate(n=Count('documents')).values_list('id', 'n')
+    ) if member_ids else {}
+    rows = frame.set_index('id').loc[member_ids, ['name', 'company', 'email', 'whatsapp']].to_dict('index')
+
+    groups = []
+    for group in components:
+        group.sort(key=lambda pk: (-doc_counts.get(pk, 0), pk))
+        groups.append({
+            'primary_id': group[0],
+            'score': round(max(best[pk] for pk in group), 3),
+            'customers': [{'id': pk, **rows[pk], 'document_count': doc_counts.get(pk, 0)} for pk in group],
+        })
+    groups.sort(key=lambda g: (-g['score'], g['primary_id']))
+    stats = {'customers': len(frame), 'pairs': len(left), 'skipped_blocks': int(skipped), 'groups': len(groups)}
+    return groups, stats
+
+
+def merge_customers(primary_id, duplicate_ids):
+    """
+    Gabungkan `duplicate_ids` ke `primary_id`: semua surat dipindah dengan satu
+    UPDATE, field kosong di customer utama diisi dari duplikat, lalu duplikat dihapus.
+    """
+    duplicate_ids = [pk for pk in dict.fromkeys(duplicate_ids) if pk != primary_id]
+    with transaction.atomic():
+        # Tulis dulu (ambil lock) sebelum membaca
+        ChangeLog.record(Customer, [primary_id])
+        customers = Customer.objects.in_bulk([primary_id, *duplicate_ids])
+        missing = [pk for pk in [primary_id, *duplicate_ids] if pk not in customers]
+        if missing:
+            raise ValueError(f"Customer tidak ditemukan: {', '.join(map(str, missing))}")
+
+        doc_ids = list(Correspondence.objects.filter(customer_id__in=duplicate_ids).values_list('id', flat=True))
+        if doc_ids:
+            bulk_update(Correspondence, doc_ids, {'customer': customers[primary_id]})
+            ChangeLog.record(Invoice, Invoice.objects.filter(correspondence_id__in=doc_ids).values_list('id', flat=True))
+            bump_version(Invoice)
+
+        primary = customers[primary_id]
+        filled = []
+        for field in ('company', 'address'):
+            if not getattr(primary, field):
+                value = next((getattr(customers[pk], field) for pk in duplicate_ids if getattr(customers[pk], field)), '')
+                if value:
+                    setattr(primary, field, value)
+                    filled.append(field)
+        if filled:
+            primary.save(update_fields=filled)
+
+        Customer.objects.filter(pk__in=duplicate_ids).delete()
+    return {'moved_documents': len(doc_ids), 'deleted_customers': len(duplicate_ids), 'filled_fields': filled}
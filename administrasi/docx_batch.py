@@ -0,0 +1,89 @@
+import io
+import os
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+from .docx_engine import render_docx
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process pool bersama untuk render DOCX (dibuat sekali per worker web)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = getattr(settings, 'DOCX_RENDER_WORKERS', None) or os.cpu_count() or 1
+            _pool = ProcessPoolExecutor(max_workers=workers)
+        return _pool
+
+
+def _render_job(job):
+    # Dijalankan di proses anak; tiap proses punya cache template sendiri
+    # dan berbagi cache disk, jadi template cukup dikompilasi sekali
+    filename, template_path, context = job
+    return filename, render_docx(template_path, context)
+
+
+def correspondence_jobs(docs):
+    """Ubah daftar Correspondence menjadi job render (nama file, template, nilai)"""
+    for doc in docs:
+        yield (
+            f"{doc.doc_type.code}_{doc.number}.docx",
+            doc.doc_type.template_docx.path,
+            doc.template_context(),
+        )
+
+
+def render_many(jobs, executor=None, window=None):
+    """
+    Render job di process pool dan hasilkan (nama file, bytes) sesuai urutan.
+    Jumlah job yang berjalan dibatasi `window` agar hasil yang belum
+    dikirim tidak menumpuk di memori.
+    """
+    executor = executor or get_pool()
+    window = window or 2 * (getattr(executor, '_max_workers', None) or 1)
+    pending = deque()
+    for job in jobs:
+        pending.append(executor.submit(_render_job, job))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Target tulis ZipFile yang tidak bisa di-seek; isinya diambil per potongan"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_zip(files):
+    """
+    Bangun arsip ZIP dari iterable (nama file, bytes) sambil mengirimkannya
+    per file. DOCX sudah terkompresi, jadi isinya disimpan tanpa kompresi ulang.
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        for filename, content in files:
+            archive.writestr(filename, content)
+            yield buffer.pop()
+    yield buffer.pop()
@@ -0,0 +1,179 @@
+import hashlib
+import io
+import os
+import pickle
+import re
+import threading
+import zipfile
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from docx import Document
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+
+# Placeholder di template Word, contoh: {{number}} atau {{ subject }}
+PLACEHOLDER_RE = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+
+# Bagian XML yang berisi teks surat (isi, header, footer, catatan kaki)
+TEXT_PART_RE = re.compile(r'^word/(document|header\d*|footer\d*|footnotes|endnotes)\.xml$')
+
+# Dinaikkan jika format hasil kompilasi berubah agar cache lama di disk diabaikan
+ENGINE_VERSION = 1
+
+_memory_cache = {}
+_cache_lock = threading.Lock()
+
+
+class CompiledTemplate:
+    """
+    Template DOCX yang sudah di-parse sekali.
+    XML yang memuat placeholder disimpan sebagai potongan teks statis dan
+    nama placeholder berselang-seling, sehingga render cukup menyambung
+    string lalu menulis ulang zip tanpa parsing python-docx lagi.
+    """
+
+    def __init__(self, entries):
+        # entries: list (ZipInfo, bytes) untuk part statis, atau (ZipInfo, segments)
+        self.entries = entries
+        self.placeholders = {
+            chunk[0] for _, content in entries if isinstance(content, list)
+            for i, chunk in enumerate(content) if i % 2 == 1
+        }
+
+    def render(self, context):
+        """Substitusi nilai ke placeholder dan kembalikan isi file .docx (bytes)"""
+        values = {key: _xml_value(value) for key, value in context.items()}
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as out:
+            for info, content in self.entries:
+                if isinstance(content, list):
+                    content = ''.join(
+                        chunk if i % 2 == 0 else values.get(chunk[0], chunk[1])
+                        for i, chunk in enumerate(content)
+                    ).encode('utf-8')
+                out.writestr(info, content)
+        return buffer.getvalue()
+
+
+def _xml_value(value):
+    # Baris baru di nilai dijadikan line break Word di dalam run yang sama
+    text = escape(str(value))
+    return text.replace('\n', '</w:t><w:br/><w:t xml:space="preserve">')
+
+
+def _merge_split_placeholders(paragraph):
+    """
+    Word sering memecah "{{number}}" ke beberapa run (misal karena cek ejaan).
+    Satukan setiap placeholder ke run tempat ia dimulai; formatting run itu
+    yang dipakai, run lain tidak disentuh.
+    """
+    while True:
+        runs = paragraph.runs
+        texts = [run.text for run in runs]
+        bounds, offset = [], 0
+        for text in texts:
+            bounds.append((offset, offset + len(text)))
+            offset += len(text)
+
+        for match in PLACEHOLDER_RE.finditer(''.join(texts)):
+            first = next(i for i, (s, e) in enumerate(bounds) if s <= match.start() < e)
+            last = next(i for i, (s, e) in enumerate(bounds) if s < match.end() <= e)
+            if first != last:
+                break
+        else:
+            return
+
+        runs[first].text = texts[first][:match.start() - bounds[first][0]] + match.group(0)
+        for i in range(first + 1, last):
+            runs[i].text = ''
+        runs[last].text = texts[last][match.end() - bounds[last][0]:]
+
+
+def _split_segments(xml):
+    # Hasil: [teks, (nama, teks_asli), teks, (nama, teks_asli), ..., teks]
+    segments, pos = [], 0
+    for match in PLACEHOLDER_RE.finditer(xml):
+        segments.append(xml[pos:match.start()])
+        segments.append((match.group(1), match.group(0)))
+        pos = match.end()
+    segments.append(xml[pos:])
+    return segments
+
+
+def compile_template(path):
+    """Parse template sekali, satukan placeholder yang terpecah, lalu indeks posisinya"""
+    document = Document(path)
+    for part in document.part.package.parts:
+        if TEXT_PART_RE.match(part.partname.lstrip('/')) and hasattr(part, 'element'):
+            for p in part.element.iter(qn('w:p')):
+                if '{' in ''.join(t.text or '' for t in p.iter(qn('w:t'))):
+                    _merge_split_placeholders(Paragraph(p, None))
+
+    normalized = io.BytesIO()
+    document.save(normalized)
+
+    entries = []
+    with zipfile.ZipFile(normalized) as source:
+        for info in source.infolist():
+            content = source.read(info)
+            if TEXT_PART_RE.match(info.filename):
+                xml = content.decode('utf-8')
+                if PLACEHOLDER_RE.search(xml):
+                    content = _split_segments(xml)
+            entries.append((info, content))
+    return CompiledTemplate(entries)
+
+
+def _disk_cache_path(path, mtime_ns):
+    cache_dir = getattr(settings, 'DOCX_TEMPLATE_CACHE_DIR', None)
+    if not cache_dir:
+        return None
+    key = hashlib.sha1(f"{ENGINE_VERSION}:{os.path.abspath(path)}:{mtime_ns}".encode()).hexdigest()
+    return os.path.join(cache_dir, f"{key}.pickle")
+
+
+def get_template(path):
+    """
+    Ambil template terkompilasi dari cache memori, lalu cache disk, baru
+    kompilasi ulang. Kunci cache = path + mtime, jadi upload template baru
+    otomatis membuat entri baru.
+    """
+    mtime_ns = os.stat(path).st_mtime_ns
+    key = (path, mtime_ns)
+    compiled = _memory_cache.get(key)
+    if compiled is not None:
+        return compiled
+
+    with _cache_lock:
+        compiled = _memory_cache.get(key)
+        if compiled is not None:
+            return compiled
+
+        cache_file = _disk_cache_path(path, mtime_ns)
+        if cache_file and os.path.exists(cache_file):
+            try:
+                with open(cache_file, 'rb') as f:
+                    compiled = pickle.load(f)
+            except Exception:
+                compiled = None
+
+        if compiled is None:
+            compiled = compile_template(path)
+            if cache_file:
+                os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+                tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+                with open(tmp_file, 'wb') as f:
+                    pickle.dump(compiled, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_file, cache_file)
+
+        # Buang versi lama dari template yang sama
+        for old_key in [k for k in _memory_cache if k[0] == path]:
+            del _memory_cache[old_key]
+        _memory_cache[key] = compiled
+        return compiled
+
+
+def render_docx(path, context):
+    """Render template .docx di `path` dengan nilai `context` ({'number': ..., ...})"""
+    return get_template(path).render(context)
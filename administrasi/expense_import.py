@@ -0,0 +1,116 @@
+from decimal import Decimal
+
+import pandas as pd
+from django.db import transaction
+
+from diginus.model_versions import bump_version
+
+from .models import ChangeLog, Expense, MonthlyLedger
+from .tabular import CHUNK_SIZE, clean_amounts, parse_dates, read_chunks
+
+# Import pengeluaran dari CSV/XLSX (misal mutasi rekening bank) secara streaming:
+# file dibaca per potongan, tiap potongan divalidasi sekaligus dengan pandas,
+# lalu baris yang valid disimpan dengan bulk_create dalam satu transaksi per potongan.
+
+MAX_ERRORS = 1000
+
+# Nama kolom yang dikenali (huruf kecil) -> field Expense
+COLUMN_ALIASES = {
+    'category': 'category', 'kategori': 'category',
+    'title': 'title', 'judul': 'title', 'keterangan': 'title', 'description': 'title', 'deskripsi': 'title',
+    'amount': 'amount', 'nominal': 'amount', 'jumlah': 'amount', 'debit': 'amount',
+    'date': 'date', 'tanggal': 'date', 'tgl': 'date',
+    'note': 'note', 'catatan': 'note',
+}
+REQUIRED_COLUMNS = ('category', 'title', 'amount', 'date')
+
+# Kategori boleh ditulis sebagai kode (GAJI) atau labelnya (Gaji Karyawan)
+CATEGORY_LOOKUP = {
+    **{code: code for code, _ in Expense.CATEGORY_CHOICES},
+    **{label.upper(): code for code, label in Expense.CATEGORY_CHOICES},
+}
+
+
+def validate_chunk(chunk, first_row):
+    """
+    Validasi satu potongan sekaligus (per kolom, bukan per baris).
+    Mengembalikan (daftar Expense siap simpan, daftar error {row, errors}, jumlah baris berisi).
+    `first_row` = nomor baris file untuk baris pertama potongan; baris kosong dilewati.
+    """
+    category = chunk['category'].fillna('').astype(str).str.strip().str.upper()
+    title = chunk['title'].fillna('').astype(str).str.strip()
+    note = chunk['note'].fillna('').astype(str).str.strip()
+    amount_text, amount = clean_amounts(chunk['amount'].fillna(''))
+    date = parse_dates(chunk['date'].fillna(''))
+
+    date_text = chunk['date'].fillna('').astype(str).str.strip()
+    blank = category.eq('') & title.eq('') & amount_text.eq('') & date_text.eq('')
+    category = category.map(CATEGORY_LOOKUP)
+
+    checks = [
+        (category.isna(), f"Kategori tidak dikenal (pilihan: {', '.join(code for code, _ in Expense.CATEGORY_CHOICES)})"),
+        (title.eq(''), "Keterangan wajib diisi"),
+        (title.str.len() > 200, "Keterangan maksimal 200 karakter"),
+        (amount.isna() | amount.eq(0), "Nominal tidak valid"),
+        (amount.abs() >= 10 ** 13, "Nominal terlalu besar"),
+        (date.isna(), "Tanggal tidak valid (gunakan YYYY-MM-DD atau DD/MM/YYYY)"),
+    ]
+    invalid = pd.Series(False, index=chunk.index)
+    for mask, _ in checks:
+        invalid |= mask.fillna(True)
+    invalid &= ~blank
+
+    errors = []
+    for position in invalid.to_numpy().nonzero()[0]:
+        index = chunk.index[position]
+        errors.append({
+            'row': first_row + int(position),
+            'errors': [message for mask, message in checks if bool(mask.fillna(True).at[index])],
+        })
+
+    expenses = []
+    valid = ~invalid & ~blank
+    for cat, ttl, txt, day, nt in zip(category[valid], title[valid], amount_text[valid], date[valid], note[valid]):
+        expenses.append(Expense(
+            category=cat, title=ttl, note=nt, date=day.date(),
+            amount=abs(Decimal(txt)).quantize(Decimal('0.01')),
+        ))
+    return expenses, errors, int((~blank).sum())
+
+
+def save_chunk(expenses):
+    """
+    bulk_create satu potongan. Signal tidak terpicu, jadi MonthlyLedger,
+    ChangeLog, dan versi ETag diperbarui di sini dalam transaksi yang sama.
+    """
+    totals = {}
+    for expense in expenses:
+        key = (expense.date.year, expense.date.month)
+        totals[key] = totals.get(key, Decimal('0')) + expense.amount
+
+    with transaction.atomic():
+        created = Expense.objects.bulk_create(expenses)
+        for (year, month), total in sorted(totals.items()):
+            MonthlyLedger.apply_delta(year, month, expenses=total)
+        ChangeLog.record(Expense, [expense.pk for expense in created])
+        bump_version(Expense)
+    return len(created)
+
+
+def import_expenses(fileobj, filename, chunk_size=CHUNK_SIZE, dry_run=False):
+    """
+    Import pengeluaran dari file CSV/XLSX. Baris valid disimpan per potongan,
+    baris bermasalah dilaporkan per nomor baris (maksimal MAX_ERRORS rincian).
+    """
+    report = {'total': 0, 'valid': 0, 'created': 0, 'error_count': 0, 'errors': []}
+    first_row = 2  # baris 1 = header
+    for chunk in read_chunks(fileobj, filename, COLUMN_ALIASES, REQUIRED_COLUMNS, chunk_size):
+        expenses, errors, filled = validate_chunk(chunk, first_row)
+        first_row += len(chunk)
+        report['total'] += filled
+        report['valid'] += len(expenses)
+        report['error_count'] += len(errors)
+        report['errors'].extend(errors[:MAX_ERRORS - len(report['errors'])])
+        if expenses and not dry_run:
+            report['created'] += save_chunk(expenses)
+    return report
@@ -0,0 +1,228 @@
+import csv
+import importlib.util
+import json
+import tempfile
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from openpyxl import Workbook
+
+from .models import InvoiceItem
+
+# Ekspor streaming (CSV / JSON Lines / XLSX / Parquet). Data dibaca dengan
+# queryset.iterator(chunk_size=...) dan dikirim per potongan, jadi dump
+# setahun penuh tidak pernah ditampung utuh di memori worker.
+
+CHUNK_SIZE = 2000
+BLOCK_SIZE = 64 * 1024
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+class _Echo:
+    """File semu untuk csv.writer: writerow() langsung mengembalikan barisnya"""
+
+    def write(self, value):
+        return value
+
+
+def _batched(lines):
+    # Gabungkan baris kecil per CHUNK_SIZE agar tidak ada ribuan write() mini ke socket
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= CHUNK_SIZE:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def stream_csv(headers, rows):
+    writer = csv.writer(_Echo())
+    # BOM agar Excel membaca UTF-8 dengan benar
+    yield '\ufeff' + writer.writerow(headers)
+    yield from _batched(writer.writerow(row) for row in rows)
+
+
+def stream_jsonl(records):
+    yield from _batched(json.dumps(record, cls=DjangoJSONEncoder) + '\n' for record in records)
+
+
+def stream_xlsx(title, headers, rows):
+    """
+    openpyxl write-only: baris langsung ditulis ke file sementara di disk
+    (memori konstan), lalu file .xlsx jadi dikirim per blok.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    ws.append(headers)
+    for row in rows:
+        ws.append(row)
+    with tempfile.TemporaryFile() as output:
+        wb.save(output)
+        output.seek(0)
+        while block := output.read(BLOCK_SIZE):
+            yield block
+
+
+def stream_parquet(records, schema=None):
+    """
+    Parquet untuk analitik: satu row group per CHUNK_SIZE record, ditulis ke
+    file sementara lalu dikirim per blok. Tanpa `schema` (pyarrow.Schema),
+    skema ditebak dari potongan pertama.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    with tempfile.TemporaryFile() as output:
+        writer, batch = None, []
+
+        def flush():
+            nonlocal writer, schema
+            table = pa.Table.from_pylist(batch, schema=schema)
+            if writer is None:
+                schema = table.schema
+                writer = pq.ParquetWriter(output, schema)
+            writer.write_table(table)
+
+        for record in records:
+            batch.append(record)
+            if len(batch) >= CHUNK_SIZE:
+                flush()
+                batch = []
+        if batch or writer is None:
+            flush()
+        writer.close()
+
+        output.seek(0)
+        while block := output.read(BLOCK_SIZE):
+            yield block
+
+
+def export_response(fmt, filename, title, headers, records, flatten=None, parquet_schema=None):
+    """
+    StreamingHttpResponse untuk `records` (iterable dict) dalam format `fmt`.
+    JSON Lines dan Parquet memakai dict apa adanya; CSV/XLSX memakai `flatten(record)`
+    yang menghasilkan satu atau lebih baris sesuai urutan `headers`.
+    `parquet_schema()` mengembalikan pyarrow.Schema bila skema tidak boleh ditebak.
+    """
+    if fmt not in CONTENT_TYPES:
+        return JsonResponse({'status': 'error', 'message': f"Format tidak dikenal (pilihan: {', '.join(CONTENT_TYPES)})"}, status=400)
+    if fmt == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+        return JsonResponse({'status': 'error', 'message': "Ekspor Parquet membutuhkan paket pyarrow di server"}, status=400)
+
+    flatten = flatten or (lambda record: [list(record.values())])
+    rows = (row for record in records for row in flatten(record))
+    if fmt == 'csv':
+        content = stream_csv(headers, rows)
+    elif fmt == 'jsonl':
+        content = stream_jsonl(records)
+    elif fmt == 'parquet':
+        content = stream_parquet(records, parquet_schema() if parquet_schema else None)
+    else:
+        content = stream_xlsx(title, headers, rows)
+
+    response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}_{timezone.localdate():%Y%m%d}.{fmt}"'
+    return response
+
+
+def _local(value, tz):
+    # XLSX tidak menerima datetime ber-timezone: simpan sebagai waktu lokal proyek
+    return value.astimezone(tz).replace(tzinfo=None) if value else None
+
+
+# --- Definisi per model ---
+CORRESPONDENCE_HEADERS = ['Nomor Surat', 'Tanggal', 'Pelanggan', 'Perusahaan', 'Jenis Surat', 'Perihal']
+
+
+def correspondence_records(queryset):
+    rows = queryset.values(
+        'formatted_number', 'created_at', 'customer__name', 'customer__company', 'doc_type__name', 'subject',
+    )
+    tz = timezone.get_current_timezone()
+    for r in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield {
+            'number': r['formatted_number'],
+            'created_at': _local(r['created_at'], tz),
+            'customer': r['customer__name'],
+            'company': r['customer__company'],
+            'type': r['doc_type__name'],
+            'subject': r['subject'],
+        }
+
+
+EXPENSE_HEADERS = ['Tanggal', 'Kategori', 'Keterangan', 'Nominal', 'Catatan']
+
+
+def expense_records(queryset):
+    rows = queryset.values('date', 'category', 'title', 'amount', 'note')
+    yield from rows.iterator(chunk_size=CHUNK_SIZE)
+
+
+INVOICE_HEADERS = [
+    'Nomor Invoice', 'Tanggal', 'Pelanggan', 'Perusahaan', 'Jenis', 'Jatuh Tempo', 'Subtotal', 'PPN',
+    'Grand Total', 'Terbayar', 'Sisa', 'Lunas', 'Item', 'Qty', 'Harga Satuan', 'Subtotal Item',
+]
+
+
+def _with_items(rows, tz):
+    """Lengkapi satu potongan invoice dengan item-nya (satu query per potongan)"""
+    items = defaultdict(list)
+    for item in InvoiceItem.objects.filter(invoice_id__in=[r['id'] for r in rows]).order_by('id').values(
+        'invoice_id', 'description', 'quantity', 'unit_price',
+    ):
+        items[item.pop('invoice_id')].append({**item, 'subtotal': Decimal(item['quantity']) * item['unit_price']})
+
+    for r in rows:
+        yield {
+            'number': r['correspondence__formatted_number'],
+            'created_at': _local(r['correspondence__created_at'], tz),
+            'customer': r['correspondence__customer__name'],
+            'company': r['correspondence__customer__company'],
+            'invoice_type': r['invoice_type'],
+            'due_date': r['due_date'],
+            'subtotal': r['subtotal'],
+            'tax_amount': r['tax_amount'],
+            'grand_total': r['grand_total'],
+            'paid_amount': r['paid_amount'],
+            'remaining': r['grand_total'] - r['paid_amount'],
+            'is_paid': r['is_paid'],
+            'items': items[r['id']],
+        }
+
+
+def invoice_records(queryset):
+    """Satu dict per invoice beserta item-nya; item diambil sekali per potongan iterator"""
+    rows = queryset.values(
+        'id', 'correspondence__formatted_number', 'correspondence__created_at',
+        'correspondence__customer__name', 'correspondence__customer__company',
+        'invoice_type', 'due_date', 'subtotal', 'tax_amount', 'grand_total', 'paid_amount', 'is_paid',
+    )
+    tz, chunk = timezone.get_current_timezone(), []
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            yield from _with_items(chunk, tz)
+            chunk = []
+    if chunk:
+        yield from _with_items(chunk, tz)
+
+
+def invoice_rows(record):
+    """CSV/XLSX: satu baris per item, kolom invoice diulang (invoice tanpa item tetap satu baris)"""
+    head = [value for key, value in record.items() if key != 'items']
+    head[-1] = 'Ya' if head[-1] else 'Belum'
+    return [
+        head + ([item['description'], item['quantity'], item['unit_price'], item['subtotal']] if item else ['', '', '', ''])
+        for item in record['items'] or [None]
+    ]
@@ -0,0 +1,114 @@
+import hashlib
+import io
+import json
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.template.loader import get_template
+from django.utils.module_loading import import_string
+
+from diginus.model_versions import bump_version
+
+from .models import ChangeLog, Correspondence, Invoice
+
+# Cache hasil render invoice. Kuncinya id invoice + content_version(): hash
+# semua data yang tampil (invoice, item, customer) dan mtime template, jadi
+# perubahan apa pun otomatis memakai kunci baru tanpa perlu invalidasi.
+# Versi HTML dan PDF berbagi hasil render yang sama; PDF ditulis sekali ke
+# Correspondence.file_pdf dan cetak ulang cukup membaca file itu.
+
+TEMPLATE_NAME = 'administrasi/invoice_template.html'
+CACHE_TIMEOUT = 30 * 24 * 60 * 60
+
+INVOICE_QUERYSET = Invoice.objects.select_related(
+    'correspondence', 'correspondence__customer', 'correspondence__doc_type',
+).prefetch_related('items')
+
+
+def _cache():
+    return caches[getattr(settings, 'INVOICE_RENDER_CACHE', 'default')]
+
+
+def content_version(invoice):
+    """Hash masukan render satu invoice (memakai item yang sudah di-prefetch)"""
+    doc, customer = invoice.correspondence, invoice.correspondence.customer
+    try:
+        mtime = os.path.getmtime(get_template(TEMPLATE_NAME).origin.name)
+    except (OSError, TypeError):
+        mtime = None
+    raw = json.dumps([
+        mtime,
+        [invoice.invoice_type, invoice.due_date, invoice.subtotal, invoice.tax_amount, invoice.grand_total, invoice.paid_amount],
+        [doc.formatted_number, doc.created_at],
+        [customer.name, customer.company, customer.address, customer.whatsapp],
+        [[item.description, item.quantity, item.unit_price] for item in invoice.items.all()],
+    ], cls=DjangoJSONEncoder)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def render_html(invoice, version=None, pdf=False):
+    """HTML invoice dari cache; dirender sekali per versi isi (pdf=True tanpa tombol cetak)"""
+    version = version or content_version(invoice)
+    key = f"invoice-html:{invoice.pk}:{version}:{'pdf' if pdf else 'web'}"
+    html = _cache().get(key)
+    if html is None:
+        html = get_template(TEMPLATE_NAME).render({'invoice': invoice, 'pdf': pdf})
+        _cache().set(key, html, CACHE_TIMEOUT)
+    return html
+
+
+def _static_path(uri, rel):
+    # Gambar {% static %} dibaca langsung dari disk, bukan lewat HTTP
+    if uri.startswith(settings.STATIC_URL):
+        name = uri[len(settings.STATIC_URL):]
+        path = finders.find(name) or os.path.join(settings.STATIC_ROOT, name)
+        if os.path.exists(path):
+            return path
+    return uri
+
+
+def xhtml2pdf_pdf(html):
+    """Konverter bawaan: xhtml2pdf (pure Python, tanpa program eksternal)"""
+    from xhtml2pdf import pisa
+
+    output = io.BytesIO()
+    result = pisa.CreatePDF(html, dest=output, encoding='utf-8', link_callback=_static_path)
+    if result.err:
+        raise ValueError(f"Gagal membuat PDF invoice ({result.err} error)")
+    return output.getvalue()
+
+
+def get_pdf_converter():
+    """Callable `convert(html) -> pdf_bytes` dari setting INVOICE_PDF_CONVERTER"""
+    return import_string(getattr(settings, 'INVOICE_PDF_CONVERTER', 'administrasi.invoice_render.xhtml2pdf_pdf'))
+
+
+def ensure_pdf(invoice, converter=None):
+    """
+    File PDF invoice (Correspondence.file_pdf). Dibuat hanya jika belum ada
+    atau isi invoice berubah sejak PDF terakhir (Invoice.pdf_signature).
+    """
+    version = content_version(invoice)
+    doc = invoice.correspondence
+    if doc.file_pdf and invoice.pdf_signature == version:
+        return doc.file_pdf
+
+    pdf = (converter or get_pdf_converter())(render_html(invoice, version, pdf=True))
+    # File lama dihapus dulu agar nama file tetap sama (storage tidak menambah akhiran acak)
+    if doc.file_pdf:
+        doc.file_pdf.delete(save=False)
+    doc.file_pdf.save(f"{doc.doc_type.code}_{doc.number:03d}_{doc.created_at.year}.pdf", ContentFile(pdf), save=False)
+
+    # update() bukan save(): tidak memicu signal yang menjadwalkan render arsip
+    with transaction.atomic():
+        ChangeLog.record(Correspondence, [doc.pk])
+        Correspondence.objects.filter(pk=doc.pk).update(file_pdf=doc.file_pdf.name)
+        Invoice.objects.filter(pk=invoice.pk).update(pdf_signature=version)
+        bump_version(Correspondence)
+    invoice.pdf_signature = version
+    return doc.file_pdf
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from administrasi.docx_batch import correspondence_jobs, render_many, stream_zip
+from administrasi.models import Correspondence, Customer, DocumentType
+
+
+class Command(BaseCommand):
+    help = "Terbitkan surat untuk banyak customer sekaligus dan simpan DOCX-nya dalam satu file ZIP"
+
+    def add_arguments(self, parser):
+        parser.add_argument('customer_ids', nargs='+', type=int, help="ID customer penerima surat")
+        parser.add_argument('--doc-type', required=True, help="ID atau kode jenis surat (misal: UM)")
+        parser.add_argument('--subject', required=True, help="Perihal surat")
+        parser.add_argument('--output', required=True, help="Path file ZIP hasil")
+
+    def handle(self, *args, **options):
+        doc_type_key = options['doc_type']
+        lookup = Q(code=doc_type_key.upper())
+        if doc_type_key.isdigit():
+            lookup |= Q(pk=int(doc_type_key))
+        doc_type = DocumentType.objects.filter(lookup).first()
+        if doc_type is None:
+            raise CommandError(f"Jenis surat '{doc_type_key}' tidak ditemukan")
+
+        try:
+            docs = Correspondence.bulk_issue(options['customer_ids'], doc_type, options['subject'])
+        except Customer.DoesNotExist as e:
+            raise CommandError(str(e))
+
+        with open(options['output'], 'wb') as f:
+            for chunk in stream_zip(render_many(correspondence_jobs(docs))):
+                f.write(chunk)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(docs)} surat diterbitkan ({docs[0].formatted_number} s/d {docs[-1].formatted_number}) -> {options['output']}"
+        ))
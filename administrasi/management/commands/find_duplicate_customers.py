@@ -0,0 +1,33 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from administrasi.dedupe import DEFAULT_THRESHOLD, MAX_BLOCK, find_duplicates
+
+
+class Command(BaseCommand):
+    help = "Cari kelompok calon customer ganda (nama/perusahaan mirip, nomor WA atau email sama)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="Skor minimal 0..1")
+        parser.add_argument('--max-block', type=int, default=MAX_BLOCK, help="Blok lebih besar dari ini dilewati")
+        parser.add_argument('--json', action='store_true', help="Cetak hasil sebagai JSON")
+
+    def handle(self, *args, **options):
+        groups, stats = find_duplicates(options['threshold'], options['max_block'])
+        if options['json']:
+            self.stdout.write(json.dumps({'stats': stats, 'data': groups}, indent=2))
+            return
+
+        for group in groups:
+            self.stdout.write(f"Skor {group['score']:.2f}:")
+            for c in group['customers']:
+                mark = '*' if c['id'] == group['primary_id'] else ' '
+                self.stdout.write(
+                    f"  {mark} #{c['id']} {c['name']} | {c['company'] or '-'} | {c['email']} | "
+                    f"{c['whatsapp']} | {c['document_count']} surat"
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['groups']} kelompok dari {stats['customers']} customer "
+            f"({stats['pairs']} pasangan dinilai, {stats['skipped_blocks']} blok terlalu besar dilewati)"
+        ))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from administrasi.expense_import import CHUNK_SIZE, import_expenses
+
+
+class Command(BaseCommand):
+    help = "Import pengeluaran dari file CSV/XLSX (misal mutasi rekening bank)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Path file .csv atau .xlsx")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Jumlah baris per batch simpan")
+        parser.add_argument('--dry-run', action='store_true', help="Hanya validasi, tidak menyimpan")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as f:
+                report = import_expenses(f, options['path'], options['chunk_size'], options['dry_run'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in report['errors']:
+            self.stderr.write(f"Baris {error['row']}: {'; '.join(error['errors'])}")
+        if report['error_count'] > len(report['errors']):
+            self.stderr.write(f"... dan {report['error_count'] - len(report['errors'])} baris bermasalah lainnya")
+
+        verb = "valid (dry run)" if options['dry_run'] else "diimport"
+        count = report['valid'] if options['dry_run'] else report['created']
+        self.stdout.write(self.style.SUCCESS(
+            f"Selesai: {count} dari {report['total']} baris {verb}, {report['error_count']} bermasalah"
+        ))
@@ -0,0 +1,18 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from administrasi.models import ChangeLog
+
+
+class Command(BaseCommand):
+    help = "Hapus log perubahan (delta-sync) yang lebih lama dari N hari; klien dengan cursor lama akan memuat ulang penuh"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help="Umur maksimal log yang disimpan (hari)")
+
+    def handle(self, *args, **options):
+        before = timezone.now() - datetime.timedelta(days=options['days'])
+        total = ChangeLog.prune(before)
+        self.stdout.write(self.style.SUCCESS(f"Selesai: {total} log perubahan dihapus"))
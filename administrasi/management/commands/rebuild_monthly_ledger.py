@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from administrasi.models import MonthlyLedger
+
+
+class Command(BaseCommand):
+    help = "Bangun ulang rekap keuangan bulanan (MonthlyLedger) dari seluruh Invoice dan Expense"
+
+    def handle(self, *args, **options):
+        total = MonthlyLedger.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Selesai: {total} bulan direkap ulang"))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from administrasi.models import Invoice
+
+
+class Command(BaseCommand):
+    help = "Hitung ulang subtotal, PPN, dan grand total yang tersimpan di Invoice secara bertahap"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Jumlah invoice per transaksi")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = Invoice.objects.order_by('pk').values_list('pk', flat=True)
+
+        total, last_pk = 0, 0
+        while True:
+            # Paging berdasarkan pk agar tiap batch memakai index primary key
+            batch = list(ids.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                total += Invoice.refresh_totals(batch)
+            last_pk = batch[-1]
+            self.stdout.write(f"{total} invoice diproses...")
+
+        self.stdout.write(self.style.SUCCESS(f"Selesai: total {total} invoice dihitung ulang"))
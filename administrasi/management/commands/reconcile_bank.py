@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from administrasi.reconciliation import reconcile
+from administrasi.tabular import CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = "Cocokkan mutasi kredit rekening bank (CSV/XLSX) dengan invoice yang belum lunas"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Path file mutasi .csv atau .xlsx")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Jumlah baris per potongan baca")
+        parser.add_argument('--dry-run', action='store_true', help="Hanya cocokkan, tidak menyimpan")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as f:
+                report = reconcile(f, options['path'], options['chunk_size'], options['dry_run'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in report['errors']:
+            self.stderr.write(f"Baris {error['row']}: {'; '.join(error['errors'])}")
+        methods = ', '.join(f"{name}: {count}" for name, count in sorted(report['methods'].items())) or '-'
+        self.stdout.write(self.style.SUCCESS(
+            f"Selesai{' (dry run)' if options['dry_run'] else ''}: {report['matched']} cocok ({methods}), "
+            f"{report['unmatched']} belum cocok, {report['ignored']} debit diabaikan, {report['duplicates']} duplikat"
+        ))
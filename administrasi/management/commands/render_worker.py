@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from administrasi.models import Correspondence, RenderJob
+from administrasi.render_queue import BATCH_SIZE, get_pdf_converter, process_batch, requeue_stale
+
+
+class Command(BaseCommand):
+    help = "Worker antrean render arsip surat: isi file_docx (dan file_pdf jika ada konverter)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Jumlah job per klaim")
+        parser.add_argument('--sleep', type=float, default=2.0, help="Jeda (detik) saat antrean kosong")
+        parser.add_argument('--once', action='store_true', help="Berhenti begitu antrean kosong")
+        parser.add_argument('--backfill', action='store_true', help="Jadwalkan dulu semua surat yang belum punya file")
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            missing = Correspondence.objects.filter(file_docx__in=['', None]).values_list('id', flat=True)
+            RenderJob.enqueue(missing.iterator(chunk_size=RenderJob.ENQUEUE_BATCH))
+
+        converter = get_pdf_converter()
+        totals = [0, 0, 0]
+        while True:
+            requeue_stale()
+            claimed, rendered, failed = process_batch(options['batch_size'], converter)
+            for i, value in enumerate((claimed, rendered, failed)):
+                totals[i] += value
+            if claimed:
+                self.stdout.write(f"{claimed} job: {rendered} dirender, {claimed - rendered - failed} sudah mutakhir, {failed} gagal")
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f"Selesai: {totals[1]} surat dirender, {totals[2]} gagal"))
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.21 on 2026-10-18 11:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def seed_sequences(apps, schema_editor):
+    """Isi counter awal dari nomor surat terbesar yang sudah terbit"""
+    from django.db.models import Max
+    from django.db.models.functions import ExtractYear
+
+    Correspondence = apps.get_model('administrasi', 'Correspondence')
+    DocumentSequence = apps.get_model('administrasi', 'DocumentSequence')
+
+    docs = Correspondence.objects.annotate(year=ExtractYear('created_at'))
+    counters = [
+        DocumentSequence(year=row['year'], last_number=row['last'])
+        for row in docs.values('year').annotate(last=Max('number'))
+    ]
+    counters += [
+        DocumentSequence(year=row['year'], doc_type_id=row['doc_type'], last_number=row['last'])
+        for row in docs.values('year', 'doc_type').annotate(last=Max('number'))
+    ]
+    DocumentSequence.objects.bulk_create(counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administrasi', '0003_alter_invoice_options_remove_invoice_dp_amount_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('last_number', models.PositiveIntegerField(default=0)),
+                ('doc_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sequences', to='administrasi.documenttype')),
+            ],
+            options={
+                'verbose_name': 'Counter Nomor Surat',
+                'verbose_name_plural': 'Counter Nomor Surat',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='documentsequence',
+            constraint=models.UniqueConstraint(fields=('year', 'doc_type'), name='unique_sequence_year_doc_type'),
+        ),
+        migrations.AddConstraint(
+            model_name='documentsequence',
+            constraint=models.UniqueConstraint(condition=models.Q(('doc_type__isnull', True)), fields=('year',), name='unique_sequence_year_global'),
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
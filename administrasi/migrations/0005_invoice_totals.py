@@ -0,0 +1,52 @@
+# Generated by Django 4.2.21 on 2026-10-18 11:30
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def backfill_totals(apps, schema_editor):
+    """Isi total yang tersimpan dari item yang sudah ada"""
+    from django.db.models import ExpressionWrapper, F, Sum
+
+    Invoice = apps.get_model('administrasi', 'Invoice')
+    InvoiceItem = apps.get_model('administrasi', 'InvoiceItem')
+
+    item_total = ExpressionWrapper(F('quantity') * F('unit_price'), output_field=models.DecimalField(max_digits=17, decimal_places=2))
+    sums = dict(
+        InvoiceItem.objects.values('invoice_id').annotate(total=Sum(item_total)).values_list('invoice_id', 'total')
+    )
+    invoices = []
+    for invoice in Invoice.objects.only('pk'):
+        subtotal = Decimal(sums.get(invoice.pk) or 0).quantize(Decimal('1.00'))
+        invoice.subtotal = subtotal
+        invoice.tax_amount = (subtotal * Decimal('0.11')).quantize(Decimal('1.00'))
+        invoice.grand_total = invoice.subtotal + invoice.tax_amount
+        invoices.append(invoice)
+    Invoice.objects.bulk_update(invoices, ['subtotal', 'tax_amount', 'grand_total'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administrasi', '0004_documentsequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='grand_total',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, max_digits=15),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=15),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='tax_amount',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=15),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.21 on 2026-10-18 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administrasi', '0005_invoice_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.21 on 2026-10-18 11:34
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def backfill_ledger(apps, schema_editor):
+    """Isi rekap bulanan awal dari Invoice lunas dan Expense yang sudah ada"""
+    from django.db.models import Sum
+    from django.db.models.functions import TruncMonth
+
+    Invoice = apps.get_model('administrasi', 'Invoice')
+    Expense = apps.get_model('administrasi', 'Expense')
+    MonthlyLedger = apps.get_model('administrasi', 'MonthlyLedger')
+
+    totals = {}
+    revenue_rows = (
+        Invoice.objects.filter(is_paid=True).annotate(period=TruncMonth('correspondence__created_at'))
+        .values('period').annotate(total=Sum('paid_amount')).values_list('period', 'total')
+    )
+    for period, total in revenue_rows:
+        totals.setdefault((period.year, period.month), [Decimal('0'), Decimal('0')])[0] += total or 0
+    expense_rows = (
+        Expense.objects.annotate(period=TruncMonth('date'))
+        .values('period').annotate(total=Sum('amount')).values_list('period', 'total')
+    )
+    for period, total in expense_rows:
+        totals.setdefault((period.year, period.month), [Decimal('0'), Decimal('0')])[1] += total or 0
+
+    ledgers = []
+    for (year, month), (revenue, expenses) in totals.items():
+        net_profit = revenue - expenses
+        share = lambda ratio: (net_profit * Decimal(ratio)).quantize(Decimal('1.00')) if net_profit > 0 else Decimal('0')
+        ledgers.append(MonthlyLedger(
+            year=year, month=month, revenue=revenue, expenses=expenses, net_profit=net_profit,
+            allocation_gaji=share('0.40'), allocation_ops=share('0.50'), allocation_sedekah=share('0.10'),
+        ))
+    MonthlyLedger.objects.bulk_create(ledgers)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administrasi', '0006_invoice_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=17)),
+                ('expenses', models.DecimalField(decimal_places=2, default=0, max_digits=17)),
+                ('net_profit', models.DecimalField(decimal_places=2, default=0, max_digits=17)),
+                ('allocation_gaji', models.DecimalField(decimal_places=2, default=0, max_digits=17)),
+                ('allocation_ops', models.DecimalField(decimal_places=2, default=0, max_digits=17)),
+                ('allocation_sedekah', models.DecimalField(decimal_places=2, default=0, max_digits=17)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Rekap Keuangan Bulanan',
+                'verbose_name_plural': 'Rekap Keuangan Bulanan',
+                'ordering': ['year', 'month'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='monthlyledger',
+            constraint=models.UniqueConstraint(fields=('year', 'month'), name='unique_ledger_year_month'),
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
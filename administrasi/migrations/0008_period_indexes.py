@@ -0,0 +1,29 @@
+# Generated by Django 4.2.21 on 2026-10-18 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administrasi', '0007_monthlyledger'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='correspondence',
+            index=models.Index(fields=['created_at'], name='corr_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='correspondence',
+            index=models.Index(fields=['doc_type', 'created_at'], name='corr_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['date', 'category'], name='expense_date_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['is_paid', 'due_date'], name='invoice_paid_due_idx'),
+        ),
+    ]
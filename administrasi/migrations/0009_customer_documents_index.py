@@ -0,0 +1,17 @@
+# Generated by Django 4.2.21 on 2026-10-18 11:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administrasi', '0008_period_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='correspondence',
+            index=models.Index(fields=['customer', 'created_at'], name='corr_customer_created_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.21 on 2026-10-18 11:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administrasi', '0010_changelog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BankMutation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('fingerprint', models.CharField(max_length=64, unique=True)),
+                ('status', models.CharField(choices=[('MATCHED', 'Cocok'), ('UNMATCHED', 'Belum cocok'), ('IGNORED', 'Diabaikan')], default='UNMATCHED', max_length=10)),
+                ('match_method', models.CharField(blank=True, choices=[('NUMBER', 'Nomor invoice di berita transfer'), ('AMOUNT', 'Nominal sama dengan sisa tagihan'), ('CUSTOMER', 'Nama customer di berita transfer'), ('MANUAL', 'Dipilih manual')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('invoice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bank_mutations', to='administrasi.invoice')),
+            ],
+            options={
+                'verbose_name': 'Mutasi Bank',
+                'verbose_name_plural': 'Mutasi Bank',
+                'ordering': ['-date', '-id'],
+                'indexes': [models.Index(fields=['status', 'date'], name='bankmutation_status_date_idx')],
+            },
+        ),
+    ]
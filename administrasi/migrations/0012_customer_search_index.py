@@ -0,0 +1,70 @@
+from django.db import migrations
+
+# Index full-text (SQLite FTS5) untuk autocomplete customer. Tabel FTS memakai
+# external content (administrasi_customer), jadi isinya hanya token; trigger
+# menjaganya tetap sinkron untuk setiap INSERT/UPDATE/DELETE, termasuk
+# bulk_create dan queryset.update() yang tidak memicu signal Django.
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE administrasi_customer_fts USING fts5(
+        name, company, email, whatsapp,
+        content='administrasi_customer', content_rowid='id',
+        tokenize="unicode61 remove_diacritics 2", prefix='1 2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER administrasi_customer_fts_insert AFTER INSERT ON administrasi_customer BEGIN
+        INSERT INTO administrasi_customer_fts(rowid, name, company, email, whatsapp)
+        VALUES (new.id, new.name, new.company, new.email, new.whatsapp);
+    END
+    """,
+    """
+    CREATE TRIGGER administrasi_customer_fts_delete AFTER DELETE ON administrasi_customer BEGIN
+        INSERT INTO administrasi_customer_fts(administrasi_customer_fts, rowid, name, company, email, whatsapp)
+        VALUES ('delete', old.id, old.name, old.company, old.email, old.whatsapp);
+    END
+    """,
+    """
+    CREATE TRIGGER administrasi_customer_fts_update
+    AFTER UPDATE OF name, company, email, whatsapp ON administrasi_customer BEGIN
+        INSERT INTO administrasi_customer_fts(administrasi_customer_fts, rowid, name, company, email, whatsapp)
+        VALUES ('delete', old.id, old.name, old.company, old.email, old.whatsapp);
+        INSERT INTO administrasi_customer_fts(rowid, name, company, email, whatsapp)
+        VALUES (new.id, new.name, new.company, new.email, new.whatsapp);
+    END
+    """,
+    # Isi index dari data customer yang sudah ada
+    "INSERT INTO administrasi_customer_fts(administrasi_customer_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS administrasi_customer_fts_insert",
+    "DROP TRIGGER IF EXISTS administrasi_customer_fts_delete",
+    "DROP TRIGGER IF EXISTS administrasi_customer_fts_update",
+    "DROP TABLE IF EXISTS administrasi_customer_fts",
+]
+
+
+def create_index(apps, schema_editor):
+    # Database selain SQLite memakai pencarian icontains biasa (lihat administrasi/search.py)
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in CREATE_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in DROP_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administrasi', '0011_bankmutation'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
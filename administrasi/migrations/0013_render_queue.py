@@ -0,0 +1,43 @@
+# Generated by Django 4.2.21 on 2026-10-18 12:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administrasi', '0012_customer_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='correspondence',
+            name='rendered_signature',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.CreateModel(
+            name='RenderJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'Menunggu'), ('RUNNING', 'Diproses'), ('FAILED', 'Gagal')], default='PENDING', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_by', models.CharField(blank=True, max_length=32)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('correspondence', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='render_jobs', to='administrasi.correspondence')),
+            ],
+            options={
+                'verbose_name': 'Antrean Render',
+                'verbose_name_plural': 'Antrean Render',
+                'indexes': [models.Index(fields=['status', 'run_after'], name='renderjob_status_run_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='renderjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'PENDING')), fields=('correspondence',), name='renderjob_one_pending'),
+        ),
+    ]
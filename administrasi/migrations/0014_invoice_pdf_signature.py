@@ -0,0 +1,18 @@
+# Generated by Django 4.2.21 on 2026-10-18 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administrasi', '0013_render_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='pdf_signature',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
@@ -1,6 +1,13 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F, Q
+from django.conf import settings
 from django.utils import timezone
 from decimal import Decimal
+import datetime
+import hashlib
+import json
+import os
+from diginus.model_versions import bump_version
 
 class Customer(models.Model):
     """Model untuk Database Pelanggan (CRM)"""
@@ -33,6 +40,60 @@ class DocumentType(models.Model):
         return f"{self.name} - {self.code}"
 
 
+class DocumentSequence(models.Model):
+    """
+    Counter penomoran surat per tahun (dan opsional per jenis surat).
+    Nomor diambil lewat satu UPDATE atomik pada satu baris ber-index,
+    sehingga aman dipakai beberapa worker sekaligus.
+    """
+    year = models.PositiveIntegerField()
+    doc_type = models.ForeignKey(DocumentType, on_delete=models.CASCADE, null=True, blank=True, related_name='sequences')
+    last_number = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Counter Nomor Surat"
+        verbose_name_plural = "Counter Nomor Surat"
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'doc_type'], name='unique_sequence_year_doc_type'),
+            models.UniqueConstraint(fields=['year'], condition=Q(doc_type__isnull=True), name='unique_sequence_year_global'),
+        ]
+
+    def __str__(self):
+        scope = self.doc_type.code if self.doc_type_id else 'ALL'
+        return f"{self.year}/{scope}: {self.last_number}"
+
+    @classmethod
+    def reserve(cls, year, count=1, doc_type=None):
+        """
+        Pesan `count` nomor berurutan sekaligus dan kembalikan sebagai range.
+        UPDATE dijalankan paling awal di dalam transaksi agar lock tulis
+        langsung diambil (penting untuk SQLite) dan baris counter terkunci
+        sampai commit (PostgreSQL).
+        """
+        if count < 1:
+            raise ValueError("Jumlah nomor yang dipesan minimal 1")
+
+        doc_type_id = getattr(doc_type, 'pk', doc_type)
+        counter = cls.objects.filter(year=year, doc_type_id=doc_type_id)
+
+        with transaction.atomic():
+            updated = counter.update(last_number=F('last_number') + count)
+            if not updated:
+                try:
+                    # Baris counter belum ada: tahun baru atau jenis surat baru
+                    with transaction.atomic():
+                        cls.objects.create(year=year, doc_type_id=doc_type_id, last_number=count)
+                except IntegrityError:
+                    # Worker lain lebih dulu membuat baris counter
+                    counter.update(last_number=F('last_number') + count)
+            last_number = counter.values_list('last_number', flat=True).get()
+
+        return range(last_number - count + 1, last_number + 1)
+
+
+ROMAN_MONTHS = ["", "I", "II", "III", "IV", "V", "VI", "VII", "VIII", "IX", "X", "XI", "XII"]
+
+
 class Correspondence(models.Model):
     """Model Utama Manajemen Surat dan Penomoran"""
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='documents')
@@ -45,6 +106,8 @@ class Correspondence(models.Model):
     
     file_pdf = models.FileField(upload_to='generated/pdf/', null=True, blank=True)
     file_docx = models.FileField(upload_to='generated/docx/', null=True, blank=True)
+    # render_signature() saat file_docx/file_pdf terakhir dibuat worker render
+    rendered_signature = models.CharField(max_length=64, blank=True, editable=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -53,30 +116,110 @@ class Correspondence(models.Model):
         verbose_name = "Arsip Surat"
         verbose_name_plural = "Arsip Surat"
         ordering = ['-created_at']
+        indexes = [
+            # Filter periode (rentang created_at) dan list terbaru-dulu
+            models.Index(fields=['created_at'], name='corr_created_idx'),
+            models.Index(fields=['doc_type', 'created_at'], name='corr_type_created_idx'),
+            # Daftar surat terbaru per customer (Customer 360)
+            models.Index(fields=['customer', 'created_at'], name='corr_customer_created_idx'),
+        ]
+
+    @staticmethod
+    def sequence_scope(doc_type):
+        """Counter per jenis surat hanya jika CORRESPONDENCE_NUMBER_PER_TYPE aktif"""
+        return doc_type if getattr(settings, 'CORRESPONDENCE_NUMBER_PER_TYPE', False) else None
+
+    @staticmethod
+    def format_number(number, code, when):
+        # Format: 001/INV/DIGINUS/IX/2026
+        return f"{str(number).zfill(3)}/{code}/DIGINUS/{ROMAN_MONTHS[when.month]}/{when.year}"
 
     def save(self, *args, **kwargs):
-        if not self.id:
-            now = timezone.now()
-            # 1. Logika Reset Nomor tiap Tahun
-            last_doc = Correspondence.objects.filter(
-                created_at__year=now.year
-            ).order_by('-number').first()
-            
-            self.number = (last_doc.number + 1) if last_doc else 1
-            
-            # 2. Logika Bulan Romawi
-            romans = ["", "I", "II", "III", "IV", "V", "VI", "VII", "VIII", "IX", "X", "XI", "XII"]
-            month_rom = romans[now.month]
-            
-            # 3. Format: 001/INV/DIGINUS/IX/2026
-            self.formatted_number = f"{str(self.number).zfill(3)}/{self.doc_type.code}/DIGINUS/{month_rom}/{now.year}"
-            
-        super().save(*args, **kwargs)
+        if self.id or self.number:
+            if not self.formatted_number:
+                self.formatted_number = self.format_number(self.number, self.doc_type.code, timezone.now())
+            return super().save(*args, **kwargs)
+
+        now = timezone.now()
+        # Ambil jenis surat sebelum transaksi dibuka, agar query pertama di dalam
+        # transaksi adalah UPDATE counter (menghindari deadlock lock SQLite)
+        doc_type = self.doc_type
+
+        with transaction.atomic():
+            # Nomor reset tiap tahun karena counter dikunci per tahun
+            self.number = DocumentSequence.reserve(now.year, doc_type=self.sequence_scope(doc_type))[0]
+            self.formatted_number = self.format_number(self.number, doc_type.code, now)
+            super().save(*args, **kwargs)
+
+    @classmethod
+    def bulk_issue(cls, customer_ids, doc_type, subject):
+        """
+        Terbitkan satu surat per customer sekaligus: nomor dipesan dalam satu
+        blok dan baris disimpan dengan bulk_create di dalam satu transaksi.
+        """
+        customer_ids = list(dict.fromkeys(int(pk) for pk in customer_ids))
+        customers = Customer.objects.in_bulk(customer_ids)
+        missing = [pk for pk in customer_ids if pk not in customers]
+        if missing:
+            raise Customer.DoesNotExist(f"Customer tidak ditemukan: {missing}")
+        if not customer_ids:
+            return []
+
+        now = timezone.now()
+        with transaction.atomic():
+            numbers = DocumentSequence.reserve(now.year, count=len(customer_ids), doc_type=cls.sequence_scope(doc_type))
+            docs = cls.objects.bulk_create([
+                cls(
+                    customer=customers[pk], doc_type=doc_type, subject=subject,
+                    number=number, formatted_number=cls.format_number(number, doc_type.code, now),
+                )
+                for pk, number in zip(customer_ids, numbers)
+            ])
+            # Sama seperti penerbitan satuan: surat INV otomatis punya baris Invoice
+            ChangeLog.record(cls, [doc.pk for doc in docs])
+            RenderJob.enqueue([doc.pk for doc in docs])
+            bump_version(cls)
+            if doc_type.code == 'INV':
+                invoices = Invoice.objects.bulk_create([Invoice(correspondence=doc) for doc in docs])
+                ChangeLog.record(Invoice, [invoice.pk for invoice in invoices])
+                bump_version(Invoice)
+        return docs
+
+    def template_context(self):
+        """Nilai placeholder {{...}} untuk template Word jenis surat ini"""
+        return {
+            'number': self.formatted_number,
+            'subject': self.subject,
+            'company': self.customer.company or self.customer.name,
+            'tanggal_surat': self.created_at.strftime('%d %B %Y'),
+        }
+
+    def render_signature(self):
+        """Hash semua masukan render; berubah jika perihal, customer, atau file template berubah"""
+        template = self.doc_type.template_docx
+        try:
+            mtime = os.path.getmtime(template.path)
+        except (OSError, ValueError):
+            mtime = None
+        raw = json.dumps([template.name, mtime, self.template_context()], sort_keys=True)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    @property
+    def is_rendered(self):
+        return bool(self.file_docx) and self.rendered_signature == self.render_signature()
 
     def __str__(self):
         return self.formatted_number
 
 
+TAX_RATE = Decimal('0.11')
+
+# Nilai baris item (qty x harga) yang dihitung di database
+ITEM_TOTAL = models.ExpressionWrapper(
+    F('quantity') * F('unit_price'), output_field=models.DecimalField(max_digits=17, decimal_places=2)
+)
+
+
 class Invoice(models.Model):
     TYPE_CHOICES = [('DP', 'Down Payment'), ('LUNAS', 'Pelunasan')]
     
@@ -87,27 +230,137 @@ class Invoice(models.Model):
     is_paid = models.BooleanField(default=False)
     due_date = models.DateField(null=True, blank=True)
 
-    @property
-    def subtotal(self):
-        """Total murni dari semua item sebelum pajak"""
-        return sum(item.subtotal for item in self.items.all())
+    # Total disimpan (denormalisasi) dan dihitung ulang setiap item berubah,
+    # agar list, laporan, dan piutang bisa filter/sort di SQL tanpa memuat item
+    subtotal = models.DecimalField(max_digits=15, decimal_places=2, default=0, editable=False)
+    tax_amount = models.DecimalField(max_digits=15, decimal_places=2, default=0, editable=False)
+    grand_total = models.DecimalField(max_digits=15, decimal_places=2, default=0, editable=False, db_index=True)
 
-    @property
-    def tax_amount(self):
-        """Nilai PPN 11%"""
-        # Kita gunakan Decimal untuk akurasi keuangan
-        return (self.subtotal * Decimal('0.11')).quantize(Decimal('1.00'))
+    # Naik setiap kali invoice disimpan lewat form; dipakai untuk menolak edit yang basi
+    version = models.PositiveIntegerField(default=0)
+    # content_version() saat PDF di correspondence.file_pdf terakhir dibuat (lihat invoice_render.py)
+    pdf_signature = models.CharField(max_length=64, blank=True, editable=False)
 
-    @property
-    def grand_total(self):
-        """Total yang harus dibayar (Subtotal + PPN)"""
-        return self.subtotal + self.tax_amount
+    class Meta:
+        indexes = [
+            # Piutang: invoice belum lunas diurutkan/dikelompokkan per jatuh tempo
+            models.Index(fields=['is_paid', 'due_date'], name='invoice_paid_due_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Satu transaksi dengan pembaruan MonthlyLedger dari signal post_save
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     @property
     def remaining_balance(self):
         """Sisa piutang setelah dikurangi pembayaran"""
         return self.grand_total - self.paid_amount
 
+    @staticmethod
+    def compute_totals(subtotal):
+        """Subtotal -> (subtotal, PPN 11%, grand total) dengan presisi Decimal"""
+        subtotal = Decimal(subtotal or 0).quantize(Decimal('1.00'))
+        tax_amount = (subtotal * TAX_RATE).quantize(Decimal('1.00'))
+        return subtotal, tax_amount, subtotal + tax_amount
+
+    def recalculate_totals(self, save=True):
+        """Hitung ulang total dari item dengan satu query agregat"""
+        item_sum = self.items.aggregate(total=models.Sum(ITEM_TOTAL))['total']
+        self.subtotal, self.tax_amount, self.grand_total = self.compute_totals(item_sum)
+        if save:
+            self.save(update_fields=['subtotal', 'tax_amount', 'grand_total'])
+
+    def sync_items(self, rows):
+        """
+        Terapkan daftar item dari form sebagai diff minimal.
+        rows: list dict {'id', 'description', 'quantity', 'unit_price'}; id kosong = item baru.
+        Item lama yang tidak ada di rows dihapus. Total dihitung ulang sekali di akhir.
+        """
+        existing = {item.id: item for item in self.items.all()}
+        to_create, to_update, kept = [], [], set()
+        fields = ['description', 'quantity', 'unit_price']
+
+        for row in rows:
+            item_id = row.get('id')
+            if not item_id:
+                to_create.append(InvoiceItem(invoice=self, **{f: row[f] for f in fields}))
+                continue
+            item = existing.get(int(item_id))
+            if item is None:
+                raise ValueError(f"Item {item_id} bukan milik invoice ini")
+            kept.add(item.id)
+            if any(getattr(item, f) != row[f] for f in fields):
+                for f in fields:
+                    setattr(item, f, row[f])
+                to_update.append(item)
+
+        removed = [pk for pk in existing if pk not in kept]
+        if removed:
+            InvoiceItem.objects.filter(id__in=removed).delete()
+        if to_update:
+            InvoiceItem.objects.bulk_update(to_update, fields)
+        if to_create:
+            InvoiceItem.objects.bulk_create(to_create)
+
+        # Operasi massal tidak memicu InvoiceItem.save(), jadi total dihitung ulang di sini
+        if removed or to_update or to_create:
+            self.recalculate_totals(save=False)
+        return {'created': len(to_create), 'updated': len(to_update), 'deleted': len(removed)}
+
+    @classmethod
+    def aging_report(cls, as_of=None):
+        """
+        Umur piutang per customer, dihitung dengan satu query agregat:
+        invoice belum lunas dikelompokkan per customer dan sisa tagihannya
+        dijumlah per bucket hari lewat jatuh tempo. Invoice tanpa jatuh tempo
+        dianggap belum jatuh tempo (current).
+        """
+        as_of = as_of or timezone.localdate()
+        remaining = F('grand_total') - F('paid_amount')
+        money = models.DecimalField(max_digits=17, decimal_places=2)
+
+        def bucket(*conditions):
+            return models.Sum(models.Case(models.When(*conditions, then=remaining), default=Decimal('0'), output_field=money))
+
+        days_ago = lambda n: as_of - datetime.timedelta(days=n)
+        buckets = {
+            'current': bucket(Q(due_date__isnull=True) | Q(due_date__gte=as_of)),
+            'd1_30': bucket(Q(due_date__lt=as_of, due_date__gte=days_ago(30))),
+            'd31_60': bucket(Q(due_date__lt=days_ago(30), due_date__gte=days_ago(60))),
+            'd61_90': bucket(Q(due_date__lt=days_ago(60), due_date__gte=days_ago(90))),
+            'd90_plus': bucket(Q(due_date__lt=days_ago(90))),
+        }
+        return (
+            cls.objects.filter(is_paid=False, grand_total__gt=F('paid_amount'))
+            .values(
+                customer_id=F('correspondence__customer_id'),
+                customer=F('correspondence__customer__name'),
+                company=F('correspondence__customer__company'),
+            )
+            .annotate(**buckets, total=models.Sum(remaining, output_field=money), invoice_count=models.Count('id'))
+            .order_by('-total')
+        )
+
+    @classmethod
+    def refresh_totals(cls, invoice_ids):
+        """Hitung ulang total banyak invoice sekaligus: satu GROUP BY lalu bulk_update"""
+        sums = dict(
+            InvoiceItem.objects.filter(invoice_id__in=invoice_ids)
+            .values('invoice_id').annotate(total=models.Sum(ITEM_TOTAL))
+            .values_list('invoice_id', 'total')
+        )
+        invoices = []
+        for pk in invoice_ids:
+            invoice = cls(pk=pk)
+            invoice.subtotal, invoice.tax_amount, invoice.grand_total = cls.compute_totals(sums.get(pk))
+            invoices.append(invoice)
+        with transaction.atomic():
+            cls.objects.bulk_update(invoices, ['subtotal', 'tax_amount', 'grand_total'])
+            ChangeLog.record(cls, invoice_ids)
+            bump_version(cls)
+        return len(invoices)
+
     def __str__(self):
         return f"Inv: {self.correspondence.formatted_number}"
 
@@ -121,10 +374,75 @@ class InvoiceItem(models.Model):
     def subtotal(self):
         return Decimal(self.quantity) * self.unit_price
 
+    # Perubahan item satuan langsung memperbarui total invoice di transaksi yang sama.
+    # Operasi massal (bulk_create, queryset.delete) wajib memanggil
+    # Invoice.recalculate_totals() / Invoice.refresh_totals() sendiri.
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.invoice.recalculate_totals()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            self.invoice.recalculate_totals()
+        return result
+
     def __str__(self):
         return f"{self.description} ({self.quantity} x {self.unit_price})"
 
 
+class BankMutation(models.Model):
+    """
+    Satu baris mutasi kredit dari rekening koran yang direkonsiliasi ke invoice
+    (lihat administrasi/reconciliation.py). Baris yang tidak cocok menunggu review.
+    """
+    STATUS_CHOICES = [
+        ('MATCHED', 'Cocok'),
+        ('UNMATCHED', 'Belum cocok'),
+        ('IGNORED', 'Diabaikan'),
+    ]
+    METHOD_CHOICES = [
+        ('NUMBER', 'Nomor invoice di berita transfer'),
+        ('AMOUNT', 'Nominal sama dengan sisa tagihan'),
+        ('CUSTOMER', 'Nama customer di berita transfer'),
+        ('MANUAL', 'Dipilih manual'),
+    ]
+
+    date = models.DateField()
+    description = models.CharField(max_length=255, blank=True)
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    # Hash tanggal/nominal/berita (+ urutan kemunculan) agar file yang sama tidak diproses dua kali
+    fingerprint = models.CharField(max_length=64, unique=True)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='UNMATCHED')
+    match_method = models.CharField(max_length=10, choices=METHOD_CHOICES, blank=True)
+    invoice = models.ForeignKey(Invoice, on_delete=models.SET_NULL, null=True, blank=True, related_name='bank_mutations')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Mutasi Bank"
+        verbose_name_plural = "Mutasi Bank"
+        ordering = ['-date', '-id']
+        indexes = [
+            models.Index(fields=['status', 'date'], name='bankmutation_status_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.amount} ({self.get_status_display()})"
+
+    def assign(self, invoice):
+        """Review manual: catat mutasi ini sebagai pembayaran `invoice`"""
+        with transaction.atomic():
+            invoice.paid_amount += self.amount
+            invoice.is_paid = invoice.remaining_balance <= 0
+            invoice.version = F('version') + 1
+            invoice.save()
+            invoice.refresh_from_db(fields=['version'])
+            self.invoice, self.status, self.match_method = invoice, 'MATCHED', 'MANUAL'
+            self.save(update_fields=['invoice', 'status', 'match_method'])
+
+
 class Expense(models.Model):
     """Pencatatan Pengeluaran Operasional dan Gaji"""
     CATEGORY_CHOICES = [
@@ -145,44 +463,270 @@ class Expense(models.Model):
         verbose_name = "Pengeluaran"
         verbose_name_plural = "Pengeluaran"
         ordering = ['-date']
+        indexes = [
+            # Filter periode (rentang tanggal), opsional per kategori
+            models.Index(fields=['date', 'category'], name='expense_date_category_idx'),
+        ]
 
     def __str__(self):
         return f"[{self.category}] {self.title} - Rp {self.amount}"
 
+    def save(self, *args, **kwargs):
+        # Satu transaksi dengan pembaruan MonthlyLedger dari signal post_save
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     @classmethod
     def get_financial_report(cls, month=None, year=None):
         """
         Logika inti untuk rekapitulasi 40/50/10
+        Dibaca dari satu baris MonthlyLedger yang selalu diperbarui saat
+        Invoice/Expense berubah (lihat administrasi/signals.py).
         """
-        from django.db.models import Sum
-        
         # Default ke bulan dan tahun berjalan jika tidak diisi
         now = timezone.now()
         month = month or now.month
         year = year or now.year
 
-        # Ambil total pendapatan (dari Invoice yang sudah dibayar)
-        total_income = Invoice.objects.filter(
-            correspondence__created_at__month=month,
-            correspondence__created_at__year=year,
-            is_paid=True
-        ).aggregate(total=Sum('paid_amount'))['total'] or Decimal('0')
+        ledger = MonthlyLedger.objects.filter(year=year, month=month).first()
+        return (ledger or MonthlyLedger(year=year, month=month)).as_report()
+
+
+# Alokasi laba bersih (40/50/10)
+PROFIT_ALLOCATION = {
+    'allocation_gaji': Decimal('0.40'),
+    'allocation_ops': Decimal('0.50'),
+    'allocation_sedekah': Decimal('0.10'),
+}
+
+
+class MonthlyLedger(models.Model):
+    """
+    Rekap keuangan per bulan (rollup).
+    Revenue = paid_amount invoice lunas menurut bulan terbit suratnya,
+    expenses = total Expense menurut tanggalnya.
+    """
+    year = models.PositiveIntegerField()
+    month = models.PositiveSmallIntegerField()
+
+    revenue = models.DecimalField(max_digits=17, decimal_places=2, default=0)
+    expenses = models.DecimalField(max_digits=17, decimal_places=2, default=0)
+    net_profit = models.DecimalField(max_digits=17, decimal_places=2, default=0)
+    allocation_gaji = models.DecimalField(max_digits=17, decimal_places=2, default=0)
+    allocation_ops = models.DecimalField(max_digits=17, decimal_places=2, default=0)
+    allocation_sedekah = models.DecimalField(max_digits=17, decimal_places=2, default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Rekap Keuangan Bulanan"
+        verbose_name_plural = "Rekap Keuangan Bulanan"
+        ordering = ['year', 'month']
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'month'], name='unique_ledger_year_month'),
+        ]
 
-        # Ambil total pengeluaran
-        total_expense = cls.objects.filter(
-            date__month=month,
-            date__year=year
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+    def __str__(self):
+        return f"{self.month:02d}/{self.year}: {self.net_profit}"
 
-        # Hitung Net Profit
-        net_profit = total_income - total_expense
+    def compute_derived(self):
+        """Hitung net profit dan alokasi 40/50/10 dari revenue dan expenses"""
+        self.net_profit = self.revenue - self.expenses
+        for field, ratio in PROFIT_ALLOCATION.items():
+            value = (self.net_profit * ratio).quantize(Decimal('1.00')) if self.net_profit > 0 else Decimal('0')
+            setattr(self, field, value)
 
-        # Alokasi (40/50/10)
+    def as_report(self):
         return {
-            'revenue': total_income,
-            'expenses': total_expense,
-            'net_profit': net_profit,
-            'allocation_gaji': net_profit * Decimal('0.40') if net_profit > 0 else 0,
-            'allocation_ops': net_profit * Decimal('0.50') if net_profit > 0 else 0,
-            'allocation_sedekah': net_profit * Decimal('0.10') if net_profit > 0 else 0,
-        }
\ No newline at end of file
+            'revenue': self.revenue,
+            'expenses': self.expenses,
+            'net_profit': self.net_profit,
+            **{field: getattr(self, field) for field in PROFIT_ALLOCATION},
+        }
+
+    @classmethod
+    def apply_delta(cls, year, month, revenue=Decimal('0'), expenses=Decimal('0')):
+        """
+        Tambahkan selisih revenue/expenses ke satu bulan secara atomik.
+        Increment memakai F() sehingga transaksi paralel tidak saling timpa;
+        nilai turunan dihitung ulang dari baris yang sedang terkunci.
+        """
+        if not revenue and not expenses:
+            return
+        row = cls.objects.filter(year=year, month=month)
+        with transaction.atomic():
+            updated = row.update(revenue=F('revenue') + revenue, expenses=F('expenses') + expenses)
+            if not updated:
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(year=year, month=month, revenue=revenue, expenses=expenses)
+                except IntegrityError:
+                    row.update(revenue=F('revenue') + revenue, expenses=F('expenses') + expenses)
+            ledger = row.get()
+            ledger.compute_derived()
+            ledger.save(update_fields=['net_profit', *PROFIT_ALLOCATION, 'updated_at'])
+
+    @classmethod
+    def rebuild(cls):
+        """Bangun ulang seluruh rekap dari Invoice dan Expense (untuk backfill/koreksi)"""
+        from django.db.models.functions import TruncMonth
+
+        totals = {}
+        revenue_rows = (
+            Invoice.objects.filter(is_paid=True)
+            .annotate(period=TruncMonth('correspondence__created_at'))
+            .values('period').annotate(total=models.Sum('paid_amount'))
+            .values_list('period', 'total')
+        )
+        for period, total in revenue_rows:
+            totals.setdefault((period.year, period.month), [Decimal('0'), Decimal('0')])[0] += total or 0
+
+        expense_rows = (
+            Expense.objects.annotate(period=TruncMonth('date'))
+            .values('period').annotate(total=models.Sum('amount'))
+            .values_list('period', 'total')
+        )
+        for period, total in expense_rows:
+            totals.setdefault((period.year, period.month), [Decimal('0'), Decimal('0')])[1] += total or 0
+
+        ledgers = []
+        for (year, month), (revenue, expenses) in sorted(totals.items()):
+            ledger = cls(year=year, month=month, revenue=revenue, expenses=expenses)
+            ledger.compute_derived()
+            ledgers.append(ledger)
+
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(ledgers)
+        return len(ledgers)
+
+
+class ChangeLog(models.Model):
+    """
+    Jejak perubahan baris untuk delta-sync tabel admin (?since=<cursor>).
+    Setiap simpan/hapus Customer, Correspondence, Invoice, dan Expense
+    menambah satu baris; `id` yang selalu naik dipakai sebagai cursor.
+    """
+    # object_id RELOAD = penanda perubahan massal: klien wajib memuat ulang penuh
+    RELOAD = 0
+    DELTA_LIMIT = 500
+
+    model = models.CharField(max_length=50)
+    object_id = models.PositiveBigIntegerField()
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Log Perubahan"
+        verbose_name_plural = "Log Perubahan"
+        indexes = [
+            models.Index(fields=['model', 'id'], name='changelog_model_id_idx'),
+            models.Index(fields=['created_at'], name='changelog_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.model}:{self.object_id}{' (hapus)' if self.deleted else ''}"
+
+    @classmethod
+    def record(cls, model, ids, deleted=False):
+        """
+        Catat perubahan banyak baris `model` sekaligus (dipakai juga oleh operasi massal).
+        Lebih dari DELTA_LIMIT baris cukup dicatat sebagai satu penanda RELOAD.
+        """
+        name = model._meta.model_name
+        ids = list(ids)
+        if len(ids) > cls.DELTA_LIMIT:
+            ids, deleted = [cls.RELOAD], False
+        cls.objects.bulk_create([cls(model=name, object_id=pk, deleted=deleted) for pk in ids])
+
+    @classmethod
+    def cursor(cls):
+        return cls.objects.aggregate(last=models.Max('id'))['last'] or 0
+
+    @classmethod
+    def changes_since(cls, model, since, limit=DELTA_LIMIT):
+        """
+        Perubahan `model` setelah cursor `since`: (cursor baru, id berubah, id terhapus).
+        Mengembalikan None jika klien harus memuat ulang penuh: cursor sudah
+        terpangkas (lihat prune), ada penanda RELOAD, atau perubahannya melebihi `limit`.
+        """
+        cursor = cls.cursor()
+        oldest = cls.objects.aggregate(first=models.Min('id'))['first']
+        if oldest is not None and since < oldest - 1:
+            return None
+
+        # Status terakhir per baris: simpan lalu hapus = tombstone, dan sebaliknya
+        latest = {}
+        entries = (
+            cls.objects.filter(model=model._meta.model_name, id__gt=since, id__lte=cursor)
+            .order_by('id').values_list('object_id', 'deleted')
+        )
+        for object_id, deleted in entries.iterator():
+            latest[object_id] = deleted
+            if object_id == cls.RELOAD or len(latest) > limit:
+                return None
+        changed = [pk for pk, deleted in latest.items() if not deleted]
+        removed = [pk for pk, deleted in latest.items() if deleted]
+        return cursor, changed, removed
+
+    @classmethod
+    def prune(cls, before):
+        """Hapus log lebih lama dari `before`; baris terbaru selalu disisakan sebagai cursor"""
+        last = cls.cursor()
+        return cls.objects.filter(created_at__lt=before, id__lt=last).delete()[0]
+
+
+class RenderJob(models.Model):
+    """
+    Antrean render DOCX/PDF arsip surat, disimpan di database agar tahan restart.
+    Diproses oleh `manage.py render_worker`; maksimal satu job PENDING per surat.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Menunggu'),
+        ('RUNNING', 'Diproses'),
+        ('FAILED', 'Gagal'),
+    ]
+    ENQUEUE_BATCH = 1000
+
+    correspondence = models.ForeignKey(Correspondence, on_delete=models.CASCADE, related_name='render_jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=32, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Antrean Render"
+        verbose_name_plural = "Antrean Render"
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='renderjob_status_run_idx'),
+        ]
+        constraints = [
+            # Perubahan beruntun pada satu surat cukup menghasilkan satu job menunggu
+            models.UniqueConstraint(
+                fields=['correspondence'], condition=Q(status='PENDING'), name='renderjob_one_pending',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Render {self.correspondence_id} ({self.status})"
+
+    @classmethod
+    def enqueue(cls, correspondence_ids):
+        """Jadwalkan render ulang; surat yang sudah punya job menunggu dilewati"""
+        ids = list(correspondence_ids)
+        for start in range(0, len(ids), cls.ENQUEUE_BATCH):
+            cls.objects.bulk_create(
+                [cls(correspondence_id=pk) for pk in ids[start:start + cls.ENQUEUE_BATCH]],
+                ignore_conflicts=True,
+            )
+
+    @classmethod
+    def enqueue_related(cls, model, ids):
+        """Jadwalkan surat yang hasil render-nya bergantung pada baris `model` ini"""
+        lookups = {Correspondence: 'pk__in', Customer: 'customer_id__in', DocumentType: 'doc_type_id__in'}
+        if model in lookups:
+            docs = Correspondence.objects.filter(**{lookups[model]: list(ids)}).values_list('id', flat=True)
+            cls.enqueue(docs.iterator(chunk_size=cls.ENQUEUE_BATCH))
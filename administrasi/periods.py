@@ -0,0 +1,110 @@
+import datetime
+
+from django.db import models
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+# Helper periode: filter bulan/tahun diubah menjadi rentang setengah-terbuka
+# [awal, akhir) pada kolom aslinya. Berbeda dengan lookup __month/__year
+# (yang dikompilasi menjadi strftime/EXTRACT per baris), rentang ini bisa
+# memakai index kolom tanggal.
+
+
+def month_bounds(year, month):
+    """Tanggal awal bulan dan awal bulan berikutnya"""
+    start = datetime.date(year, month, 1)
+    end = datetime.date(year + 1, 1, 1) if month == 12 else datetime.date(year, month + 1, 1)
+    return start, end
+
+
+def year_bounds(year):
+    return datetime.date(year, 1, 1), datetime.date(year + 1, 1, 1)
+
+
+def to_datetime(day):
+    """Awal hari `day` (00:00) di timezone proyek, sebagai datetime aware"""
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min), timezone.get_current_timezone())
+
+
+def _resolve_field(model, path):
+    # Ikuti relasi "a__b__c" sampai ke field terakhir
+    field = None
+    for name in path.split('__'):
+        field = model._meta.get_field(name)
+        if field.is_relation:
+            model = field.related_model
+    return field
+
+
+def filter_period(queryset, field, start, end):
+    """
+    Filter `queryset` pada rentang [start, end) untuk `field` (boleh lintas
+    relasi, misal 'correspondence__created_at'). start/end berupa date atau
+    None (tanpa batas); untuk DateTimeField batasnya dihitung di timezone proyek.
+    """
+    is_datetime = isinstance(_resolve_field(queryset.model, field), models.DateTimeField)
+    if start is not None:
+        queryset = queryset.filter(**{f'{field}__gte': to_datetime(start) if is_datetime else start})
+    if end is not None:
+        queryset = queryset.filter(**{f'{field}__lt': to_datetime(end) if is_datetime else end})
+    return queryset
+
+
+def filter_month(queryset, field, year, month):
+    return filter_period(queryset, field, *month_bounds(year, month))
+
+
+def parse_period(params):
+    """
+    Baca periode dari query string. Didukung:
+    ?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD (date_to inklusif), ?year=&month=, atau ?year=.
+    Mengembalikan (start, end) setengah-terbuka atau None jika tidak ada filter.
+    Melempar ValueError jika formatnya salah.
+    """
+    date_from, date_to = params.get('date_from'), params.get('date_to')
+    if date_from or date_to:
+        start = datetime.date.fromisoformat(date_from) if date_from else None
+        end = datetime.date.fromisoformat(date_to) + datetime.timedelta(days=1) if date_to else None
+        return start, end
+
+    year, month = params.get('year'), params.get('month')
+    if year and month:
+        return month_bounds(int(year), int(month))
+    if year:
+        return year_bounds(int(year))
+    return None
+
+
+def apply_period(queryset, field, params):
+    """parse_period + filter_period sekaligus untuk dipakai di view list"""
+    period = parse_period(params)
+    return filter_period(queryset, field, *period) if period else queryset
+
+
+def monthly_series(queryset, date_field, value_field, start, end):
+    """
+    Total `value_field` per bulan dalam [start, end) dengan satu scan ber-index
+    dan GROUP BY TruncMonth di timezone proyek. Hasil: {date(awal bulan): Decimal}.
+    """
+    is_datetime = isinstance(_resolve_field(queryset.model, date_field), models.DateTimeField)
+    tzinfo = timezone.get_current_timezone() if is_datetime else None
+    rows = (
+        filter_period(queryset, date_field, start, end)
+        .annotate(period=TruncMonth(date_field, tzinfo=tzinfo))
+        .values('period').annotate(total=models.Sum(value_field))
+        .values_list('period', 'total')
+    )
+    series = {}
+    for period, total in rows:
+        key = period.date() if isinstance(period, datetime.datetime) else period
+        series[key] = total or 0
+    return series
+
+
+def month_starts(start, end):
+    """Daftar tanggal awal bulan yang beririsan dengan [start, end)"""
+    months, current = [], datetime.date(start.year, start.month, 1)
+    while current < end:
+        months.append(current)
+        current = month_bounds(current.year, current.month)[1]
+    return months
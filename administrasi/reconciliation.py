@@ -0,0 +1,241 @@
+import hashlib
+import re
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from diginus.model_versions import bump_version
+
+from .models import BankMutation, ChangeLog, Invoice, MonthlyLedger
+from .tabular import CHUNK_SIZE, clean_amounts, parse_dates, read_chunks
+
+# Rekonsiliasi mutasi bank ke invoice yang belum lunas. Semua invoice terbuka
+# dimuat sekali ke indeks di memori (dict), lalu tiap kredit dicocokkan dengan
+# lookup hash: nomor invoice di berita transfer -> sisa tagihan yang sama persis
+# -> nama customer. Hasilnya diterapkan sekaligus dalam satu transaksi.
+
+MAX_ERRORS = 1000
+
+COLUMN_ALIASES = {
+    'date': 'date', 'tanggal': 'date', 'tgl': 'date', 'tanggal transaksi': 'date',
+    'description': 'description', 'keterangan': 'description', 'berita': 'description',
+    'catatan': 'description', 'remark': 'description',
+    'amount': 'amount', 'nominal': 'amount', 'kredit': 'amount', 'credit': 'amount', 'cr': 'amount',
+}
+REQUIRED_COLUMNS = ('date', 'description', 'amount')
+
+# Nomor surat di berita transfer, dengan pemisah apa pun: "001/INV/DIGINUS/IX/2026", "001 INV DIGINUS IX 2026"
+NUMBER_RE = re.compile(r'(\d{1,6})\W*([A-Z]{2,10})\W*DIGINUS\W*([IVX]{1,4})\W*(\d{4})', re.IGNORECASE)
+WORD_RE = re.compile(r'[a-z0-9]+')
+# Awalan badan usaha diabaikan saat mencocokkan nama perusahaan
+COMPANY_PREFIXES = {'pt', 'cv', 'ud', 'tbk', 'yayasan', 'koperasi'}
+MIN_NAME_LENGTH = 4
+MAX_NAME_WORDS = 5
+
+
+def _number_keys(text):
+    for number, code, month, year in NUMBER_RE.findall(text or ''):
+        yield f"{int(number):03d}/{code.upper()}/DIGINUS/{month.upper()}/{year}"
+
+
+def _name_key(text):
+    words = [w for w in WORD_RE.findall((text or '').lower()) if w not in COMPANY_PREFIXES]
+    return ' '.join(words)
+
+
+class _OpenInvoice:
+    __slots__ = ('id', 'version', 'grand_total', 'paid_before', 'was_paid', 'paid', 'created_at')
+
+    def __init__(self, pk, version, grand_total, paid_amount, is_paid, created_at):
+        self.id, self.version, self.grand_total = pk, version, grand_total
+        self.paid_before = self.paid = paid_amount
+        self.was_paid = is_paid
+        self.created_at = created_at
+
+    @property
+    def remaining(self):
+        return self.grand_total - self.paid
+
+    @property
+    def is_paid(self):
+        return self.remaining <= 0
+
+
+class InvoiceIndex:
+    """Indeks invoice belum lunas: per nomor surat, per sisa tagihan, dan per nama customer"""
+
+    def __init__(self, rows):
+        self.invoices = {}
+        self.by_number = {}
+        self.by_amount = defaultdict(set)
+        self.by_customer = defaultdict(set)
+        for pk, version, grand_total, paid, is_paid, number, created_at, name, company in rows:
+            invoice = _OpenInvoice(pk, version, grand_total, paid, is_paid, created_at)
+            self.invoices[pk] = invoice
+            self.by_number[number.upper()] = invoice
+            self.by_amount[invoice.remaining].add(pk)
+            for key in {_name_key(name), _name_key(company)}:
+                if len(key) >= MIN_NAME_LENGTH:
+                    self.by_customer[key].add(pk)
+
+    @classmethod
+    def load(cls):
+        rows = Invoice.objects.filter(is_paid=False).values_list(
+            'id', 'version', 'grand_total', 'paid_amount', 'is_paid',
+            'correspondence__formatted_number', 'correspondence__created_at',
+            'correspondence__customer__name', 'correspondence__customer__company',
+        )
+        return cls(rows.iterator(chunk_size=5000))
+
+    def _open(self, pk):
+        invoice = self.invoices[pk]
+        return None if invoice.is_paid else invoice
+
+    def match(self, description, amount):
+        """(invoice, metode) untuk satu kredit, atau (None, '') jika tidak ada yang pasti"""
+        for key in _number_keys(description):
+            invoice = self.by_number.get(key)
+            if invoice and not invoice.is_paid:
+                return invoice, 'NUMBER'
+
+        candidates = self.by_amount.get(amount)
+        if candidates and len(candidates) == 1:
+            return self.invoices[next(iter(candidates))], 'AMOUNT'
+
+        # Nama customer: cek setiap potongan 1..MAX_NAME_WORDS kata berurutan di berita transfer
+        words = _name_key(description).split()
+        found = set()
+        for size in range(1, MAX_NAME_WORDS + 1):
+            for start in range(len(words) - size + 1):
+                found |= self.by_customer.get(' '.join(words[start:start + size]), set())
+        open_ids = [pk for pk in found if self._open(pk)]
+        exact = [pk for pk in open_ids if self.invoices[pk].remaining == amount]
+        if len(exact) == 1 or len(open_ids) == 1:
+            return self.invoices[(exact or open_ids)[0]], 'CUSTOMER'
+        return None, ''
+
+    def pay(self, invoice, amount):
+        self.by_amount[invoice.remaining].discard(invoice.id)
+        invoice.paid += amount
+        if not invoice.is_paid:
+            self.by_amount[invoice.remaining].add(invoice.id)
+
+
+def _fingerprints(rows, seen):
+    """Hash per baris; baris identik dalam satu file dibedakan dengan urutan kemunculannya (`seen`)"""
+    for date, amount, description in rows:
+        base = f"{date.isoformat()}|{amount}|{description.strip().lower()}"
+        seen[base] += 1
+        yield hashlib.sha256(f"{base}|{seen[base]}".encode()).hexdigest()
+
+
+def _ledger_deltas(invoices):
+    """Selisih revenue per bulan terbit surat untuk invoice yang status/nominal lunasnya berubah"""
+    deltas = defaultdict(Decimal)
+    for invoice in invoices:
+        old = invoice.paid_before if invoice.was_paid else Decimal('0')
+        new = invoice.paid if invoice.is_paid else Decimal('0')
+        if old != new:
+            period = timezone.localtime(invoice.created_at)
+            deltas[period.year, period.month] += new - old
+    return deltas
+
+
+def apply_matches(mutations, touched):
+    """
+    Simpan mutasi dan pembayaran invoice dalam satu transaksi. Invoice yang
+    diubah orang lain sejak indeks dimuat (versi beda) tidak disentuh;
+    mutasinya dikembalikan ke antrean review.
+    """
+    with transaction.atomic():
+        # Tulis dulu (ambil lock) sebelum membaca versi terkini
+        ChangeLog.record(Invoice, [invoice.id for invoice in touched])
+        current = dict(
+            Invoice.objects.select_for_update()
+            .filter(pk__in=[invoice.id for invoice in touched]).values_list('id', 'version')
+        )
+        stale = {invoice.id for invoice in touched if current.get(invoice.id) != invoice.version}
+        for mutation in mutations:
+            if mutation.invoice_id in stale:
+                mutation.invoice, mutation.status, mutation.match_method = None, 'UNMATCHED', ''
+        fresh = [invoice for invoice in touched if invoice.id not in stale]
+
+        BankMutation.objects.bulk_create(mutations)
+        # Pelunasan pas (kasus terbanyak) cukup satu UPDATE; sisanya bulk_update (CASE per id)
+        settled = [invoice.id for invoice in fresh if invoice.paid == invoice.grand_total]
+        Invoice.objects.filter(pk__in=settled).update(
+            paid_amount=F('grand_total'), is_paid=True, version=F('version') + 1,
+        )
+        Invoice.objects.bulk_update([
+            Invoice(pk=invoice.id, paid_amount=invoice.paid, is_paid=invoice.is_paid, version=invoice.version + 1)
+            for invoice in fresh if invoice.paid != invoice.grand_total
+        ], ['paid_amount', 'is_paid', 'version'])
+        for (year, month), delta in sorted(_ledger_deltas(fresh).items()):
+            MonthlyLedger.apply_delta(year, month, revenue=delta)
+        bump_version(Invoice)
+    return stale
+
+
+def reconcile(fileobj, filename, chunk_size=CHUNK_SIZE, dry_run=False):
+    """
+    Cocokkan kredit di file mutasi bank dengan invoice terbuka dan terapkan
+    pembayarannya. Debit (nominal <= 0) diabaikan; baris yang sudah pernah
+    diproses (fingerprint sama) dilewati.
+    """
+    index = InvoiceIndex.load()
+    report = {'total': 0, 'matched': 0, 'unmatched': 0, 'ignored': 0, 'duplicates': 0,
+              'methods': Counter(), 'error_count': 0, 'errors': []}
+    mutations, touched, seen = [], {}, Counter()
+    first_row = 2  # baris 1 = header
+
+    for chunk in read_chunks(fileobj, filename, COLUMN_ALIASES, REQUIRED_COLUMNS, chunk_size):
+        description = chunk['description'].fillna('').astype(str).str.strip().str.slice(0, 255)
+        amount_text, amount = clean_amounts(chunk['amount'].fillna(''))
+        date = parse_dates(chunk['date'].fillna(''))
+        blank = description.eq('') & amount_text.eq('')
+        invalid = (date.isna() | amount.isna()) & ~blank & ~amount_text.eq('')
+
+        for position in invalid.to_numpy().nonzero()[0]:
+            report['error_count'] += 1
+            if len(report['errors']) < MAX_ERRORS:
+                report['errors'].append({'row': first_row + int(position), 'errors': ["Tanggal atau nominal tidak valid"]})
+        first_row += len(chunk)
+
+        # Kolom kredit kosong / nominal <= 0 = debit
+        credit = ~invalid & ~blank & amount.gt(0)
+        report['total'] += int((~blank).sum())
+        report['ignored'] += int((~blank & ~invalid & ~credit).sum())
+
+        rows = [
+            (day.date(), Decimal(txt).quantize(Decimal('0.01')), desc)
+            for day, txt, desc in zip(date[credit], amount_text[credit], description[credit])
+        ]
+        prints = list(_fingerprints(rows, seen))
+        existing = set(BankMutation.objects.filter(fingerprint__in=prints).values_list('fingerprint', flat=True))
+
+        for (day, value, desc), fingerprint in zip(rows, prints):
+            if fingerprint in existing:
+                report['duplicates'] += 1
+                continue
+            invoice, method = index.match(desc, value)
+            mutation = BankMutation(date=day, description=desc, amount=value, fingerprint=fingerprint)
+            if invoice:
+                index.pay(invoice, value)
+                touched[invoice.id] = invoice
+                mutation.invoice_id, mutation.status, mutation.match_method = invoice.id, 'MATCHED', method
+            mutations.append(mutation)
+
+    if not dry_run and mutations:
+        apply_matches(mutations, list(touched.values()))
+
+    for mutation in mutations:
+        if mutation.status == 'MATCHED':
+            report['matched'] += 1
+            report['methods'][mutation.match_method] += 1
+        else:
+            report['unmatched'] += 1
+    report['methods'] = dict(report['methods'])
+    return report
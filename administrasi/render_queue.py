@@ -0,0 +1,183 @@
+import datetime
+import os
+import subprocess
+import tempfile
+import uuid
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from diginus.model_versions import bump_version
+
+from .docx_engine import render_docx
+from .models import ChangeLog, Correspondence, RenderJob
+
+# Worker antrean render arsip surat (lihat RenderJob). Job diklaim per batch
+# dengan satu UPDATE bertanda `locked_by`, jadi beberapa worker bisa berjalan
+# bersamaan tanpa memproses job yang sama. Surat yang render_signature()-nya
+# sama dengan hasil terakhir dilewati tanpa render ulang.
+
+BATCH_SIZE = 20
+# Job RUNNING lebih lama dari ini dianggap ditinggal worker yang mati
+LOCK_TIMEOUT = datetime.timedelta(minutes=10)
+MAX_ATTEMPTS = 5
+RETRY_DELAY = datetime.timedelta(seconds=30)
+
+
+def get_pdf_converter():
+    """
+    Konverter PDF dari setting CORRESPONDENCE_PDF_CONVERTER (dotted path ke
+    callable `convert(docx_bytes, filename) -> pdf_bytes`), atau None jika
+    PDF tidak dibuat.
+    """
+    path = getattr(settings, 'CORRESPONDENCE_PDF_CONVERTER', None)
+    return import_string(path) if path else None
+
+
+def libreoffice_pdf(docx_bytes, filename):
+    """Konverter bawaan: LibreOffice headless (`soffice` harus terpasang di server worker)"""
+    with tempfile.TemporaryDirectory() as workdir:
+        source = os.path.join(workdir, filename)
+        with open(source, 'wb') as f:
+            f.write(docx_bytes)
+        subprocess.run(
+            [getattr(settings, 'LIBREOFFICE_BINARY', 'soffice'), '--headless', '--convert-to', 'pdf', '--outdir', workdir, source],
+            check=True, capture_output=True, timeout=120,
+        )
+        with open(os.path.splitext(source)[0] + '.pdf', 'rb') as f:
+            return f.read()
+
+
+def requeue_stale(now=None):
+    """Kembalikan job RUNNING milik worker yang mati ke antrean"""
+    now = now or timezone.now()
+    stale = RenderJob.objects.filter(status='RUNNING', locked_at__lt=now - LOCK_TIMEOUT)
+    with transaction.atomic():
+        # Surat yang sudah punya job menunggu cukup diwakili job itu
+        stale.filter(correspondence__render_jobs__status='PENDING').delete()
+        return stale.update(status='PENDING', locked_by='', locked_at=None)
+
+
+def claim(batch_size=BATCH_SIZE):
+    """Ambil sampai `batch_size` job siap jalan untuk worker ini"""
+    token, now = uuid.uuid4().hex, timezone.now()
+    ready = RenderJob.objects.filter(status='PENDING', run_after__lte=now).order_by('id').values('id')[:batch_size]
+    RenderJob.objects.filter(pk__in=ready, status='PENDING').update(
+        status='RUNNING', locked_by=token, locked_at=now, attempts=F('attempts') + 1,
+    )
+    return list(
+        RenderJob.objects.filter(locked_by=token, status='RUNNING')
+        .select_related('correspondence__customer', 'correspondence__doc_type')
+    )
+
+
+def _base_name(doc):
+    return f"{doc.doc_type.code}_{doc.number:03d}_{doc.created_at.year}"
+
+
+def _save_docx(doc, content):
+    # Hasil lama dihapus dulu agar nama file tetap sama (storage tidak menambah akhiran acak)
+    if doc.file_docx:
+        doc.file_docx.delete(save=False)
+    doc.file_docx.save(f'{_base_name(doc)}.docx', ContentFile(content), save=False)
+
+
+def render_correspondence(doc, converter=None):
+    """
+    Render DOCX (dan PDF jika ada konverter) satu surat lalu simpan ke
+    file_docx/file_pdf. Mengembalikan False jika hasil terakhir masih mutakhir.
+    """
+    if doc.doc_type.code == 'INV':
+        # PDF invoice dibuat dari template HTML invoice (lihat invoice_render.py)
+        converter = None
+    signature = doc.render_signature()
+    current = bool(doc.file_docx) and doc.rendered_signature == signature
+    if current and (doc.file_pdf or not converter):
+        return False
+
+    if current:
+        # DOCX arsip masih mutakhir (mis. dari unduhan massal): cukup buat PDF-nya
+        with doc.file_docx.open('rb') as f:
+            content = f.read()
+    else:
+        content = render_docx(doc.doc_type.template_docx.path, doc.template_context())
+    pdf = converter(content, f'{_base_name(doc)}.docx') if converter else None
+
+    # update() bukan save(): tidak memicu signal yang menjadwalkan render lagi.
+    # file_pdf hanya ditulis jika PDF dibuat di sini; nilai yang dibaca saat klaim
+    # bisa sudah usang (mis. PDF invoice yang sementara itu disimpan ensure_pdf)
+    fields = {}
+    if not current:
+        _save_docx(doc, content)
+        fields.update(file_docx=doc.file_docx.name, rendered_signature=signature)
+    if pdf is not None:
+        if doc.file_pdf:
+            doc.file_pdf.delete(save=False)
+        doc.file_pdf.save(f'{_base_name(doc)}.pdf', ContentFile(pdf), save=False)
+        fields['file_pdf'] = doc.file_pdf.name
+    Correspondence.objects.filter(pk=doc.pk).update(**fields)
+    return True
+
+
+def archive_rendered(docs, files):
+    """
+    Teruskan hasil render (nama file, bytes) sambil menyimpannya sebagai arsip
+    DOCX surat yang sama (urutan `files` mengikuti `docs`), jadi worker tidak
+    perlu merender ulang surat yang baru diunduh.
+    """
+    stored = []
+    try:
+        for doc, (filename, content) in zip(docs, files):
+            signature = doc.render_signature()
+            _save_docx(doc, content)
+            Correspondence.objects.filter(pk=doc.pk).update(file_docx=doc.file_docx.name, rendered_signature=signature)
+            stored.append(doc.pk)
+            yield filename, content
+    finally:
+        if stored:
+            # Tautan unduhan di tabel surat ikut berubah
+            with transaction.atomic():
+                ChangeLog.record(Correspondence, stored)
+                bump_version(Correspondence)
+
+
+def _fail(job, error):
+    """Jadwalkan ulang dengan jeda bertambah, atau tandai FAILED setelah MAX_ATTEMPTS"""
+    job.last_error, job.locked_by, job.locked_at = str(error)[:2000], '', None
+    if job.attempts >= MAX_ATTEMPTS:
+        job.status = 'FAILED'
+    else:
+        job.status = 'PENDING'
+        job.run_after = timezone.now() + RETRY_DELAY * 2 ** (job.attempts - 1)
+    try:
+        with transaction.atomic():
+            job.save(update_fields=['status', 'run_after', 'last_error', 'locked_by', 'locked_at'])
+    except IntegrityError:
+        # Sementara itu surat berubah lagi dan sudah punya job menunggu
+        job.delete()
+
+
+def process_batch(batch_size=BATCH_SIZE, converter=None):
+    """Proses satu batch; mengembalikan (jumlah job, dirender, gagal)"""
+    jobs = claim(batch_size)
+    rendered, done, failed = [], [], 0
+    for job in jobs:
+        try:
+            if render_correspondence(job.correspondence, converter):
+                rendered.append(job.correspondence_id)
+            done.append(job.pk)
+        except Exception as e:
+            failed += 1
+            _fail(job, e)
+
+    with transaction.atomic():
+        RenderJob.objects.filter(pk__in=done).delete()
+        if rendered:
+            # Tautan unduhan di tabel surat ikut berubah
+            ChangeLog.record(Correspondence, rendered)
+            bump_version(Correspondence)
+    return len(jobs), len(rendered), failed
@@ -0,0 +1,71 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Customer
+
+# Autocomplete customer. Di SQLite memakai index FTS5 administrasi_customer_fts
+# (lihat migrasi 0012) dengan pencocokan awalan per kata dan peringkat bm25;
+# database lain jatuh ke icontains biasa.
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Awalan sependek ini cocok dengan sebagian besar customer; menghitung bm25
+# untuk semuanya lambat, jadi hasilnya cukup diurutkan dari yang terbaru
+MIN_RANKED_PREFIX = 3
+
+# Bobot bm25 per kolom (name, company, email, whatsapp): nama paling relevan
+SEARCH_SQL = """
+    SELECT rowid FROM administrasi_customer_fts
+    WHERE administrasi_customer_fts MATCH %s
+    ORDER BY bm25(administrasi_customer_fts, 10.0, 5.0, 2.0, 1.0)
+    LIMIT %s
+"""
+RECENT_SQL = """
+    SELECT rowid FROM administrasi_customer_fts
+    WHERE administrasi_customer_fts MATCH %s
+    ORDER BY rowid DESC
+    LIMIT %s
+"""
+
+
+def fts_query(text):
+    """'budi maj' -> '"budi"* "maj"*' (semua kata wajib ada, masing-masing sebagai awalan)"""
+    return ' '.join(f'"{token}"*' for token in TOKEN_RE.findall(text.lower()))
+
+
+def search_customer_ids(text, limit=DEFAULT_LIMIT):
+    """Id customer paling relevan untuk `text`, terurut dari yang terbaik"""
+    tokens = TOKEN_RE.findall(text.lower())
+    if not tokens:
+        return []
+    if connection.vendor == 'sqlite':
+        sql = SEARCH_SQL if max(map(len, tokens)) >= MIN_RANKED_PREFIX else RECENT_SQL
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [fts_query(text), limit])
+            return [row[0] for row in cursor.fetchall()]
+
+    condition = Q()
+    for token in TOKEN_RE.findall(text):
+        condition &= (
+            Q(name__icontains=token) | Q(company__icontains=token)
+            | Q(email__icontains=token) | Q(whatsapp__icontains=token)
+        )
+    return list(Customer.objects.filter(condition).order_by('name').values_list('id', flat=True)[:limit])
+
+
+def search_customers(text, limit=DEFAULT_LIMIT):
+    """Hasil autocomplete: [{id, name, company, email, whatsapp}], tanpa query tambahan per baris"""
+    text = text.strip()
+    if not text:
+        # Belum mengetik: tampilkan customer terbaru
+        rows = Customer.objects.order_by('-id').values('id', 'name', 'company', 'email', 'whatsapp')[:limit]
+        return list(rows)
+
+    ids = search_customer_ids(text, limit)
+    rows = Customer.objects.filter(pk__in=ids).values('id', 'name', 'company', 'email', 'whatsapp')
+    by_id = {row['id']: row for row in rows}
+    return [by_id[pk] for pk in ids if pk in by_id]
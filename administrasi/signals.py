@@ -0,0 +1,182 @@
+from decimal import Decimal
+
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from diginus.model_versions import track
+
+from .models import ChangeLog, Correspondence, Customer, DocumentType, Expense, Invoice, MonthlyLedger, RenderJob
+
+
+# --- MONTHLY LEDGER ---
+# Setiap Invoice/Expense menyumbang nilai ke satu bulan. Saat disimpan atau
+# dihapus, hanya selisih sumbangan lama vs baru yang diterapkan ke MonthlyLedger,
+# di dalam transaksi yang sama dengan perubahan datanya.
+
+INVOICE_LEDGER_FIELDS = ('is_paid', 'paid_amount', 'correspondence')
+EXPENSE_LEDGER_FIELDS = ('date', 'amount')
+
+def _invoice_contribution(is_paid, paid_amount, correspondence_id):
+    """(tahun, bulan, revenue) untuk satu invoice, atau None jika tidak menyumbang"""
+    if not is_paid:
+        return None
+    created_at = Correspondence.objects.filter(pk=correspondence_id).values_list('created_at', flat=True).first()
+    if created_at is None:
+        return None
+    period = timezone.localtime(created_at)
+    return period.year, period.month, Invoice._meta.get_field('paid_amount').to_python(paid_amount) or Decimal('0')
+
+
+def _expense_contribution(date, amount):
+    date = Expense._meta.get_field('date').to_python(date)
+    return date.year, date.month, Expense._meta.get_field('amount').to_python(amount) or Decimal('0')
+
+
+def _touches(update_fields, fields):
+    # save(update_fields=[...]) yang tidak menyentuh kolom nominal bisa dilewati
+    return update_fields is None or bool(set(update_fields) & set(fields))
+
+
+def _apply_change(old, new, field):
+    """Terapkan selisih dua sumbangan (tahun, bulan, nilai) ke kolom `field`"""
+    if old == new:
+        return
+    if old:
+        MonthlyLedger.apply_delta(old[0], old[1], **{field: -old[2]})
+    if new:
+        MonthlyLedger.apply_delta(new[0], new[1], **{field: new[2]})
+
+
+@receiver(pre_save, sender=Invoice)
+def invoice_capture_old(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._ledger_old = None
+    if instance.pk and not raw and _touches(update_fields, INVOICE_LEDGER_FIELDS):
+        old = sender.objects.filter(pk=instance.pk).values_list('is_paid', 'paid_amount', 'correspondence_id').first()
+        if old:
+            instance._ledger_old = _invoice_contribution(*old)
+
+
+@receiver(post_save, sender=Invoice)
+def invoice_update_ledger(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not _touches(update_fields, INVOICE_LEDGER_FIELDS):
+        return
+    new = _invoice_contribution(instance.is_paid, instance.paid_amount, instance.correspondence_id)
+    _apply_change(getattr(instance, '_ledger_old', None), new, 'revenue')
+
+
+@receiver(pre_delete, sender=Invoice)
+def invoice_remove_from_ledger(sender, instance, **kwargs):
+    # pre_delete: baris surat masih ada walau penghapusan berasal dari cascade
+    old = _invoice_contribution(instance.is_paid, instance.paid_amount, instance.correspondence_id)
+    _apply_change(old, None, 'revenue')
+
+
+@receiver(pre_save, sender=Expense)
+def expense_capture_old(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._ledger_old = None
+    if instance.pk and not raw and _touches(update_fields, EXPENSE_LEDGER_FIELDS):
+        old = sender.objects.filter(pk=instance.pk).values_list('date', 'amount').first()
+        if old:
+            instance._ledger_old = _expense_contribution(*old)
+
+
+@receiver(post_save, sender=Expense)
+def expense_update_ledger(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not _touches(update_fields, EXPENSE_LEDGER_FIELDS):
+        return
+    _apply_change(getattr(instance, '_ledger_old', None), _expense_contribution(instance.date, instance.amount), 'expenses')
+
+
+@receiver(post_delete, sender=Expense)
+def expense_remove_from_ledger(sender, instance, **kwargs):
+    _apply_change(_expense_contribution(instance.date, instance.amount), None, 'expenses')
+
+
+# --- CHANGE LOG (delta-sync) ---
+# Setiap simpan/hapus dicatat agar tabel admin cukup mengambil baris yang
+# berubah sejak cursor terakhirnya. Operasi massal (bulk_create/bulk_update)
+# tidak memicu signal dan harus memanggil ChangeLog.record sendiri.
+
+CHANGE_LOG_MODELS = (Customer, Correspondence, Invoice, Expense)
+
+
+def log_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ChangeLog.record(sender, [instance.pk])
+
+
+def log_deleted(sender, instance, **kwargs):
+    ChangeLog.record(sender, [instance.pk], deleted=True)
+
+
+for _model in CHANGE_LOG_MODELS:
+    post_save.connect(log_saved, sender=_model, dispatch_uid=f'changelog_save_{_model._meta.model_name}')
+    post_delete.connect(log_deleted, sender=_model, dispatch_uid=f'changelog_delete_{_model._meta.model_name}')
+
+
+@receiver(post_save, sender=Customer)
+def customer_touch_documents(sender, instance, created, raw=False, **kwargs):
+    # Nama customer ikut tampil di tabel surat dan invoice
+    if created or raw:
+        return
+    ChangeLog.record(Correspondence, Correspondence.objects.filter(customer=instance).values_list('id', flat=True))
+    ChangeLog.record(Invoice, Invoice.objects.filter(correspondence__customer=instance).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Correspondence)
+def correspondence_touch_invoice(sender, instance, created, raw=False, **kwargs):
+    # Nomor dan penerima surat ikut tampil di tabel invoice
+    if created or raw:
+        return
+    ChangeLog.record(Invoice, Invoice.objects.filter(correspondence=instance).values_list('id', flat=True))
+
+
+# --- ANTREAN RENDER ARSIP ---
+# Surat dijadwalkan render ulang (manage.py render_worker) saat dibuat atau
+# saat masukan render-nya berubah: perihal, nama/perusahaan customer, atau
+# file template jenis surat. Worker sendiri menyimpan hasil lewat update(),
+# jadi tidak memicu signal ini lagi.
+
+RENDER_OUTPUT_FIELDS = {'file_docx', 'file_pdf', 'rendered_signature'}
+CUSTOMER_RENDER_FIELDS = ('name', 'company')
+
+
+@receiver(post_save, sender=Correspondence)
+def correspondence_enqueue_render(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields and set(update_fields) <= RENDER_OUTPUT_FIELDS):
+        return
+    RenderJob.enqueue([instance.pk])
+
+
+@receiver(pre_save, sender=Customer)
+def customer_capture_render_fields(sender, instance, raw=False, **kwargs):
+    instance._render_old = None
+    if instance.pk and not raw:
+        instance._render_old = sender.objects.filter(pk=instance.pk).values_list(*CUSTOMER_RENDER_FIELDS).first()
+
+
+@receiver(post_save, sender=Customer)
+def customer_enqueue_render(sender, instance, created, raw=False, **kwargs):
+    old = getattr(instance, '_render_old', None)
+    if old is not None and old != tuple(getattr(instance, f) for f in CUSTOMER_RENDER_FIELDS):
+        RenderJob.enqueue_related(Customer, [instance.pk])
+
+
+@receiver(pre_save, sender=DocumentType)
+def document_type_capture_template(sender, instance, raw=False, **kwargs):
+    instance._render_old = None
+    if instance.pk and not raw:
+        instance._render_old = sender.objects.filter(pk=instance.pk).values_list('template_docx', flat=True).first()
+
+
+@receiver(post_save, sender=DocumentType)
+def document_type_enqueue_render(sender, instance, created, raw=False, **kwargs):
+    old = getattr(instance, '_render_old', None)
+    if old is not None and old != instance.template_docx.name:
+        RenderJob.enqueue_related(DocumentType, [instance.pk])
+
+
+# --- VERSI MODEL (ETag) ---
+# Dilacak sejak app siap agar penulisan dari management command/worker ikut tercatat
+track(Customer, DocumentType, Correspondence, Invoice, Expense)
@@ -0,0 +1,152 @@
+import csv
+import io
+import numbers
+import zipfile
+
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+# Pembacaan file tabel (CSV/XLSX) per potongan untuk import data, plus parser
+# nominal dan tanggal yang divalidasi per kolom dengan pandas.
+
+CHUNK_SIZE = 1000
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d/%m/%y')
+
+
+def _normalize_columns(columns, aliases, required):
+    mapping = {}
+    for column in columns:
+        field = aliases.get(str(column or '').strip().lower())
+        if field and field not in mapping.values():
+            mapping[column] = field
+    missing = [name for name in required if name not in mapping.values()]
+    if missing:
+        raise ValueError(f"Kolom wajib tidak ditemukan: {', '.join(missing)}")
+    return mapping
+
+
+def _csv_chunks(fileobj, chunk_size):
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        delimiter = csv.Sniffer().sniff(sample, delimiters=',;\t|').delimiter
+    except csv.Error:
+        delimiter = ','
+    # Baris kosong tetap dibaca agar nomor baris di laporan error sesuai file
+    reader = pd.read_csv(text, sep=delimiter, dtype=str, keep_default_na=False, skip_blank_lines=False, chunksize=chunk_size)
+    for chunk in reader:
+        yield chunk
+    text.detach()
+
+
+def _open_workbook(fileobj, **kwargs):
+    # File rusak / bukan XLSX yang diberi nama .xlsx: error yang sama dengan format salah
+    try:
+        return load_workbook(fileobj, read_only=True, **kwargs)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError):
+        raise ValueError("File XLSX tidak valid")
+
+
+def _xlsx_chunks(fileobj, chunk_size):
+    # read_only: baris dibaca bertahap dari XML, bukan seluruh sheet ke memori
+    workbook = _open_workbook(fileobj, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                yield pd.DataFrame(batch, columns=header)
+                batch = []
+        if batch or not header:
+            yield pd.DataFrame(batch, columns=header)
+    finally:
+        workbook.close()
+
+
+def read_chunks(fileobj, filename, aliases, required, chunk_size=CHUNK_SIZE):
+    """
+    DataFrame per potongan dengan kolom yang sudah dinamai ulang lewat `aliases`
+    ({nama kolom huruf kecil: field}). Kolom opsional yang tidak ada diisi '';
+    field yang benar-benar ada di header tercatat di `chunk.attrs['fields']`.
+    ValueError jika format file tidak dikenal atau kolom `required` tidak ada.
+    """
+    ext = filename.rsplit('.', 1)[-1].lower()
+    if ext == 'csv':
+        chunks = _csv_chunks(fileobj, chunk_size)
+    elif ext == 'xlsx':
+        chunks = _xlsx_chunks(fileobj, chunk_size)
+    else:
+        raise ValueError("Format tidak didukung (gunakan .csv atau .xlsx)")
+
+    mapping = None
+    for chunk in chunks:
+        if mapping is None:
+            mapping = _normalize_columns(chunk.columns, aliases, required)
+        chunk = chunk[list(mapping)].rename(columns=mapping)
+        for field in set(aliases.values()) - set(mapping.values()):
+            chunk[field] = ''
+        chunk.attrs['fields'] = set(mapping.values())
+        yield chunk
+
+
+def count_rows(fileobj, filename):
+    """
+    Perkiraan jumlah baris data (tanpa header) untuk laporan progres, tanpa
+    mem-parse isinya: CSV dihitung per baris baru, XLSX dari dimensi sheet.
+    None jika tidak bisa diketahui. Posisi file dikembalikan ke awal.
+    """
+    ext = filename.rsplit('.', 1)[-1].lower()
+    try:
+        if ext == 'csv':
+            lines, last = 0, b'\n'
+            while block := fileobj.read(1024 * 1024):
+                lines += block.count(b'\n')
+                last = block[-1:]
+            return max(lines + (last != b'\n') - 1, 0)
+        if ext == 'xlsx':
+            try:
+                workbook = _open_workbook(fileobj)
+            except ValueError:
+                # Biarkan read_chunks yang melaporkan file rusak
+                return None
+            try:
+                max_row = workbook.active.max_row
+            finally:
+                workbook.close()
+            return max(max_row - 1, 0) if max_row else None
+        return None
+    finally:
+        fileobj.seek(0)
+
+
+def clean_amounts(values):
+    """
+    Nominal -> (teks desimal, angka). Sel angka dari XLSX dipakai apa adanya;
+    teks mendukung 'Rp 1.500.000', '1.500.000,50', '1500000.5', dan nilai negatif (debit).
+    """
+    is_number = values.map(lambda v: isinstance(v, numbers.Number) and not isinstance(v, bool))
+    raw = values.astype(str).str.strip()
+    text = raw.str.replace(r'[^\d,.\-]', '', regex=True)
+    decimal_comma = text.str.contains(r',\d{1,2}$', regex=True)
+    thousand_dots = text.str.fullmatch(r'-?\d{1,3}(\.\d{3})+')
+    text = text.where(~decimal_comma, text.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+    text = text.where(decimal_comma | ~thousand_dots, text.str.replace('.', '', regex=False))
+    text = text.where(decimal_comma | thousand_dots, text.str.replace(',', '', regex=False))
+    text = text.where(~is_number, raw)
+    return text, pd.to_numeric(text, errors='coerce')
+
+
+def parse_dates(values):
+    """Tanggal dari teks (YYYY-MM-DD, DD/MM/YYYY, DD-MM-YYYY, DD/MM/YY) atau sel tanggal XLSX; gagal -> NaT"""
+    text = values.astype(str).str.strip().str.split(' ').str[0].str.split('T').str[0]
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    for fmt in DATE_FORMATS:
+        todo = parsed.isna()
+        if not todo.any():
+            break
+        parsed[todo] = pd.to_datetime(text[todo], format=fmt, errors='coerce')
+    return parsed
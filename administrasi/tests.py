@@ -1,3 +1,917 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import zipfile
+from decimal import Decimal
+from unittest import skipIf
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import FileResponse
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from docx import Document
+from openpyxl import Workbook, load_workbook
+
+from . import docx_engine, invoice_render, periods, render_queue
+from .bulk import bulk_update
+from .dedupe import normalize_name, normalize_phone
+from .reconciliation import InvoiceIndex, apply_matches
+from .models import *
+
+
+def make_customer_and_type(code='UM'):
+    customer = Customer.objects.create(name='Budi', company='PT Maju', email=f'budi-{code}@example.com', whatsapp='628123456789')
+    doc_type = DocumentType.objects.create(name='Surat Penawaran', code=code, template_docx='templates/docs/TEMPLATE_SURAT_PENAWARAN.docx')
+    return customer, doc_type
+
+
+def issue_letters(customer_id, doc_type_id, count):
+    """Dijalankan di proses anak: terbitkan `count` surat lalu tutup koneksi"""
+    connections.close_all()
+    for i in range(count):
+        Correspondence.objects.create(customer_id=customer_id, doc_type_id=doc_type_id, subject=f'Surat {i}')
+    connections.close_all()
+
+
+class DocumentSequenceTest(TestCase):
+    def test_reserve_returns_consecutive_block(self):
+        self.assertEqual(list(DocumentSequence.reserve(2026)), [1])
+        self.assertEqual(list(DocumentSequence.reserve(2026, count=5)), [2, 3, 4, 5, 6])
+        self.assertEqual(list(DocumentSequence.reserve(2027)), [1])
+
+    def test_reserve_per_doc_type(self):
+        _, doc_type = make_customer_and_type()
+        DocumentSequence.reserve(2026, count=3)
+        self.assertEqual(list(DocumentSequence.reserve(2026, doc_type=doc_type)), [1])
+
+    def test_correspondence_number_format(self):
+        customer, doc_type = make_customer_and_type()
+        first = Correspondence.objects.create(customer=customer, doc_type=doc_type, subject='A')
+        second = Correspondence.objects.create(customer=customer, doc_type=doc_type, subject='B')
+        now = timezone.now()
+        self.assertEqual((first.number, second.number), (1, 2))
+        self.assertEqual(second.formatted_number, f"002/UM/DIGINUS/{ROMAN_MONTHS[now.month]}/{now.year}")
+
+
+@skipIf(connection.vendor == 'sqlite' and connection.is_in_memory_db(), "Butuh database test berbasis file")
+class DocumentSequenceConcurrencyTest(TransactionTestCase):
+    workers = 4
+    letters_per_worker = 500
+
+    def test_parallel_issuance_has_no_gaps_or_duplicates(self):
+        customer, doc_type = make_customer_and_type()
+        connections.close_all()
+
+        ctx = multiprocessing.get_context('fork')
+        procs = [
+            ctx.Process(target=issue_letters, args=(customer.id, doc_type.id, self.letters_per_worker))
+            for _ in range(self.workers)
+        ]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        self.assertTrue(all(p.exitcode == 0 for p in procs))
+
+        total = self.workers * self.letters_per_worker
+        numbers = sorted(Correspondence.objects.values_list('number', flat=True))
+        self.assertEqual(numbers, list(range(1, total + 1)))
+        self.assertEqual(Correspondence.objects.values('formatted_number').distinct().count(), total)
+        self.assertEqual(DocumentSequence.objects.get(year=timezone.now().year, doc_type=None).last_number, total)
+
+
+class DocxEngineTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'template.docx')
+
+        document = Document()
+        paragraph = document.add_paragraph('Nomor: ')
+        paragraph.add_run('{{num')
+        paragraph.add_run('ber}}').bold = True
+        paragraph.add_run(' Perihal: {{ subject }} {{unknown}}')
+        document.add_table(rows=1, cols=1).cell(0, 0).text = 'Kepada {{company}}'
+        document.save(self.path)
+
+    def render_text(self, context):
+        rendered = Document(io.BytesIO(docx_engine.render_docx(self.path, context)))
+        body = [p.text for p in rendered.paragraphs]
+        cells = [rendered.tables[0].cell(0, 0).text]
+        return body, cells, rendered
+
+    def test_render_replaces_split_placeholders_and_tables(self):
+        body, cells, rendered = self.render_text({'number': '001/UM', 'subject': 'A & B', 'company': 'PT Maju'})
+        self.assertEqual(body[-1], 'Nomor: 001/UM Perihal: A & B {{unknown}}')
+        self.assertEqual(cells, ['Kepada PT Maju'])
+        # Placeholder disatukan ke run tempat ia dimulai, run lain tetap
+        self.assertEqual([r.text for r in rendered.paragraphs[-1].runs][:2], ['Nomor: ', '001/UM'])
+
+    def test_template_is_compiled_once_per_mtime(self):
+        with override_settings(DOCX_TEMPLATE_CACHE_DIR=os.path.join(self.tmp.name, 'cache')):
+            first = docx_engine.get_template(self.path)
+            self.assertIs(docx_engine.get_template(self.path), first)
+            self.assertEqual(first.placeholders, {'number', 'subject', 'unknown', 'company'})
+
+            # Cache disk dipakai ulang oleh proses lain (memori kosong)
+            docx_engine._memory_cache.clear()
+            self.assertEqual(len(os.listdir(os.path.join(self.tmp.name, 'cache'))), 1)
+            self.assertEqual(docx_engine.get_template(self.path).placeholders, first.placeholders)
+
+            stat = os.stat(self.path)
+            os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+            self.assertIsNot(docx_engine.get_template(self.path), first)
+
+
+class BulkCorrespondenceTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        media = override_settings(MEDIA_ROOT=self.tmp.name, DOCX_TEMPLATE_CACHE_DIR=None)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        document = Document()
+        document.add_paragraph('Nomor: {{number}} untuk {{company}}')
+        document.save(os.path.join(self.tmp.name, 'template.docx'))
+
+        self.doc_type = DocumentType.objects.create(name='Surat Penawaran', code='UM', template_docx='template.docx')
+        self.customers = [
+            Customer.objects.create(name=f'Customer {i}', email=f'c{i}@example.com', whatsapp='628123456789')
+            for i in range(3)
+        ]
+
+    def test_bulk_issue_reserves_one_block(self):
+        Correspondence.objects.create(customer=self.customers[0], doc_type=self.doc_type, subject='Satuan')
+        docs = Correspondence.bulk_issue([c.id for c in self.customers], self.doc_type, 'Penawaran')
+        self.assertEqual([d.number for d in docs], [2, 3, 4])
+        self.assertTrue(all(d.pk for d in docs))
+        with self.assertRaises(Customer.DoesNotExist):
+            Correspondence.bulk_issue([999], self.doc_type, 'Penawaran')
+
+    def test_bulk_endpoint_streams_zip(self):
+        response = self.client.post(reverse('administrasi:api_docs_bulk'), {
+            'customer_ids[]': [c.id for c in self.customers],
+            'doc_type_id': self.doc_type.id,
+            'subject': 'Penawaran',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(archive.namelist(), ['UM_1.docx', 'UM_2.docx', 'UM_3.docx'])
+        rendered = Document(io.BytesIO(archive.read('UM_3.docx')))
+        self.assertIn('untuk Customer 2', rendered.paragraphs[-1].text)
+
+        # Hasil render ZIP sudah jadi arsip: worker tidak merender surat yang sama lagi
+        docs = Correspondence.objects.order_by('number')
+        self.assertTrue(all(doc.is_rendered for doc in docs))
+        self.assertEqual(docs[2].file_docx.read(), archive.read('UM_3.docx'))
+        self.assertEqual(render_queue.process_batch(), (3, 0, 0))
+
+
+class InvoiceTotalsTest(TestCase):
+    def setUp(self):
+        customer, doc_type = make_customer_and_type('INV')
+        doc = Correspondence.objects.create(customer=customer, doc_type=doc_type, subject='Invoice')
+        self.invoice = Invoice.objects.create(correspondence=doc)
+
+    def test_item_changes_update_stored_totals(self):
+        item = InvoiceItem.objects.create(invoice=self.invoice, description='Website', quantity=2, unit_price=Decimal('1500000'))
+        InvoiceItem.objects.create(invoice=self.invoice, description='Hosting', quantity=1, unit_price=Decimal('333333.33'))
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.subtotal, Decimal('3333333.33'))
+        self.assertEqual(self.invoice.tax_amount, Decimal('366666.67'))
+        self.assertEqual(self.invoice.grand_total, Decimal('3700000.00'))
+
+        item.delete()
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.grand_total, Decimal('370000.00'))
+
+    def test_upsert_and_batch_refresh(self):
+        self.client.post(reverse('administrasi:api_invoice_upsert'), {
+            'id': self.invoice.id, 'paid_amount': '111000',
+            'item_desc[]': ['Jasa'], 'item_qty[]': ['1'], 'item_price[]': ['100000'],
+        })
+        self.invoice.refresh_from_db()
+        self.assertEqual((self.invoice.grand_total, self.invoice.is_paid), (Decimal('111000.00'), True))
+
+        Invoice.objects.filter(pk=self.invoice.pk).update(subtotal=0, tax_amount=0, grand_total=0)
+        self.assertEqual(Invoice.refresh_totals([self.invoice.pk]), 1)
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.grand_total, Decimal('111000.00'))
+
+    def test_upsert_applies_item_diff_and_rejects_stale_version(self):
+        keep = InvoiceItem.objects.create(invoice=self.invoice, description='Website', unit_price=Decimal('100000'))
+        change = InvoiceItem.objects.create(invoice=self.invoice, description='Hosting', unit_price=Decimal('50000'))
+        drop = InvoiceItem.objects.create(invoice=self.invoice, description='Domain', unit_price=Decimal('20000'))
+        url = reverse('administrasi:api_invoice_upsert')
+        payload = {
+            'id': self.invoice.id, 'version': 0,
+            'item_id[]': [keep.id, change.id, ''],
+            'item_desc[]': ['Website', 'Hosting', 'Maintenance'],
+            'item_qty[]': ['1', '2', '1'],
+            'item_price[]': ['100000', '50000', '10000'],
+        }
+
+        response = self.client.post(url, payload)
+        self.assertEqual(response.json()['version'], 1)
+        items = dict(InvoiceItem.objects.filter(invoice=self.invoice).values_list('description', 'id'))
+        self.assertEqual(items['Website'], keep.id)
+        self.assertEqual(items['Hosting'], change.id)
+        self.assertNotIn('Domain', items)
+        self.assertFalse(InvoiceItem.objects.filter(pk=drop.pk).exists())
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.subtotal, Decimal('210000.00'))
+
+        # Form yang dibuka sebelum simpan di atas masih membawa version=0
+        self.assertEqual(self.client.post(url, payload).status_code, 409)
+
+
+class InvoiceListTest(TestCase):
+    def setUp(self):
+        customer, doc_type = make_customer_and_type('INV')
+        self.invoices = []
+        for price in ['100000', '300000', '200000']:
+            doc = Correspondence.objects.create(customer=customer, doc_type=doc_type, subject='Invoice')
+            invoice = Invoice.objects.create(correspondence=doc)
+            InvoiceItem.objects.create(invoice=invoice, description='Jasa', unit_price=Decimal(price))
+            self.invoices.append(invoice)
+
+    def test_summary_mode_pages_and_sorts_without_items(self):
+        response = self.client.get(reverse('administrasi:api_invoice_data'), {'page_size': 2, 'sort': '-total'})
+        json = response.json()
+        self.assertEqual(json['total'], 3)
+        self.assertEqual(json['summary']['total_amount'], 666000.0)
+        self.assertEqual([row['total_amount'] for row in json['data']], [333000.0, 222000.0])
+        self.assertNotIn('items', json['data'][0])
+
+        response = self.client.get(reverse('administrasi:api_invoice_data'), {'sort': 'bogus'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_items_endpoint(self):
+        invoice = self.invoices[1]
+        response = self.client.get(reverse('administrasi:api_invoice_items', args=[invoice.pk]))
+        item_id = invoice.items.get().id
+        self.assertEqual(response.json()['data'], [{'id': item_id, 'desc': 'Jasa', 'qty': 1, 'price': 300000.0, 'subtotal': 300000.0}])
+        self.assertEqual(self.client.get(reverse('administrasi:api_invoice_items', args=[999])).status_code, 404)
+
+
+class MonthlyLedgerTest(TestCase):
+    def setUp(self):
+        self.customer, doc_type = make_customer_and_type('INV')
+        self.doc = Correspondence.objects.create(customer=self.customer, doc_type=doc_type, subject='Invoice')
+        self.now = timezone.localtime(self.doc.created_at)
+
+    def ledger(self, year=None, month=None):
+        return MonthlyLedger.objects.get(year=year or self.now.year, month=month or self.now.month)
+
+    def test_invoice_and_expense_changes_are_rolled_up(self):
+        invoice = Invoice.objects.create(correspondence=self.doc, paid_amount=Decimal('1000000'), is_paid=True)
+        expense = Expense.objects.create(category='OPERASIONAL', title='Listrik', amount=Decimal('400000'), date=self.now.date())
+
+        ledger = self.ledger()
+        self.assertEqual((ledger.revenue, ledger.expenses, ledger.net_profit), (Decimal('1000000'), Decimal('400000'), Decimal('600000')))
+        self.assertEqual(ledger.allocation_gaji, Decimal('240000'))
+
+        # Pindah tanggal ke bulan lain: bulan lama berkurang, bulan baru bertambah
+        expense.date = '2020-01-15'
+        expense.save()
+        self.assertEqual(self.ledger().expenses, Decimal('0'))
+        self.assertEqual(self.ledger(2020, 1).expenses, Decimal('400000'))
+
+        invoice.is_paid = False
+        invoice.save()
+        self.assertEqual(self.ledger().revenue, Decimal('0'))
+
+        invoice.is_paid = True
+        invoice.save()
+        # Hapus lewat cascade dari surat tetap mengurangi revenue
+        self.doc.delete()
+        self.assertEqual(self.ledger().revenue, Decimal('0'))
+
+    def test_rebuild_matches_incremental_rollup_and_api(self):
+        Invoice.objects.create(correspondence=self.doc, paid_amount=Decimal('500000'), is_paid=True)
+        Expense.objects.create(category='GAJI', title='Gaji', amount=Decimal('800000'), date=self.now.date())
+        incremental = self.ledger().as_report()
+
+        self.assertEqual(MonthlyLedger.rebuild(), 1)
+        self.assertEqual(self.ledger().as_report(), incremental)
+        self.assertEqual(incremental['allocation_ops'], Decimal('0'))
+
+        response = self.client.get(reverse('administrasi:api_finance_range'), {'year': self.now.year, 'month': self.now.month, 'months': 2})
+        data = response.json()['data']
+        self.assertEqual([(d['month'], d['net_profit']) for d in data][0], (self.now.month, -300000.0))
+        self.assertEqual(data[1]['revenue'], 0.0)
+
+
+class PeriodQueryTest(TestCase):
+    def test_month_filter_is_half_open_range(self):
+        qs = periods.filter_month(Correspondence.objects.all(), 'created_at', 2026, 12)
+        sql = str(qs.query)
+        self.assertIn('"created_at" >= 2026-12-01 00:00:00', sql)
+        self.assertIn('"created_at" < 2027-01-01 00:00:00', sql)
+        self.assertNotIn('django_datetime_extract', sql)
+
+        qs = periods.apply_period(Expense.objects.all(), 'date', {'date_from': '2026-01-01', 'date_to': '2026-01-31'})
+        self.assertIn('"date" < 2026-02-01', str(qs.query))
+
+    def test_trend_groups_income_and_expenses_per_month(self):
+        customer, doc_type = make_customer_and_type('INV')
+        doc = Correspondence.objects.create(customer=customer, doc_type=doc_type, subject='Invoice')
+        Invoice.objects.create(correspondence=doc, paid_amount=Decimal('700000'), is_paid=True)
+        today = timezone.localdate()
+        Expense.objects.create(category='PAJAK', title='Pajak', amount=Decimal('100000'), date=today)
+        Expense.objects.create(category='PAJAK', title='Lama', amount=Decimal('50000'), date=today.replace(year=today.year - 3))
+
+        month_start = today.replace(day=1)
+        response = self.client.get(reverse('administrasi:api_finance_trend'), {'date_from': month_start.isoformat(), 'date_to': today.isoformat()})
+        self.assertEqual(response.json()['data'], [
+            {'month': today.strftime('%Y-%m'), 'revenue': 700000.0, 'expenses': 100000.0, 'net_profit': 600000.0},
+        ])
+        self.assertEqual(len(self.client.get(reverse('administrasi:api_finance_trend')).json()['data']), 13)
+
+
+class ReceivablesAgingTest(TestCase):
+    def test_unpaid_invoices_are_bucketed_per_customer(self):
+        customer, doc_type = make_customer_and_type('INV')
+        today = datetime.date(2026, 6, 30)
+        for days_late, price in [(None, '100'), (0, '200'), (10, '300'), (45, '400'), (75, '500'), (200, '600')]:
+            doc = Correspondence.objects.create(customer=customer, doc_type=doc_type, subject='Invoice')
+            due = today - datetime.timedelta(days=days_late) if days_late is not None else None
+            invoice = Invoice.objects.create(correspondence=doc, due_date=due)
+            InvoiceItem.objects.create(invoice=invoice, description='Jasa', unit_price=Decimal(price))
+        # Invoice lunas tidak ikut dihitung
+        Invoice.objects.filter(due_date=today - datetime.timedelta(days=200)).update(is_paid=True)
+
+        row = Invoice.aging_report(today).get()
+        self.assertEqual(row['invoice_count'], 5)
+        self.assertEqual(
+            [row[k] for k in ('current', 'd1_30', 'd31_60', 'd61_90', 'd90_plus', 'total')],
+            [Decimal('333'), Decimal('333'), Decimal('444'), Decimal('555'), Decimal('0'), Decimal('1665')],
+        )
+
+        response = self.client.get(reverse('administrasi:api_receivables_aging'), {'as_of': today.isoformat()})
+        self.assertEqual(response.json()['totals']['total'], 1665.0)
+        response = self.client.get(reverse('administrasi:export_receivables_aging'), {'as_of': today.isoformat()})
+        self.assertEqual(response['Content-Type'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+
+class CustomerDetailTest(TestCase):
+    def test_aggregates_use_fixed_number_of_queries(self):
+        customer, doc_type = make_customer_and_type('INV')
+        for price, paid in [('100000', '111000'), ('200000', '50000')]:
+            doc = Correspondence.objects.create(customer=customer, doc_type=doc_type, subject='Invoice')
+            invoice = Invoice.objects.create(correspondence=doc, paid_amount=Decimal(paid), is_paid=paid == '111000')
+            InvoiceItem.objects.create(invoice=invoice, description='Jasa', unit_price=Decimal(price))
+        Correspondence.objects.create(customer=customer, doc_type=doc_type, subject='Tanpa invoice')
+
+        url = reverse('administrasi:api_customer_detail', args=[customer.pk])
+        with self.assertNumQueries(2):
+            data = self.client.get(url).json()['data']
+        self.assertEqual((data['document_count'], data['invoice_count']), (3, 2))
+        self.assertEqual((data['total_billed'], data['total_paid'], data['outstanding']), (333000.0, 161000.0, 172000.0))
+        self.assertIsNone(data['documents'][0]['invoice'])
+        self.assertEqual(self.client.get(reverse('administrasi:api_customer_detail', args=[999])).status_code, 404)
+
+
+class DataTableTest(TestCase):
+    def setUp(self):
+        for name in ['Andi', 'Budi', 'Citra']:
+            Customer.objects.create(name=name, company=f'PT {name}', email=f'{name.lower()}@example.com', whatsapp='628')
+
+    def params(self, **extra):
+        params = {'draw': '3', 'start': '0', 'length': '2', 'order[0][column]': '1', 'order[0][dir]': 'asc'}
+        for i, name in enumerate(['secret', 'name', 'company']):
+            params[f'columns[{i}][data]'] = name
+        params.update(extra)
+        return params
+
+    def test_server_side_paging_search_and_order(self):
+        url = reverse('administrasi:api_customer_data')
+        data = self.client.get(url, self.params()).json()
+        self.assertEqual((data['draw'], data['recordsTotal'], data['recordsFiltered']), (3, 3, 3))
+        self.assertEqual([r['name'] for r in data['data']], ['Andi', 'Budi'])
+        # Kolom yang tidak terdaftar tidak bisa di-sort maupun diproyeksikan
+        data = self.client.get(url, self.params(**{'order[0][column]': '0'})).json()
+        self.assertNotIn('secret', data['data'][0])
+        self.assertEqual([r['name'] for r in data['data']], ['Citra', 'Budi'])
+
+        data = self.client.get(url, self.params(**{'search[value]': 'citra', 'order[0][dir]': 'desc'})).json()
+        self.assertEqual((data['recordsTotal'], data['recordsFiltered']), (3, 1))
+        self.assertEqual(data['data'][0]['name'], 'Citra')
+
+        # Klien lama tanpa draw tetap menerima seluruh baris
+        self.assertEqual(len(self.client.get(url).json()['data']), 3)
+
+
+class DeltaSyncTest(TestCase):
+    def setUp(self):
+        self.url = reverse('administrasi:api_expense_data')
+        self.rent = Expense.objects.create(category='OPERASIONAL', title='Sewa', amount=Decimal('100'), date=datetime.date(2024, 3, 1))
+        self.wifi = Expense.objects.create(category='OPERASIONAL', title='Wifi', amount=Decimal('50'), date=datetime.date(2024, 3, 2))
+
+    def test_since_returns_changed_rows_and_tombstones(self):
+        cursor = self.client.get(self.url).json()['cursor']
+        self.assertEqual(self.client.get(self.url, {'since': cursor}).json()['data'], [])
+
+        self.rent.title = 'Sewa kantor'
+        self.rent.save()
+        self.client.post(reverse('administrasi:api_delete', args=['expense', self.wifi.pk]))
+
+        delta = self.client.get(self.url, {'since': cursor}).json()
+        self.assertFalse(delta['reset'])
+        self.assertEqual([row['title'] for row in delta['data']], ['Sewa kantor'])
+        self.assertEqual(delta['deleted'], [self.wifi.pk])
+        # Baris yang keluar dari filter periode juga dikirim sebagai tombstone
+        delta = self.client.get(self.url, {'since': cursor, 'year': 2023}).json()
+        self.assertEqual(sorted(delta['deleted']), sorted([self.rent.pk, self.wifi.pk]))
+        self.assertEqual(self.client.get(self.url, {'since': 'x'}).status_code, 400)
+
+    def test_pruned_cursor_forces_reset(self):
+        cursor = ChangeLog.cursor()
+        self.rent.save()
+        self.wifi.save()
+        ChangeLog.prune(timezone.now() + datetime.timedelta(days=1))
+        self.assertEqual(ChangeLog.objects.count(), 1)
+        self.assertTrue(self.client.get(self.url, {'since': cursor}).json()['reset'])
+
+        # Perubahan massal dicatat sebagai satu penanda reload
+        cursor = ChangeLog.cursor()
+        ChangeLog.record(Expense, range(1, ChangeLog.DELTA_LIMIT + 2))
+        self.assertEqual(ChangeLog.cursor(), cursor + 1)
+        self.assertIsNone(ChangeLog.changes_since(Expense, cursor))
+
+    def test_invoice_delta_includes_summary(self):
+        customer, doc_type = make_customer_and_type('INV')
+        doc = Correspondence.objects.create(customer=customer, doc_type=doc_type, subject='Invoice')
+        invoice = Invoice.objects.create(correspondence=doc)
+        url = reverse('administrasi:api_invoice_data')
+        cursor = self.client.get(url).json()['cursor']
+
+        InvoiceItem.objects.create(invoice=invoice, description='Jasa', unit_price=Decimal('1000'))
+        delta = self.client.get(url, {'since': cursor}).json()
+        self.assertEqual([row['total_amount'] for row in delta['data']], [1110.0])
+        self.assertEqual(delta['summary']['total_amount'], 1110.0)
+
+
+@override_settings(MODEL_VERSION_CACHE='default')
+class ConditionalGetTest(TestCase):
+    def test_unchanged_data_answers_304_without_queries(self):
+        url = reverse('administrasi:api_customer_data')
+        with self.captureOnCommitCallbacks(execute=True):
+            Customer.objects.create(name='Andi', company='PT A', email='andi@example.com', whatsapp='628')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # Query string lain (paging/filter) punya ETag sendiri
+        self.assertEqual(self.client.get(url, {'draw': 1}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Customer.objects.create(name='Budi', company='PT B', email='budi@example.com', whatsapp='628')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['data']), 2)
+
+    def test_datatables_poll_ignores_draw_and_cache_buster(self):
+        url = reverse('administrasi:api_customer_data')
+        Customer.objects.create(name='Andi', company='PT A', email='andi@example.com', whatsapp='628')
+        params = {
+            'columns[0][data]': 'name', 'order[0][column]': '0', 'order[0][dir]': 'asc',
+            'start': '0', 'length': '10', 'search[value]': '',
+        }
+        first = self.client.get(url, {**params, 'draw': '1', '_': '1700000000000'})
+        self.assertEqual((first.status_code, first.json()['draw']), (200, 1))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {**params, 'draw': '2', '_': '1700000000001'}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual((response.status_code, response['X-DataTables-Draw']), (304, '2'))
+
+        # Halaman lain tetap punya ETag sendiri
+        response = self.client.get(url, {**params, 'start': '10', 'draw': '3', '_': '1'}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual((response.status_code, response.json()['draw']), (200, 3))
+
+
+class BulkApiTest(TestCase):
+    def test_bulk_delete_skips_protected_ids(self):
+        customer, used = make_customer_and_type('UM')
+        unused = DocumentType.objects.create(name='Kontrak', code='PKS', template_docx='templates/docs/pks.docx')
+        Correspondence.objects.create(customer=customer, doc_type=used, subject='Penawaran')
+
+        response = self.client.post(reverse('administrasi:api_bulk_delete', args=['type']), {'ids[]': [used.pk, unused.pk, 999]})
+        results = response.json()['results']
+        self.assertEqual(results[str(used.pk)]['status'], 'protected')
+        self.assertEqual(results[str(unused.pk)]['status'], 'deleted')
+        self.assertEqual(results['999']['status'], 'not_found')
+        self.assertTrue(DocumentType.objects.filter(pk=used.pk).exists())
+
+        # Cascade customer -> surat (dan antrean render-nya) ikut dihitung
+        response = self.client.post(reverse('administrasi:api_bulk_delete', args=['customer']), {'ids[]': [customer.pk]})
+        self.assertEqual(response.json()['deleted'], {
+            'administrasi.Customer': 1, 'administrasi.Correspondence': 1, 'administrasi.RenderJob': 1,
+        })
+
+    def test_bulk_update_whitelisted_fields(self):
+        expenses = [
+            Expense.objects.create(category='LAINNYA', title=f'Biaya {i}', amount=Decimal('10'), date=datetime.date(2024, 1, 1))
+            for i in range(3)
+        ]
+        url = reverse('administrasi:api_bulk_update', args=['expense'])
+        ids = [e.pk for e in expenses]
+        cursor = ChangeLog.cursor()
+        response = self.client.post(url, {'ids[]': ids, 'category': 'OPERASIONAL', 'amount': '0'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(Expense.objects.values_list('category', flat=True)), {'OPERASIONAL'})
+        # amount tidak termasuk field massal: rekap bulanan tetap utuh
+        self.assertEqual(MonthlyLedger.objects.get(year=2024, month=1).expenses, Decimal('30'))
+        self.assertEqual(sorted(ChangeLog.changes_since(Expense, cursor)[1]), ids)
+
+        self.assertEqual(self.client.post(url, {'ids[]': ids, 'category': 'XX'}).status_code, 400)
+
+
+class ExpenseImportTest(TestCase):
+    def ledger(self):
+        return {(l.year, l.month): l.expenses for l in MonthlyLedger.objects.all()}
+
+    def test_csv_import_reports_row_errors_and_keeps_ledger(self):
+        content = (
+            "Tanggal;Kategori;Keterangan;Nominal\n"
+            "2024-01-05;OPERASIONAL;Listrik;Rp 1.500.000\n"
+            "06/01/2024;Gaji Karyawan;Gaji Januari;-2.000.000,50\n"
+            "\n"
+            "2024-02-30;PAJAK;PPh;100000\n"
+            "2024-02-01;LISTRIK;;abc\n"
+            "2024-02-02;lainnya;Parkir;25000\n"
+        )
+        response = self.client.post(reverse('administrasi:api_expense_import'), {
+            'file': SimpleUploadedFile('mutasi.csv', content.encode(), content_type='text/csv'),
+        })
+        report = response.json()
+        self.assertEqual((report['total'], report['created'], report['error_count']), (5, 3, 2))
+        self.assertEqual([e['row'] for e in report['errors']], [5, 6])
+        self.assertEqual(len(report['errors'][1]['errors']), 3)
+        self.assertEqual(Expense.objects.get(title='Gaji Januari').amount, Decimal('2000000.50'))
+
+        imported = self.ledger()
+        MonthlyLedger.rebuild()
+        self.assertEqual(imported, self.ledger())
+        self.assertEqual(imported[(2024, 1)], Decimal('3500000.50'))
+
+    def test_xlsx_import_in_chunks(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['date', 'category', 'title', 'amount'])
+        for day in range(1, 26):
+            sheet.append([datetime.datetime(2024, 3, day), 'OPERASIONAL', f'Biaya {day}', 1000])
+        path = os.path.join(tempfile.mkdtemp(), 'biaya.xlsx')
+        workbook.save(path)
+
+        cursor = ChangeLog.cursor()
+        call_command('import_expenses', path, chunk_size=10, stdout=io.StringIO())
+        self.assertEqual(Expense.objects.count(), 25)
+        self.assertEqual(len(ChangeLog.changes_since(Expense, cursor)[1]), 25)
+        self.assertEqual(MonthlyLedger.objects.get(year=2024, month=3).expenses, Decimal('25000'))
+
+    def test_non_zip_xlsx_returns_400(self):
+        response = self.client.post(reverse('administrasi:api_expense_import'), {
+            'file': SimpleUploadedFile('biaya.xlsx', b'Tanggal;Kategori;Keterangan;Nominal\n'),
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'status': 'error', 'message': "File XLSX tidak valid"})
+        self.assertFalse(Expense.objects.exists())
+
+
+class ReconciliationTest(TestCase):
+    def setUp(self):
+        self.invoices = []
+        for code, name, company, price in [('INV', 'Budi', 'PT Maju', '100000'), ('INV', 'Sari', 'CV Sinar Terang', '200000'),
+                                           ('INV', 'Andi', 'PT Karya', '300000')]:
+            customer = Customer.objects.create(name=name, company=company, email=f'{name}@example.com', whatsapp='628123456789')
+            doc_type = DocumentType.objects.get_or_create(code=code, defaults={
+                'name': 'Invoice', 'template_docx': 'templates/docs/TEMPLATE_SURAT_PENAWARAN.docx',
+            })[0]
+            doc = Correspondence.objects.create(customer=customer, doc_type=doc_type, subject='Invoice')
+            invoice = Invoice.objects.create(correspondence=doc)
+            InvoiceItem.objects.create(invoice=invoice, description='Jasa', unit_price=Decimal(price))
+            invoice.refresh_from_db()
+            self.invoices.append(invoice)
+
+    def upload(self, content, **extra):
+        return self.client.post(reverse('administrasi:api_reconciliation_import'), {
+            'file': SimpleUploadedFile('mutasi.csv', content.encode(), content_type='text/csv'), **extra,
+        }).json()
+
+    def test_matches_by_number_amount_and_customer(self):
+        first, second, third = self.invoices
+        number = first.correspondence.formatted_number.replace('/', ' ')
+        content = (
+            "Tanggal,Keterangan,Kredit\n"
+            f"2026-10-01,TRF {number},111000\n"
+            "2026-10-02,TRANSFER DARI BANK LAIN,222000\n"
+            "2026-10-03,DP dari sinar terang,50000\n"
+            "2026-10-03,Biaya admin,-6500\n"
+            "2026-10-04,SETORAN TUNAI,999\n"
+        )
+        report = self.upload(content)
+        self.assertEqual((report['matched'], report['unmatched'], report['ignored']), (2, 2, 1))
+        self.assertEqual(report['methods'], {'NUMBER': 1, 'AMOUNT': 1})
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertTrue(first.is_paid and second.is_paid)
+        self.assertEqual(BankMutation.objects.filter(status='UNMATCHED').count(), 2)
+
+        # Impor ulang file yang sama tidak menggandakan pembayaran
+        report = self.upload(content)
+        self.assertEqual((report['duplicates'], report['matched']), (4, 0))
+
+        imported = {(l.year, l.month): l.revenue for l in MonthlyLedger.objects.all()}
+        MonthlyLedger.rebuild()
+        self.assertEqual(imported, {(l.year, l.month): l.revenue for l in MonthlyLedger.objects.all()})
+
+        unmatched = self.client.get(reverse('administrasi:api_reconciliation_unmatched')).json()['data']
+        self.assertEqual(len(unmatched), 2)
+        mutation = BankMutation.objects.get(description='SETORAN TUNAI')
+        self.client.post(reverse('administrasi:api_reconciliation_resolve', args=[mutation.pk]), {'ignore': '1'})
+        mutation = BankMutation.objects.get(description='DP dari sinar terang')
+        response = self.client.post(reverse('administrasi:api_reconciliation_resolve', args=[mutation.pk]),
+                                    {'invoice_id': third.pk})
+        self.assertFalse(response.json()['is_paid'])
+        third.refresh_from_db()
+        self.assertEqual(third.paid_amount, Decimal('50000'))
+        self.assertFalse(BankMutation.objects.filter(status='UNMATCHED').exists())
+
+    def test_customer_name_and_dry_run(self):
+        content = "date,description,amount\n2026-10-05,PEMBAYARAN CV SINAR TERANG,1000\n"
+        report = self.upload(content, dry_run='1')
+        self.assertEqual(report['methods'], {'CUSTOMER': 1})
+        self.assertFalse(BankMutation.objects.exists())
+
+    def test_stale_invoice_goes_back_to_review(self):
+        index = InvoiceIndex.load()
+        invoice, method = index.match('transfer', Decimal('111000'))
+        index.pay(invoice, Decimal('111000'))
+        Invoice.objects.filter(pk=invoice.id).update(version=F('version') + 1)
+        mutation = BankMutation(date=datetime.date(2026, 10, 1), amount=Decimal('111000'), fingerprint='x',
+                                invoice_id=invoice.id, status='MATCHED', match_method=method)
+        self.assertEqual(apply_matches([mutation], [invoice]), {invoice.id})
+        self.assertEqual(BankMutation.objects.get().status, 'UNMATCHED')
+        self.assertFalse(Invoice.objects.get(pk=invoice.id).is_paid)
+
+
+    def test_corrupt_xlsx_is_rejected(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as z:
+            z.writestr('bukan-workbook.txt', 'x')
+        for content in (b'Tanggal,Keterangan,Kredit\n', archive.getvalue()):
+            response = self.client.post(reverse('administrasi:api_reconciliation_import'), {
+                'file': SimpleUploadedFile('mutasi.xlsx', content),
+            })
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['message'], "File XLSX tidak valid")
+        self.assertFalse(BankMutation.objects.exists())
+
+
+class StreamingExportTest(TestCase):
+    def setUp(self):
+        customer, doc_type = make_customer_and_type('INV')
+        for subject, prices in [('Invoice A', ['100', '50']), ('Invoice B', [])]:
+            doc = Correspondence.objects.create(customer=customer, doc_type=doc_type, subject=subject)
+            invoice = Invoice.objects.create(correspondence=doc)
+            for price in prices:
+                InvoiceItem.objects.create(invoice=invoice, description=f'Jasa {price}', unit_price=Decimal(price))
+        Expense.objects.create(category='PAJAK', title='PPh', amount=Decimal('1000'), date=datetime.date(2024, 1, 5))
+        Expense.objects.create(category='GAJI', title='Gaji', amount=Decimal('5000'), date=datetime.date(2024, 2, 5))
+
+    def download(self, name, **params):
+        response = self.client.get(reverse(f'administrasi:{name}'), params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_invoice_formats(self):
+        lines = self.download('export_invoices', format='jsonl').decode().splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(len(records), 2)
+        self.assertEqual([item['unit_price'] for item in records[1]['items']], ['100.00', '50.00'])
+
+        # CSV: satu baris per item, invoice tanpa item tetap muncul
+        rows = list(csv.reader(io.StringIO(self.download('export_invoices', format='csv').decode('utf-8-sig'))))
+        self.assertEqual(len(rows), 1 + 3)
+        self.assertEqual(rows[0][0], 'Nomor Invoice')
+
+        workbook = load_workbook(io.BytesIO(self.download('export_invoices', format='xlsx', sort='number')))
+        self.assertEqual(workbook.active.max_row, 1 + 3)
+        self.assertEqual(self.client.get(reverse('administrasi:export_invoices'), {'format': 'pdf'}).status_code, 400)
+
+    def test_filters_match_list_apis(self):
+        rows = self.download('export_expenses', format='csv', year=2024, month=2).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(rows), 2)
+        self.assertIn('Gaji', rows[1])
+
+        content = self.download('export_correspondence', format='jsonl', **{'search[value]': 'Invoice B'})
+        self.assertEqual([json.loads(line)['subject'] for line in content.decode().splitlines()], ['Invoice B'])
+
+
+class CustomerSearchTest(TestCase):
+    def setUp(self):
+        Customer.objects.create(name='Budi Santoso', company='PT Maju Jaya', email='budi@majujaya.co.id', whatsapp='628111222333')
+        Customer.objects.create(name='Sari', company='CV Budiman', email='sari@example.com', whatsapp='628999000111')
+        Customer.objects.create(name='Andi', company='', email='andi@example.com', whatsapp='628555666777')
+
+    def names(self, q):
+        response = self.client.get(reverse('administrasi:api_customer_search'), {'q': q})
+        return [r['text'] for r in response.json()['results']]
+
+    def test_prefix_search_across_fields(self):
+        # Kecocokan di nama diberi bobot lebih tinggi daripada di perusahaan
+        self.assertEqual(self.names('bud'), ['Budi Santoso (PT Maju Jaya)', 'Sari (CV Budiman)'])
+        self.assertEqual(self.names('maju bu'), ['Budi Santoso (PT Maju Jaya)'])
+        self.assertEqual(self.names('6285556'), ['Andi'])
+        self.assertEqual(len(self.names('example com')), 2)
+        self.assertEqual(len(self.names('')), 3)
+        self.assertEqual(self.names('"*'), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        Customer.objects.filter(name='Andi').update(name='Andreas')
+        self.assertEqual(self.names('andr'), ['Andreas'])
+        Customer.objects.get(name='Andreas').delete()
+        self.assertEqual(self.names('andr'), [])
+        Customer.objects.bulk_create([Customer(name='Dewi', email='dewi@example.com', whatsapp='62812')])
+        self.assertEqual(self.names('dew'), ['Dewi'])
+
+
+class CustomerDedupeTest(TestCase):
+    def test_finds_and_merges_duplicates(self):
+        original, doc_type = make_customer_and_type('INV')  # Budi, PT Maju, 628123456789
+        copy = Customer.objects.create(name='Bpk. Budi', company='Maju', email='budi.maju@gmail.com',
+                                       whatsapp='0812-3456-789', address='Jl. Merdeka 1')
+        other = Customer.objects.create(name='Siti', company='PT Maju', email='siti@example.com', whatsapp='628777')
+        Customer.objects.create(name='Andi', company='CV Lain', email='andi@example.com', whatsapp='628999')
+        doc = Correspondence.objects.create(customer=copy, doc_type=doc_type, subject='Invoice')
+        invoice = Invoice.objects.create(correspondence=doc)
+        Correspondence.objects.create(customer=original, doc_type=doc_type, subject='Penawaran')
+
+        response = self.client.get(reverse('administrasi:api_customer_duplicates'))
+        groups = response.json()['data']
+        self.assertEqual(len(groups), 1)
+        self.assertEqual({c['id'] for c in groups[0]['customers']}, {original.pk, copy.pk})
+        self.assertNotIn(other.pk, [c['id'] for c in groups[0]['customers']])
+
+        cursor = ChangeLog.cursor()
+        response = self.client.post(reverse('administrasi:api_customer_merge'), {
+            'primary_id': original.pk, 'duplicate_ids[]': [copy.pk],
+        })
+        self.assertEqual(response.json()['moved_documents'], 1)
+        self.assertEqual(Correspondence.objects.filter(customer=original).count(), 2)
+        self.assertFalse(Customer.objects.filter(pk=copy.pk).exists())
+        original.refresh_from_db()
+        self.assertEqual(original.address, 'Jl. Merdeka 1')
+        self.assertIn(invoice.pk, ChangeLog.changes_since(Invoice, cursor)[1])
+
+        output = io.StringIO()
+        call_command('find_duplicate_customers', stdout=output)
+        self.assertIn('0 kelompok', output.getvalue())
+
+    def test_normalization(self):
+        self.assertEqual({normalize_phone(v) for v in ['+62 812-3456', '0812 3456', '8123456']}, {'628123456'})
+        self.assertEqual(normalize_name('PT. Maju Jaya, Tbk'), 'maju jaya')
+
+
+def fake_pdf(docx_bytes, filename):
+    return b'%PDF-' + filename.encode()
+
+
+class RenderQueueTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        media = override_settings(MEDIA_ROOT=self.tmp.name, DOCX_TEMPLATE_CACHE_DIR=None)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        document = Document()
+        document.add_paragraph('{{subject}} untuk {{company}}')
+        document.save(os.path.join(self.tmp.name, 'template.docx'))
+        self.doc_type = DocumentType.objects.create(name='Surat Penawaran', code='UM', template_docx='template.docx')
+        self.customer = Customer.objects.create(name='Budi', company='PT Maju', email='budi@example.com', whatsapp='62812')
+
+    def work(self):
+        return render_queue.process_batch(converter=fake_pdf)
+
+    def test_renders_once_and_only_when_inputs_change(self):
+        doc = Correspondence.objects.create(customer=self.customer, doc_type=self.doc_type, subject='Penawaran')
+        self.assertEqual(self.work(), (1, 1, 0))
+        doc.refresh_from_db()
+        self.assertTrue(doc.is_rendered)
+        self.assertEqual(doc.file_pdf.read(), b'%PDF-UM_001_' + str(doc.created_at.year).encode() + b'.docx')
+        self.assertFalse(RenderJob.objects.exists())
+
+        # Unduhan kini sekadar mengirim file arsip
+        response = self.client.get(reverse('administrasi:print_docx', args=[doc.pk]))
+        self.assertIsInstance(response, FileResponse)
+
+        # Simpan ulang tanpa perubahan isi: job dibuat tapi tidak dirender ulang
+        doc.save()
+        self.assertEqual(self.work(), (1, 0, 0))
+
+        self.customer.email = 'budi2@example.com'
+        self.customer.save()
+        self.assertFalse(RenderJob.objects.exists())
+
+        self.customer.company = 'PT Maju Jaya'
+        self.customer.save()
+        self.assertEqual(self.work(), (1, 1, 0))
+        doc.refresh_from_db()
+        rendered = Document(doc.file_docx.open('rb'))
+        self.assertIn('Penawaran untuk PT Maju Jaya', rendered.paragraphs[-1].text)
+
+    def test_bulk_paths_enqueue_and_failures_retry(self):
+        docs = Correspondence.bulk_issue([self.customer.pk], self.doc_type, 'Massal')
+        bulk_update(Correspondence, [docs[0].pk], {'subject': 'Massal (revisi)'})
+        self.assertEqual(RenderJob.objects.count(), 1)
+
+        os.remove(os.path.join(self.tmp.name, 'template.docx'))
+        self.assertEqual(self.work(), (1, 0, 1))
+        job = RenderJob.objects.get()
+        self.assertEqual((job.status, job.attempts), ('PENDING', 1))
+        self.assertGreater(job.run_after, timezone.now())
+        # Job yang menunggu jeda retry belum diklaim lagi
+        self.assertEqual(self.work(), (0, 0, 0))
+
+
+PDF_CALLS = []
+
+
+def fake_invoice_pdf(html):
+    PDF_CALLS.append(html)
+    return b'%PDF-' + str(len(PDF_CALLS)).encode()
+
+
+@override_settings(INVOICE_RENDER_CACHE='default', INVOICE_PDF_CONVERTER='administrasi.tests.fake_invoice_pdf')
+class InvoiceRenderTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        media = override_settings(MEDIA_ROOT=self.tmp.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        PDF_CALLS.clear()
+
+        customer, doc_type = make_customer_and_type('INV')
+        doc = Correspondence.objects.create(customer=customer, doc_type=doc_type, subject='Invoice')
+        self.invoice = Invoice.objects.create(correspondence=doc)
+        InvoiceItem.objects.create(invoice=self.invoice, description='Website', quantity=1, unit_price=Decimal('1000000'))
+
+    def test_html_cached_per_content_version(self):
+        url = reverse('administrasi:print_invoice', args=[self.invoice.pk])
+        self.assertContains(self.client.get(url), 'PT Maju')
+        invoice = invoice_render.INVOICE_QUERYSET.get(pk=self.invoice.pk)
+        version = invoice_render.content_version(invoice)
+        self.assertIsNotNone(invoice_render._cache().get(f'invoice-html:{invoice.pk}:{version}:web'))
+
+        # Perubahan customer menghasilkan versi (dan kunci cache) baru
+        Customer.objects.filter(pk=invoice.correspondence.customer_id).update(company='PT Maju Jaya')
+        self.assertContains(self.client.get(url), 'PT Maju Jaya')
+
+    def test_pdf_written_once_until_invoice_changes(self):
+        url = reverse('administrasi:invoice_pdf', args=[self.invoice.pk])
+        first = self.client.get(url)
+        self.assertEqual(b''.join(first.streaming_content), b'%PDF-1')
+        self.assertEqual(b''.join(self.client.get(url).streaming_content), b'%PDF-1')
+        self.assertEqual(len(PDF_CALLS), 1)
+        self.assertNotIn('Cetak Invoice', PDF_CALLS[0])
+
+        doc = Correspondence.objects.get(pk=self.invoice.correspondence_id)
+        self.assertTrue(doc.file_pdf.name.endswith('.pdf'))
+        name = doc.file_pdf.name
+
+        InvoiceItem.objects.create(invoice=self.invoice, description='Hosting', quantity=1, unit_price=Decimal('500000'))
+        self.assertEqual(b''.join(self.client.get(url).streaming_content), b'%PDF-2')
+        doc.refresh_from_db()
+        self.assertEqual(doc.file_pdf.name, name)
+
+    def test_render_worker_keeps_invoice_pdf_stored_meanwhile(self):
+        document = Document()
+        document.add_paragraph('{{number}}')
+        document.save(os.path.join(self.tmp.name, 'invoice.docx'))
+        DocumentType.objects.filter(code='INV').update(template_docx='invoice.docx')
+
+        # Worker membaca surat saat klaim, lalu PDF invoice disimpan sebelum worker menulis hasilnya
+        stale = Correspondence.objects.select_related('customer', 'doc_type').get(pk=self.invoice.correspondence_id)
+        self.client.get(reverse('administrasi:invoice_pdf', args=[self.invoice.pk]))
+        self.assertTrue(render_queue.render_correspondence(stale, converter=fake_pdf))
+
+        doc = Correspondence.objects.get(pk=self.invoice.correspondence_id)
+        self.assertTrue(doc.file_docx)
+        self.assertEqual(doc.file_pdf.read(), b'%PDF-1')
@@ -11,25 +11,47 @@ urlpatterns = [
     path('document-types/', views.document_type_list, name='document_type_list'),
     path('invoices/', views.invoice_list_page, name='invoice_list'),
     path('invoice/print/<int:pk>/', views.print_invoice, name='print_invoice'),
+    path('invoice/pdf/<int:pk>/', views.invoice_pdf, name='invoice_pdf'),
     path('finance/', views.finance_dashboard, name='finance_dashboard'),
 
+    # Ekspor streaming (?format=csv|jsonl|xlsx)
+    path('export/invoices/', views.export_invoices, name='export_invoices'),
+    path('export/correspondence/', views.export_correspondence, name='export_correspondence'),
+    path('export/expenses/', views.export_expenses, name='export_expenses'),
+
     # API CRUD (AJAX)
     path('api/customers/upsert/', views.api_customer_upsert, name='api_customer_upsert'),
     path('api/customers/data/', views.api_customer_data, name='api_customer_data'),
+    path('api/customers/search/', views.api_customer_search, name='api_customer_search'),
+    path('api/customers/duplicates/', views.api_customer_duplicates, name='api_customer_duplicates'),
+    path('api/customers/merge/', views.api_customer_merge, name='api_customer_merge'),
+    path('api/customers/<int:pk>/detail/', views.api_customer_detail, name='api_customer_detail'),
     
     path('api/docs/upsert/', views.api_correspondence_upsert, name='api_docs_upsert'),
     path('api/docs/data/', views.api_correspondence_data, name='api_docs_data'),
+    path('api/docs/bulk/', views.api_correspondence_bulk, name='api_docs_bulk'),
     
     path('api/types/upsert/', views.api_document_type_upsert, name='api_type_upsert'),
     path('api/types/data/', views.api_document_type_data, name='api_type_data'),
     
     path('api/expenses/upsert/', views.api_expense_upsert, name='api_expense_upsert'),
     path('api/expenses/data/', views.api_expense_data, name='api_expense_data'),
+    path('api/expenses/import/', views.api_expense_import, name='api_expense_import'),
     
     path('api/invoices/upsert/', views.api_invoice_upsert, name='api_invoice_upsert'),
     path('api/invoices/data/', views.api_invoice_data, name='api_invoice_data'),
+    path('api/invoices/<int:pk>/items/', views.api_invoice_items, name='api_invoice_items'),
+    path('api/reconciliation/import/', views.api_reconciliation_import, name='api_reconciliation_import'),
+    path('api/reconciliation/unmatched/', views.api_reconciliation_unmatched, name='api_reconciliation_unmatched'),
+    path('api/reconciliation/<int:pk>/resolve/', views.api_reconciliation_resolve, name='api_reconciliation_resolve'),
+    path('api/receivables/aging/', views.api_receivables_aging, name='api_receivables_aging'),
+    path('receivables/aging/export/', views.export_receivables_aging, name='export_receivables_aging'),
     path('api/finance/summary/', views.api_finance_summary, name='api_finance_summary'),
+    path('api/finance/range/', views.api_finance_range, name='api_finance_range'),
+    path('api/finance/trend/', views.api_finance_trend, name='api_finance_trend'),
 
     # Generic Delete
     path('api/delete/<str:model_name>/<int:pk>/', views.api_generic_delete, name='api_delete'),
+    path('api/bulk/<str:model_name>/delete/', views.api_bulk_delete, name='api_bulk_delete'),
+    path('api/bulk/<str:model_name>/update/', views.api_bulk_update, name='api_bulk_update'),
 ]
\ No newline at end of file
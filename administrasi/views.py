@@ -1,27 +1,57 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.http import FileResponse, JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.http import require_POST
 from django.utils import timezone
 from .models import *
-from django.db.models import Sum
+from django.db.models import Sum, Count, F, Q, Case, When, DecimalField
 from decimal import Decimal
 from django.db import transaction
+import datetime
 import io
-from docx import Document
+from openpyxl import Workbook
+from .docx_engine import render_docx
+from .docx_batch import correspondence_jobs, render_many, stream_zip
+from .periods import apply_period, parse_period, monthly_series, month_starts
+from .datatables import Column, DataTable, delta_payload
+from .bulk import bulk_delete, bulk_update, clean_values, parse_ids
+from .expense_import import import_expenses
+from .reconciliation import reconcile
+from .search import DEFAULT_LIMIT, MAX_LIMIT, search_customers
+from .dedupe import DEFAULT_THRESHOLD, find_duplicates, merge_customers
+from .invoice_render import INVOICE_QUERYSET, ensure_pdf, render_html
+from .render_queue import archive_rendered
+from .exports import (
+    CORRESPONDENCE_HEADERS, EXPENSE_HEADERS, INVOICE_HEADERS, correspondence_records, expense_records,
+    export_response, invoice_records, invoice_rows,
+)
+from django.core.files.storage import default_storage
+from django.core.exceptions import ValidationError
+from diginus.model_versions import conditional_on
 
 
 # --- HELPER: GENERIC DELETE ---
+ADMIN_MODELS = {
+    'customer': Customer,
+    'doc': Correspondence,
+    'type': DocumentType,
+    'expense': Expense,
+    'invoice': Invoice,
+}
+
+# Field yang aman diubah massal lewat queryset.update(): tidak memengaruhi
+# MonthlyLedger (nominal, tanggal, status lunas) maupun penomoran surat
+BULK_UPDATE_FIELDS = {
+    'customer': ('company', 'address'),
+    'doc': ('subject',),
+    'type': ('name',),
+    'expense': ('category', 'title', 'note'),
+    'invoice': ('invoice_type', 'due_date'),
+}
+
 @require_POST
 def api_generic_delete(request, model_name, pk):
     """Satu fungsi untuk menghapus semua jenis data secara aman"""
-    mapping = {
-        'customer': Customer,
-        'doc': Correspondence,
-        'type': DocumentType,
-        'expense': Expense,
-        'invoice': Invoice,
-    }
-    model = mapping.get(model_name)
+    model = ADMIN_MODELS.get(model_name)
     if not model:
         return JsonResponse({'status': 'error', 'message': 'Model tidak ditemukan'}, status=400)
     
@@ -29,14 +59,183 @@ def api_generic_delete(request, model_name, pk):
     obj.delete()
     return JsonResponse({'status': 'success', 'message': 'Data berhasil dihapus'})
 
+@require_POST
+def api_bulk_delete(request, model_name):
+    """Hapus banyak data sekaligus (ids[]); id yang masih dipakai (PROTECT) dilewati"""
+    model = ADMIN_MODELS.get(model_name)
+    if not model:
+        return JsonResponse({'status': 'error', 'message': 'Model tidak ditemukan'}, status=400)
+    try:
+        ids = parse_ids(request.POST.getlist('ids[]'))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Daftar id tidak valid'}, status=400)
+    if not ids:
+        return JsonResponse({'status': 'error', 'message': 'Tidak ada id yang dipilih'}, status=400)
+
+    results, deleted = bulk_delete(model, ids)
+    done = sum(1 for r in results.values() if r['status'] == 'deleted')
+    return JsonResponse({
+        'status': 'success',
+        'message': f"{done} dari {len(ids)} data dihapus",
+        'results': results,
+        'deleted': deleted,
+    })
+
+@require_POST
+def api_bulk_update(request, model_name):
+    """Ubah field yang sama untuk banyak data sekaligus (ids[] + nilai field)"""
+    model = ADMIN_MODELS.get(model_name)
+    if not model:
+        return JsonResponse({'status': 'error', 'message': 'Model tidak ditemukan'}, status=400)
+    try:
+        ids = parse_ids(request.POST.getlist('ids[]'))
+        values = clean_values(model, BULK_UPDATE_FIELDS[model_name], request.POST)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Daftar id tidak valid'}, status=400)
+    except ValidationError as e:
+        return JsonResponse({'status': 'error', 'message': '; '.join(e.messages)}, status=400)
+    if not ids or not values:
+        return JsonResponse({
+            'status': 'error',
+            'message': f"Pilih id dan isi minimal satu field: {', '.join(BULK_UPDATE_FIELDS[model_name])}",
+        }, status=400)
+
+    results = bulk_update(model, ids, values)
+    done = sum(1 for r in results.values() if r['status'] == 'updated')
+    return JsonResponse({'status': 'success', 'message': f"{done} dari {len(ids)} data diperbarui", 'results': results})
+
 
 # --- CUSTOMER MANAGEMENT ---
 def customer_list(request):
     return render(request, 'administrasi/customer_list.html')
 
+CUSTOMER_COLUMNS = {
+    'name': Column('name'),
+    'company': Column('company'),
+    'whatsapp': Column('whatsapp'),
+    'email': Column('email'),
+    'created_at': Column('created_at', searchable=False),
+}
+
+@conditional_on(Customer)
 def api_customer_data(request):
-    customers = list(Customer.objects.values().order_by('-created_at'))
-    return JsonResponse({'data': customers})
+    table = DataTable(
+        Customer.objects.all(), CUSTOMER_COLUMNS,
+        default_order=['-created_at', '-id'], extra_fields=['id', 'address'],
+    )
+    return table.response(request)
+
+def api_customer_search(request):
+    """Autocomplete customer (?q=&limit=), format hasil sesuai Select2: {results: [{id, text}]}"""
+    try:
+        limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Parameter limit tidak valid'}, status=400)
+
+    results = []
+    for c in search_customers(request.GET.get('q', ''), limit):
+        label = f"{c['name']} ({c['company']})" if c['company'] else c['name']
+        results.append({'id': c['id'], 'text': label, 'email': c['email'], 'whatsapp': c['whatsapp']})
+    return JsonResponse({'results': results})
+
+def api_customer_duplicates(request):
+    """Kelompok calon customer ganda (?threshold=0.8&limit=100) untuk direview sebelum merge"""
+    try:
+        threshold = float(request.GET.get('threshold', DEFAULT_THRESHOLD))
+        limit = min(max(int(request.GET.get('limit', 100)), 1), 1000)
+        if not 0 < threshold <= 1:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Parameter threshold/limit tidak valid'}, status=400)
+
+    groups, stats = find_duplicates(threshold)
+    return JsonResponse({'stats': stats, 'data': groups[:limit]})
+
+@require_POST
+def api_customer_merge(request):
+    """Gabungkan duplicate_ids[] ke primary_id; surat duplikat dipindah ke customer utama"""
+    try:
+        primary_id = int(request.POST.get('primary_id', ''))
+        duplicate_ids = parse_ids(request.POST.getlist('duplicate_ids[]'))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Id customer tidak valid'}, status=400)
+    if not duplicate_ids:
+        return JsonResponse({'status': 'error', 'message': 'Pilih customer duplikat yang akan digabung'}, status=400)
+
+    try:
+        result = merge_customers(primary_id, duplicate_ids)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=404)
+    return JsonResponse({
+        'status': 'success',
+        'message': f"{result['deleted_customers']} customer digabung, {result['moved_documents']} surat dipindahkan",
+        **result,
+    })
+
+def api_customer_detail(request, pk):
+    """
+    Ringkasan 360 satu customer: data kontak, total tagihan/dibayar/piutang,
+    dan daftar surat beserta ringkasan invoicenya. Selalu dua query, berapapun
+    jumlah surat customer tersebut.
+    """
+    try:
+        limit = min(max(int(request.GET.get('limit', 50)), 1), 500)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Parameter limit tidak valid'}, status=400)
+
+    unpaid_remaining = Case(
+        When(documents__invoice_detail__is_paid=False,
+             then=F('documents__invoice_detail__grand_total') - F('documents__invoice_detail__paid_amount')),
+        default=Decimal('0'),
+        output_field=DecimalField(max_digits=17, decimal_places=2),
+    )
+    # 1. Customer + agregat (relasi surat -> invoice 1:1, jadi SUM tidak terduplikasi)
+    customer = Customer.objects.filter(pk=pk).annotate(
+        document_count=Count('documents'),
+        invoice_count=Count('documents__invoice_detail'),
+        total_billed=Sum('documents__invoice_detail__grand_total'),
+        total_paid=Sum('documents__invoice_detail__paid_amount'),
+        outstanding=Sum(unpaid_remaining),
+    ).values(
+        'id', 'name', 'company', 'email', 'whatsapp', 'address', 'created_at',
+        'document_count', 'invoice_count', 'total_billed', 'total_paid', 'outstanding',
+    ).first()
+    if customer is None:
+        return JsonResponse({'status': 'error', 'message': 'Customer tidak ditemukan'}, status=404)
+
+    # 2. Surat terbaru beserta ringkasan invoice (LEFT JOIN, tanpa memuat item)
+    documents = Correspondence.objects.filter(customer_id=pk).order_by('-created_at').values(
+        'id', 'formatted_number', 'subject', 'created_at', 'doc_type__name',
+        'invoice_detail__id', 'invoice_detail__grand_total', 'invoice_detail__paid_amount',
+        'invoice_detail__is_paid', 'invoice_detail__due_date',
+    )[:limit]
+
+    to_float = lambda value: float(value or 0)
+    data = {
+        **{k: customer[k] for k in ('id', 'name', 'company', 'email', 'whatsapp', 'address')},
+        'created_at': customer['created_at'].strftime('%d/%m/%Y'),
+        'document_count': customer['document_count'],
+        'invoice_count': customer['invoice_count'],
+        'total_billed': to_float(customer['total_billed']),
+        'total_paid': to_float(customer['total_paid']),
+        'outstanding': to_float(customer['outstanding']),
+        'documents': [{
+            'id': d['id'],
+            'number': d['formatted_number'],
+            'type': d['doc_type__name'],
+            'subject': d['subject'],
+            'created_at': d['created_at'].strftime('%d/%m/%Y'),
+            'invoice': {
+                'id': d['invoice_detail__id'],
+                'total_amount': to_float(d['invoice_detail__grand_total']),
+                'paid_amount': to_float(d['invoice_detail__paid_amount']),
+                'remaining': to_float(d['invoice_detail__grand_total']) - to_float(d['invoice_detail__paid_amount']),
+                'is_paid': d['invoice_detail__is_paid'],
+                'due_date': d['invoice_detail__due_date'].strftime('%Y-%m-%d') if d['invoice_detail__due_date'] else '',
+            } if d['invoice_detail__id'] else None,
+        } for d in documents],
+    }
+    return JsonResponse({'data': data})
 
 @require_POST
 def api_customer_upsert(request):
@@ -50,7 +249,11 @@ def api_customer_upsert(request):
     }
     try:
         if pk:
-            Customer.objects.filter(pk=pk).update(**data)
+            # Lewat save() agar perubahan tercatat di ChangeLog (delta-sync)
+            customer = get_object_or_404(Customer, pk=pk)
+            for field, value in data.items():
+                setattr(customer, field, value)
+            customer.save()
             msg = "Data pelanggan diperbarui"
         else:
             Customer.objects.create(**data)
@@ -64,9 +267,16 @@ def api_customer_upsert(request):
 def document_type_list(request):
     return render(request, 'administrasi/document_type_list.html')
 
+DOCUMENT_TYPE_COLUMNS = {
+    'code': Column('code'),
+    'name': Column('name'),
+    'template_docx': Column('template_docx', searchable=False, orderable=False),
+}
+
+@conditional_on(DocumentType)
 def api_document_type_data(request):
-    types = list(DocumentType.objects.values('id', 'name', 'code', 'template_docx'))
-    return JsonResponse({'data': types})
+    table = DataTable(DocumentType.objects.all(), DOCUMENT_TYPE_COLUMNS, default_order=['id'], extra_fields=['id'])
+    return table.response(request)
 
 @require_POST
 def api_document_type_upsert(request):
@@ -93,28 +303,59 @@ def api_document_type_upsert(request):
 
 # --- CORRESPONDENCE MANAGEMENT ---
 def correspondence_list(request):
+    # Customer dicari lewat api_customer_search, tidak lagi disisipkan semua ke halaman
     context = {
-        'customers': Customer.objects.all(),
         'doc_types': DocumentType.objects.all()
     }
     return render(request, 'administrasi/correspondence_list.html', context)
 
+CORRESPONDENCE_COLUMNS = {
+    'number': Column('formatted_number'),
+    'customer': Column('customer__name'),
+    'type': Column('doc_type__name'),
+    'subject': Column('subject'),
+    'created_at': Column('created_at', searchable=False),
+}
+
+def _serialize_correspondence(row):
+    return {
+        'id': row['id'],
+        'number': row['formatted_number'],
+        'customer': row['customer__name'],
+        'type': row['doc_type__name'],
+        'invoice_id': row['invoice_detail__id'],
+        'subject': row['subject'],
+        'pdf_url': default_storage.url(row['file_pdf']) if row['file_pdf'] else None,
+        'docx_url': default_storage.url(row['file_docx']) if row['file_docx'] else None,
+        'created_at': row['created_at'].strftime('%d/%m/%Y'),
+    }
+
+def _correspondence_table(params):
+    # Filter periode opsional (?year=&month= atau ?date_from=&date_to=) sebagai rentang ber-index
+    docs = apply_period(Correspondence.objects.all(), 'created_at', params)
+    return DataTable(
+        docs, CORRESPONDENCE_COLUMNS, default_order=['-created_at', '-id'],
+        extra_fields=['id', 'invoice_detail__id', 'file_pdf', 'file_docx'],
+    )
+
+@conditional_on(Correspondence, Customer, DocumentType, Invoice)
 def api_correspondence_data(request):
-    docs = Correspondence.objects.select_related('customer', 'doc_type', 'invoice_detail').all().order_by('-created_at')
-    data = []
-    for d in docs:
-        data.append({
-            'id': d.id,
-            'number': d.formatted_number,
-            'customer': d.customer.name,
-            'type': d.doc_type.name,
-            'invoice_id': d.invoice_detail.id if hasattr(d, 'invoice_detail') else None,
-            'subject': d.subject,
-            'pdf_url': d.file_pdf.url if d.file_pdf else None,
-            'docx_url': d.file_docx.url if d.file_docx else None,
-            'created_at': d.created_at.strftime('%d/%m/%Y')
-        })
-    return JsonResponse({'data': data})
+    try:
+        table = _correspondence_table(request.GET)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Parameter periode tidak valid'}, status=400)
+    return table.response(request, _serialize_correspondence)
+
+def export_correspondence(request):
+    """Unduh arsip surat (?format=csv|jsonl|xlsx) dengan filter yang sama seperti tabel"""
+    try:
+        docs = _correspondence_table(request.GET).filtered(request.GET)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Parameter periode tidak valid'}, status=400)
+    return export_response(
+        request.GET.get('format', 'xlsx'), 'surat', 'Surat Keluar',
+        CORRESPONDENCE_HEADERS, correspondence_records(docs),
+    )
 
 @require_POST
 def api_correspondence_upsert(request):
@@ -145,50 +386,51 @@ def api_correspondence_upsert(request):
     except Exception as e:
         return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
 
+@require_POST
+def api_correspondence_bulk(request):
+    """Terbitkan surat untuk banyak customer sekaligus dan unduh sebagai ZIP"""
+    customer_ids = request.POST.getlist('customer_ids[]')
+    doc_type_id = request.POST.get('doc_type_id')
+    subject = request.POST.get('subject')
+
+    if not all([customer_ids, doc_type_id, subject]):
+        return JsonResponse({'status': 'error', 'message': 'Customer, Jenis Surat, dan Perihal harus diisi'}, status=400)
+
+    try:
+        doc_type = DocumentType.objects.get(pk=doc_type_id)
+        docs = Correspondence.bulk_issue(customer_ids, doc_type, subject)
+    except (DocumentType.DoesNotExist, Customer.DoesNotExist, ValueError) as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
+    # Render DOCX di process pool, ZIP dikirim per file tanpa ditampung utuh di memori.
+    # Hasilnya sekaligus disimpan sebagai arsip, jadi job di antrean render tinggal dilewati
+    response = StreamingHttpResponse(
+        stream_zip(archive_rendered(docs, render_many(correspondence_jobs(docs)))),
+        content_type='application/zip'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{doc_type.code}_{docs[0].number}-{docs[-1].number}.zip"'
+    return response
+
 def print_docx(request, pk):
     # 1. Ambil data surat berdasarkan ID
-    doc_obj = get_object_or_404(Correspondence, pk=pk)
-    
-    # 2. Ambil path file template dari model DocumentType
-    # doc_obj.doc_type.template_docx.path mengambil lokasi file di server
+    doc_obj = get_object_or_404(Correspondence.objects.select_related('customer', 'doc_type'), pk=pk)
+    filename = f"{doc_obj.doc_type.code}_{doc_obj.number}.docx"
+
+    # 2. Arsip yang sudah dirender worker (dan masih mutakhir) cukup dikirim apa adanya
+    if doc_obj.is_rendered:
+        return FileResponse(doc_obj.file_docx.open('rb'), as_attachment=True, filename=filename)
+
+    # 3. Belum ada / usang: render langsung dari template terkompilasi (di-cache
+    #    per path + mtime file) dan pastikan worker membuat arsipnya
     try:
-        template_path = doc_obj.doc_type.template_docx.path
-        document = Document(template_path)
+        content = render_docx(doc_obj.doc_type.template_docx.path, doc_obj.template_context())
     except Exception as e:
         return HttpResponse(f"Template tidak ditemukan: {e}", status=404)
+    RenderJob.enqueue([doc_obj.pk])
 
-    # 3. Mapping variabel sesuai dengan isi template penawaran Anda
-    replacements = {
-        '{{number}}': doc_obj.formatted_number, # [cite: 1]
-        '{{subject}}': doc_obj.subject,          # [cite: 2]
-        '{{company}}': doc_obj.customer.company or doc_obj.customer.name,  
-        '{{tanggal_surat}}': doc_obj.created_at.strftime('%d %B %Y'), 
-    }
-
-    # 4. Proses penggantian teks di semua paragraf
-    for paragraph in document.paragraphs:
-        for placeholder, value in replacements.items():
-            if placeholder in paragraph.text:
-                # Menjaga formatting asli template
-                paragraph.text = paragraph.text.replace(placeholder, str(value))
-
-    # 5. Proses penggantian teks di dalam tabel (jika ada tabel di template)
-    for table in document.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for paragraph in cell.paragraphs:
-                    for placeholder, value in replacements.items():
-                        if placeholder in paragraph.text:
-                            paragraph.text = paragraph.text.replace(placeholder, str(value))
-
-    # 6. Kirim file sebagai download stream
-    buffer = io.BytesIO()
-    document.save(buffer)
-    buffer.seek(0)
-
-    filename = f"{doc_obj.doc_type.code}_{doc_obj.number}.docx"
+    # 4. Kirim file sebagai download
     response = HttpResponse(
-        buffer.read(),
+        content,
         content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
     )
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
@@ -200,54 +442,180 @@ def print_docx(request, pk):
 def invoice_list_page(request):
     return render(request, 'administrasi/invoice_list.html')
 
+# Kolom yang boleh dipakai untuk sort di list invoice (parameter ?sort=, awali '-' untuk DESC)
+INVOICE_SORT_FIELDS = {
+    'number': 'correspondence__number',
+    'customer': 'correspondence__customer__name',
+    'total': 'grand_total',
+    'paid': 'paid_amount',
+    'remaining': 'remaining',
+    'due_date': 'due_date',
+    'is_paid': 'is_paid',
+    'created_at': 'correspondence__created_at',
+}
+
+INVOICE_FIELDS = (
+    'id', 'version', 'invoice_type', 'paid_amount', 'is_paid', 'due_date', 'grand_total', 'remaining',
+    'correspondence__formatted_number', 'correspondence__customer__name',
+)
+
+def _serialize_invoice(r):
+    return {
+        'id': r['id'],
+        'version': r['version'],
+        'number': r['correspondence__formatted_number'],
+        'customer': r['correspondence__customer__name'],
+        'total_amount': float(r['grand_total']), # Nilai setelah PPN 11%
+        'paid_amount': float(r['paid_amount']),
+        'remaining': float(r['remaining']),
+        'is_paid': r['is_paid'],
+        'invoice_type': r['invoice_type'],
+        'due_date': r['due_date'].strftime('%Y-%m-%d') if r['due_date'] else '',
+    }
+
+def _invoice_summary(invoices):
+    # Jumlah baris dan total nominal hasil filter dalam satu query agregat
+    summary = invoices.aggregate(
+        count=Count('id'),
+        total_amount=Sum('grand_total'),
+        paid_amount=Sum('paid_amount'),
+        remaining=Sum('remaining'),
+    )
+    return summary['count'], {
+        'total_amount': float(summary['total_amount'] or 0),
+        'paid_amount': float(summary['paid_amount'] or 0),
+        'remaining': float(summary['remaining'] or 0),
+    }
+
+def _filter_invoices(params):
+    """Pencarian (?q=) dan periode list invoice; ValueError jika periode tidak valid"""
+    invoices = Invoice.objects.annotate(remaining=F('grand_total') - F('paid_amount'))
+    invoices = apply_period(invoices, 'correspondence__created_at', params)
+    search = params.get('q', '').strip()
+    if search:
+        invoices = invoices.filter(
+            Q(correspondence__formatted_number__icontains=search) |
+            Q(correspondence__customer__name__icontains=search) |
+            Q(correspondence__customer__company__icontains=search)
+        )
+    return invoices
+
+@conditional_on(Invoice, Correspondence, Customer)
 def api_invoice_data(request):
-    # Gunakan prefetch_related agar loading data item lebih cepat
-    invoices = Invoice.objects.select_related('correspondence', 'correspondence__customer').prefetch_related('items').all()
-    data = []
-    
-    for inv in invoices:
-        # Susun daftar item untuk dikirim ke Modal Edit di Frontend
-        items_list = []
-        for item in inv.items.all():
-            items_list.append({
-                'desc': item.description,
-                'qty': item.quantity,
-                'price': float(item.unit_price),
-                'subtotal': float(item.subtotal)
-            })
-            
-        data.append({
-            'id': inv.id,
-            'number': inv.correspondence.formatted_number,
-            'customer': inv.correspondence.customer.name,
-            # Gunakan properti yang ada di models.py Anda
-            'total_amount': float(inv.grand_total), # Ini nilai setelah PPN 11%
-            'paid_amount': float(inv.paid_amount),
-            'remaining': float(inv.remaining_balance),
-            'is_paid': inv.is_paid,
-            'invoice_type': inv.invoice_type,
-            'due_date': inv.due_date.strftime('%Y-%m-%d') if inv.due_date else '',
-            'items': items_list 
-        })
-        
-    return JsonResponse({'data': data})
+    """
+    List invoice mode ringkas: hanya kolom tabel, dengan paging, pencarian,
+    dan sort di server. Item dimuat terpisah lewat api_invoice_items.
+    Dengan ?since=<cursor> hanya invoice yang berubah (plus ringkasan) yang dikirim.
+    """
+    sort = request.GET.get('sort', '-created_at')
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+        page_size = min(max(int(request.GET.get('page_size', 25)), 1), 100)
+        since = int(request.GET['since']) if 'since' in request.GET else None
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Parameter halaman tidak valid'}, status=400)
+
+    sort_field = INVOICE_SORT_FIELDS.get(sort.lstrip('-'))
+    if not sort_field:
+        return JsonResponse({'status': 'error', 'message': f'Kolom sort tidak dikenal: {sort}'}, status=400)
+
+    try:
+        invoices = _filter_invoices(request.GET)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Parameter periode tidak valid'}, status=400)
+
+    if since is not None:
+        payload = delta_payload(invoices, since, INVOICE_FIELDS, _serialize_invoice)
+        payload['total'], payload['summary'] = _invoice_summary(invoices)
+        return JsonResponse(payload)
+
+    cursor = ChangeLog.cursor()
+    total, summary = _invoice_summary(invoices)
+
+    direction = '-' if sort.startswith('-') else ''
+    offset = (page - 1) * page_size
+    rows = invoices.order_by(f'{direction}{sort_field}', f'{direction}id').values(*INVOICE_FIELDS)[offset:offset + page_size]
+
+    return JsonResponse({
+        'data': [_serialize_invoice(r) for r in rows],
+        'page': page,
+        'page_size': page_size,
+        'total': total,
+        'summary': summary,
+        'cursor': cursor,
+    })
+
+def export_invoices(request):
+    """Unduh invoice beserta item-nya (?format=csv|jsonl|xlsx), filter sama dengan list"""
+    sort = request.GET.get('sort', '-created_at')
+    sort_field = INVOICE_SORT_FIELDS.get(sort.lstrip('-'))
+    if not sort_field:
+        return JsonResponse({'status': 'error', 'message': f'Kolom sort tidak dikenal: {sort}'}, status=400)
+    try:
+        invoices = _filter_invoices(request.GET)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Parameter periode tidak valid'}, status=400)
+
+    direction = '-' if sort.startswith('-') else ''
+    invoices = invoices.order_by(f'{direction}{sort_field}', f'{direction}id')
+    return export_response(
+        request.GET.get('format', 'xlsx'), 'invoice', 'Invoice',
+        INVOICE_HEADERS, invoice_records(invoices), invoice_rows,
+    )
+
+def api_invoice_items(request, pk):
+    """Item satu invoice, dimuat saat modal edit dibuka"""
+    items = [{
+        'id': item.id,
+        'desc': item.description,
+        'qty': item.quantity,
+        'price': float(item.unit_price),
+        'subtotal': float(item.subtotal)
+    } for item in InvoiceItem.objects.filter(invoice_id=pk).order_by('id')]
+    if not items and not Invoice.objects.filter(pk=pk).exists():
+        return JsonResponse({'status': 'error', 'message': 'Data Invoice tidak ditemukan'}, status=404)
+    return JsonResponse({'data': items})
 
 @require_POST
 def api_invoice_upsert(request):
     pk = request.POST.get('id')
+    version = request.POST.get('version')
     invoice_type = request.POST.get('invoice_type', 'LUNAS')
     due_date = request.POST.get('due_date')
     paid_amount = request.POST.get('paid_amount') or 0
     
-    # Ambil data array dari form (dikirim oleh item_desc[], dll)
+    # Ambil data array dari form (dikirim oleh item_id[], item_desc[], dll)
+    item_ids = request.POST.getlist('item_id[]')
     item_descriptions = request.POST.getlist('item_desc[]')
     item_quantities = request.POST.getlist('item_qty[]')
     item_prices = request.POST.getlist('item_price[]')
 
     try:
+        rows = []
+        for i in range(len(item_descriptions)):
+            if item_descriptions[i].strip(): # Hanya simpan jika deskripsi tidak kosong
+                rows.append({
+                    'id': item_ids[i] if i < len(item_ids) else None,
+                    'description': item_descriptions[i],
+                    'quantity': int(item_quantities[i]),
+                    'unit_price': Decimal(item_prices[i]),
+                })
+
         # Gunakan transaction agar jika error, data tidak tersimpan setengah-setengah
         with transaction.atomic():
-            # 1. Cari atau buat Invoice Header
+            # 1. Optimistic concurrency: naikkan versi hanya jika belum diubah orang lain.
+            #    UPDATE ini juga query pertama di transaksi sehingga lock tulis langsung diambil.
+            invoices = Invoice.objects.filter(pk=pk)
+            if version not in (None, ''):
+                invoices = invoices.filter(version=int(version))
+            if not invoices.update(version=F('version') + 1):
+                if Invoice.objects.filter(pk=pk).exists():
+                    return JsonResponse({
+                        'status': 'error',
+                        'message': 'Invoice sudah diubah pengguna lain. Muat ulang data lalu coba lagi.'
+                    }, status=409)
+                raise Invoice.DoesNotExist
+
             # Note: Invoice biasanya sudah dibuat otomatis saat Correspondence dibuat
             invoice = Invoice.objects.get(pk=pk)
             
@@ -257,25 +625,10 @@ def api_invoice_upsert(request):
             if due_date:
                 invoice.due_date = due_date
             
-            # 3. Proses Item (Hapus item lama, lalu buat yang baru)
-            # Cara paling aman: Hapus semua item yang ada, lalu insert ulang dari form
-            invoice.items.all().delete()
-            
-            new_items = []
-            for i in range(len(item_descriptions)):
-                if item_descriptions[i].strip(): # Hanya simpan jika deskripsi tidak kosong
-                    new_items.append(InvoiceItem(
-                        invoice=invoice,
-                        description=item_descriptions[i],
-                        quantity=int(item_quantities[i]),
-                        unit_price=Decimal(item_prices[i])
-                    ))
-            
-            # Simpan semua item baru sekaligus (bulk create lebih efisien)
-            InvoiceItem.objects.bulk_create(new_items)
+            # 3. Proses Item: hanya baris yang berubah yang disentuh
+            invoice.sync_items(rows)
             
             # 4. Update status Lunas otomatis jika sisa = 0
-            # Kita panggil total_amount dari @property yang menghitung dari database terbaru
             if invoice.remaining_balance <= 0:
                 invoice.is_paid = True
             else:
@@ -285,7 +638,8 @@ def api_invoice_upsert(request):
 
             return JsonResponse({
                 'status': 'success', 
-                'message': 'Invoice dan item berhasil diperbarui'
+                'message': 'Invoice dan item berhasil diperbarui',
+                'version': invoice.version,
             })
 
     except Invoice.DoesNotExist:
@@ -294,13 +648,123 @@ def api_invoice_upsert(request):
         return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
 
 def print_invoice(request, pk):
-    # Mengambil data invoice beserta itemnya
-    invoice = get_object_or_404(Invoice, pk=pk)
-    
-    context = {
-        'invoice': invoice,
-    }
-    return render(request, 'administrasi/invoice_template.html', context)
+    # Item dan customer dimuat sekali; HTML diambil dari cache selama isi invoice tidak berubah
+    invoice = get_object_or_404(INVOICE_QUERYSET, pk=pk)
+    return HttpResponse(render_html(invoice))
+
+def invoice_pdf(request, pk):
+    # PDF dibuat sekali per versi isi invoice lalu disimpan di arsip surat
+    invoice = get_object_or_404(INVOICE_QUERYSET, pk=pk)
+    try:
+        pdf = ensure_pdf(invoice)
+    except Exception as e:
+        return HttpResponse(f"Gagal membuat PDF invoice: {e}", status=500)
+    filename = f"Invoice_{invoice.correspondence.formatted_number.replace('/', '-')}.pdf"
+    return FileResponse(pdf.open('rb'), as_attachment=True, filename=filename, content_type='application/pdf')
+
+# --- REKONSILIASI BANK ---
+@require_POST
+def api_reconciliation_import(request):
+    """Upload mutasi rekening (CSV/XLSX) lalu cocokkan kreditnya ke invoice terbuka"""
+    upload = request.FILES.get('file')
+    if not upload:
+        return JsonResponse({'status': 'error', 'message': 'File tidak ditemukan'}, status=400)
+    try:
+        report = reconcile(upload, upload.name, dry_run=request.POST.get('dry_run') in ('1', 'true'))
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse({
+        'status': 'success',
+        'message': f"{report['matched']} mutasi cocok, {report['unmatched']} menunggu review",
+        **report,
+    })
+
+BANK_MUTATION_COLUMNS = {
+    'date': Column('date', searchable=False),
+    'description': Column('description'),
+    'amount': Column('amount', searchable=False),
+}
+
+def api_reconciliation_unmatched(request):
+    """Antrean review: mutasi kredit yang belum cocok dengan invoice mana pun"""
+    table = DataTable(
+        BankMutation.objects.filter(status='UNMATCHED'), BANK_MUTATION_COLUMNS,
+        default_order=['-date', '-id'], extra_fields=['id'],
+    )
+    return table.response(request)
+
+@require_POST
+def api_reconciliation_resolve(request, pk):
+    """Selesaikan satu mutasi dari antrean: pasangkan ke invoice_id, atau ignore=1"""
+    mutation = get_object_or_404(BankMutation, pk=pk, status='UNMATCHED')
+    if request.POST.get('ignore') in ('1', 'true'):
+        mutation.status = 'IGNORED'
+        mutation.save(update_fields=['status'])
+        return JsonResponse({'status': 'success', 'message': 'Mutasi diabaikan'})
+
+    invoice = get_object_or_404(Invoice, pk=request.POST.get('invoice_id') or 0)
+    mutation.assign(invoice)
+    return JsonResponse({
+        'status': 'success',
+        'message': f"Mutasi dicatat sebagai pembayaran {invoice.correspondence.formatted_number}",
+        'is_paid': invoice.is_paid,
+    })
+
+
+# --- PIUTANG (AGING) ---
+AGING_BUCKETS = [
+    ('current', 'Belum Jatuh Tempo'),
+    ('d1_30', '1-30 Hari'),
+    ('d31_60', '31-60 Hari'),
+    ('d61_90', '61-90 Hari'),
+    ('d90_plus', '> 90 Hari'),
+]
+
+def _aging_as_of(request):
+    as_of = request.GET.get('as_of')
+    return datetime.date.fromisoformat(as_of) if as_of else timezone.localdate()
+
+def api_receivables_aging(request):
+    """Umur piutang per customer (?as_of=YYYY-MM-DD, default hari ini)"""
+    try:
+        as_of = _aging_as_of(request)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Format tanggal tidak valid'}, status=400)
+
+    rows = list(Invoice.aging_report(as_of))
+    keys = [key for key, _ in AGING_BUCKETS] + ['total']
+    totals = {key: float(sum(r[key] for r in rows)) for key in keys}
+    data = [{
+        'customer_id': r['customer_id'],
+        'customer': r['customer'],
+        'company': r['company'],
+        'invoice_count': r['invoice_count'],
+        **{key: float(r[key]) for key in keys},
+    } for r in rows]
+    return JsonResponse({'as_of': as_of.isoformat(), 'buckets': dict(AGING_BUCKETS), 'data': data, 'totals': totals})
+
+def export_receivables_aging(request):
+    """Unduh laporan umur piutang sebagai XLSX"""
+    try:
+        as_of = _aging_as_of(request)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Format tanggal tidak valid'}, status=400)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Umur Piutang")
+    ws.append([f"Umur Piutang per {as_of.strftime('%d/%m/%Y')}"])
+    ws.append(['Pelanggan', 'Perusahaan', 'Jumlah Invoice'] + [label for _, label in AGING_BUCKETS] + ['Total'])
+    for r in Invoice.aging_report(as_of).iterator():
+        ws.append(
+            [r['customer'], r['company'], r['invoice_count']]
+            + [float(r[key]) for key, _ in AGING_BUCKETS] + [float(r['total'])]
+        )
+
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    response = HttpResponse(buffer.getvalue(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    response['Content-Disposition'] = f'attachment; filename="umur_piutang_{as_of.isoformat()}.xlsx"'
+    return response
 
 # --- EXPENSE & DASHBOARD ---
 def finance_dashboard(request):
@@ -313,9 +777,113 @@ def api_finance_summary(request):
     data = {k: float(v) for k, v in report.items()}
     return JsonResponse(data)
 
+def api_finance_range(request):
+    """Rekap beberapa bulan sekaligus untuk grafik (?year=2026&month=1&months=12)"""
+    now = timezone.now()
+    try:
+        year = int(request.GET.get('year', now.year))
+        month = int(request.GET.get('month', 1))
+        months = min(max(int(request.GET.get('months', 12)), 1), 60)
+        if not 1 <= month <= 12:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Parameter periode tidak valid'}, status=400)
+
+    periods = []
+    for i in range(months):
+        index = year * 12 + (month - 1) + i
+        periods.append((index // 12, index % 12 + 1))
+
+    start_year, end_year = periods[0][0], periods[-1][0]
+    ledgers = {
+        (l.year, l.month): l
+        for l in MonthlyLedger.objects.filter(year__gte=start_year, year__lte=end_year)
+    }
+
+    data = []
+    for y, m in periods:
+        report = (ledgers.get((y, m)) or MonthlyLedger(year=y, month=m)).as_report()
+        data.append({'year': y, 'month': m, **{k: float(v) for k, v in report.items()}})
+    return JsonResponse({'data': data})
+
+def api_finance_trend(request):
+    """
+    Tren pemasukan & pengeluaran per bulan untuk rentang tanggal bebas
+    (?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD, default 12 bulan terakhir).
+    Tiap seri dihitung dengan satu scan rentang + GROUP BY bulan.
+    """
+    try:
+        period = parse_period(request.GET)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Parameter periode tidak valid'}, status=400)
+
+    today = timezone.localdate()
+    start, end = period or (None, None)
+    end = end or today + datetime.timedelta(days=1)
+    start = start or datetime.date(end.year - 1, end.month, 1)
+    if start >= end:
+        return JsonResponse({'status': 'error', 'message': 'Rentang tanggal tidak valid'}, status=400)
+
+    income = monthly_series(Invoice.objects.filter(is_paid=True), 'correspondence__created_at', 'paid_amount', start, end)
+    expense = monthly_series(Expense.objects.all(), 'date', 'amount', start, end)
+
+    data = []
+    for month_start in month_starts(start, end):
+        revenue = income.get(month_start, 0)
+        expenses = expense.get(month_start, 0)
+        data.append({
+            'month': month_start.strftime('%Y-%m'),
+            'revenue': float(revenue),
+            'expenses': float(expenses),
+            'net_profit': float(revenue - expenses),
+        })
+    return JsonResponse({'date_from': start.isoformat(), 'date_to': (end - datetime.timedelta(days=1)).isoformat(), 'data': data})
+
+EXPENSE_COLUMNS = {
+    'date': Column('date', searchable=False),
+    'category': Column('category', lookup='exact'),
+    'title': Column('title'),
+    'amount': Column('amount', searchable=False),
+}
+
+def _expense_table(params):
+    expenses = apply_period(Expense.objects.all(), 'date', params)
+    return DataTable(expenses, EXPENSE_COLUMNS, default_order=['-date', '-id'], extra_fields=['id', 'note'])
+
+@conditional_on(Expense)
 def api_expense_data(request):
-    expenses = list(Expense.objects.values().order_by('-date'))
-    return JsonResponse({'data': expenses})
+    try:
+        table = _expense_table(request.GET)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Parameter periode tidak valid'}, status=400)
+    return table.response(request)
+
+def export_expenses(request):
+    """Unduh riwayat pengeluaran (?format=csv|jsonl|xlsx) dengan filter yang sama seperti tabel"""
+    try:
+        expenses = _expense_table(request.GET).filtered(request.GET)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Parameter periode tidak valid'}, status=400)
+    return export_response(
+        request.GET.get('format', 'xlsx'), 'pengeluaran', 'Pengeluaran',
+        EXPENSE_HEADERS, expense_records(expenses),
+    )
+
+@require_POST
+def api_expense_import(request):
+    """Import pengeluaran dari file CSV/XLSX (field 'file'); ?dry_run=1 hanya memvalidasi"""
+    upload = request.FILES.get('file')
+    if not upload:
+        return JsonResponse({'status': 'error', 'message': 'File tidak ditemukan'}, status=400)
+    try:
+        report = import_expenses(upload, upload.name, dry_run=request.POST.get('dry_run') in ('1', 'true'))
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse({
+        'status': 'success',
+        'message': f"{report['created']} pengeluaran diimport, {report['error_count']} baris bermasalah",
+        **report,
+    })
 
 @require_POST
 def api_expense_upsert(request):
@@ -341,7 +909,11 @@ def api_expense_upsert(request):
         }
         
         if pk and pk.strip():
-            Expense.objects.filter(pk=pk).update(**data)
+            # Simpan lewat instance (bukan queryset.update) agar MonthlyLedger ikut diperbarui
+            expense = Expense.objects.get(pk=pk)
+            for field, value in data.items():
+                setattr(expense, field, value)
+            expense.save()
             msg = "Data diperbarui"
         else:
             Expense.objects.create(**data)
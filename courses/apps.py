@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CoursesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'courses'
+
+    def ready(self):
+        # Versi model untuk ETag API list (lihat diginus/model_versions.py)
+        from diginus.model_versions import track
+        from .models import Answer, Category, Course, Lesson, Module, Question, Quiz
+        track(Category, Course, Module, Lesson, Quiz, Question, Answer)
@@ -3,12 +3,14 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
 from .models import *
+from diginus.model_versions import conditional_on
 
 # --- 1. View untuk Me-render Halaman (HTML) ---
 # @login_required
 def category_page(request):
     return render(request, 'courses/category_list.html')
 
+@conditional_on(Category)
 def api_category_list(request):
     """Mengambil semua kategori untuk ditampilkan di tabel"""
     categories = Category.objects.all().order_by('-id')
@@ -67,6 +69,7 @@ def course_page(request):
 
 # --- API VIEWS ---
 
+@conditional_on(Course, Category)
 def api_course_list(request):
     courses = Course.objects.all().order_by('-created_at')
     data = []
@@ -144,6 +147,7 @@ def course_curriculum_page(request, course_id):
     return render(request, 'courses/curriculum.html', {'course': course})
 
 # --- MODULE API ---
+@conditional_on(Module, Lesson)
 def api_module_list(request, course_id):
     modules = Module.objects.filter(course_id=course_id).order_by('order')
     data = []
@@ -208,6 +212,7 @@ def quiz_detail_page(request, module_id):
     )
     return render(request, 'courses/quiz.html', {'quiz': quiz, 'module': module})
 
+@conditional_on(Quiz, Question, Answer)
 def api_quiz_data(request, quiz_id):
     quiz = get_object_or_404(Quiz, id=quiz_id)
     questions = []
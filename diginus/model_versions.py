@@ -0,0 +1,131 @@
+import datetime
+import hashlib
+import json
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+# Registry versi per model untuk conditional GET (ETag/Last-Modified).
+# Setiap simpan/hapus model yang dilacak mengganti versinya dengan timestamp
+# baru (setelah commit). View yang dibungkus `conditional_on` menghitung ETag
+# hanya dari versi ini, sehingga 304 dijawab tanpa menjalankan query apa pun.
+# Operasi massal (bulk_create/bulk_update/queryset.update) wajib memanggil
+# bump_version() sendiri.
+
+
+def _cache():
+    return caches[getattr(settings, 'MODEL_VERSION_CACHE', 'default')]
+
+
+def _key(model):
+    return f'model-version:{model._meta.label_lower}'
+
+
+def bump_version(*models):
+    """Tandai data model berubah; dijalankan setelah transaksi commit"""
+    def bump():
+        now = time.time_ns()
+        _cache().set_many({_key(model): now for model in models}, timeout=None)
+    transaction.on_commit(bump)
+
+
+def get_versions(models):
+    """Versi (timestamp ns) tiap model; model yang belum tercatat diberi versi sekarang"""
+    cache = _cache()
+    keys = [_key(model) for model in models]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        now = time.time_ns()
+        for key in missing:
+            cache.add(key, now, timeout=None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(key, 0) for key in keys]
+
+
+def cached_count(queryset, timeout=24 * 60 * 60):
+    """
+    COUNT(*) `queryset` yang disimpan di cache sampai versi modelnya berubah.
+    Model harus dilacak (track/conditional_on) atau operasi yang mengubahnya
+    memanggil bump_version(); jika tidak, jumlahnya bisa basi sampai `timeout`.
+    """
+    model = queryset.model
+    digest = hashlib.md5(str(queryset.query).encode(), usedforsecurity=False).hexdigest()
+    key = f'count:{model._meta.label_lower}:{digest}:{get_versions([model])[0]}'
+    count = _cache().get(key)
+    if count is None:
+        count = queryset.count()
+        _cache().set(key, count, timeout=timeout)
+    return count
+
+
+def _on_change(sender, raw=False, **kwargs):
+    if not raw:
+        bump_version(sender)
+
+
+def track(*models):
+    """Hubungkan signal simpan/hapus model ke registry (aman dipanggil berulang)"""
+    for model in models:
+        uid = f'model_version_{model._meta.label_lower}'
+        post_save.connect(_on_change, sender=model, dispatch_uid=f'{uid}_save')
+        post_delete.connect(_on_change, sender=model, dispatch_uid=f'{uid}_delete')
+
+
+# Penghalang cache jQuery: tidak memengaruhi isi respons sama sekali
+CACHE_BUSTER = '_'
+# Nilainya berganti tiap request DataTables, tapi ada/tidaknya tetap dihitung
+# (tanpa draw, DataTable mengirim semua baris)
+VOLATILE_PARAMS = ('draw',)
+
+
+def conditional_on(*models):
+    """
+    Decorator view JSON: ETag dari path + query + versi `models`, Last-Modified
+    dari versi terbaru. Klien yang mengirim If-None-Match/If-Modified-Since
+    yang masih cocok mendapat 304 tanpa view dijalankan.
+
+    Nilai parameter yang berganti di setiap request DataTables (`draw` dan
+    penghalang cache `_`) tidak ikut ETag; 304 membawa draw saat ini di header
+    X-DataTables-Draw (lihat conditionalAjax di base.html).
+    """
+    track(*models)
+
+    def versions(request):
+        # etag_func dan last_modified_func dipanggil terpisah: cukup satu baca cache
+        if not hasattr(request, '_model_versions'):
+            request._model_versions = {}
+        if models not in request._model_versions:
+            request._model_versions[models] = get_versions(models)
+        return request._model_versions[models]
+
+    def etag(request, *args, **kwargs):
+        query = sorted(
+            (key, [] if key in VOLATILE_PARAMS else values)
+            for key, values in request.GET.lists() if key != CACHE_BUSTER
+        )
+        raw = '|'.join([request.path, json.dumps(query), *map(str, versions(request))])
+        return hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        return datetime.datetime.fromtimestamp(max(versions(request)) / 1e9, tz=datetime.timezone.utc)
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if response.status_code == 304 and 'draw' in request.GET:
+                response['X-DataTables-Draw'] = request.GET['draw']
+            # Browser wajib revalidasi (bukan menebak masa segar dari Last-Modified)
+            patch_cache_control(response, no_cache=True, private=True)
+            return response
+        return wrapper
+    return decorator
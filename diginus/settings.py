@@ -119,9 +119,17 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Tunggu lock tulis worker lain alih-alih langsung gagal "database is locked"
+        'OPTIONS': {'timeout': 30},
+        # Database test berbasis file agar bisa diakses beberapa proses sekaligus
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# Penomoran surat: False = satu urutan per tahun untuk semua jenis surat,
+# True = urutan terpisah per tahun dan per jenis surat
+CORRESPONDENCE_NUMBER_PER_TYPE = False
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -173,6 +181,46 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Cache disk untuk template Word yang sudah dikompilasi (lihat administrasi/docx_engine.py)
+DOCX_TEMPLATE_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'docx_templates')
+
+# Jumlah proses untuk render DOCX massal (None = jumlah CPU)
+DOCX_RENDER_WORKERS = None
+
+# Konverter PDF untuk worker arsip surat (manage.py render_worker): dotted path ke
+# callable convert(docx_bytes, filename) -> pdf_bytes. None = hanya DOCX yang dibuat.
+# Contoh: 'administrasi.render_queue.libreoffice_pdf' (butuh soffice di server)
+CORRESPONDENCE_PDF_CONVERTER = None
+
+# PDF invoice (administrasi/invoice_render.py): dotted path ke callable
+# convert(html) -> pdf_bytes. Bawaan memakai xhtml2pdf.
+INVOICE_PDF_CONVERTER = 'administrasi.invoice_render.xhtml2pdf_pdf'
+
+# Cache. Versi model untuk ETag (diginus/model_versions.py) harus dibagi
+# semua proses web, jadi disimpan di cache file, bukan di memori proses.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # HTML invoice yang sudah dirender, dibagi semua proses web
+    'invoice_render': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'invoice_render'),
+    },
+    # Progres import program yang sedang berjalan (ditulis worker, dibaca web)
+    'import_progress': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'import_progress'),
+    },
+    'model_versions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'model_versions'),
+    },
+}
+MODEL_VERSION_CACHE = 'model_versions'
+INVOICE_RENDER_CACHE = 'invoice_render'
+PROGRAM_IMPORT_CACHE = 'import_progress'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class LandingpageConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'landingpage'
+
+    def ready(self):
+        # Versi model untuk ETag API projek (lihat diginus/model_versions.py)
+        from diginus.model_versions import track
+        from .models import ProjectDone
+        track(ProjectDone)
@@ -7,6 +7,7 @@ from .models import ProjectDone
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.decorators import login_required
+from diginus.model_versions import conditional_on
 
 def index(request):
     programs = Program.objects.all().order_by('-id')  # Ambil semua program
@@ -72,6 +73,7 @@ def project_delete(request, pk):
         return JsonResponse({'status': 'success', 'message': 'Projek berhasil dihapus'})
     return JsonResponse({'status': 'error', 'message': 'Permintaan tidak valid'}, status=400)
 
+@conditional_on(ProjectDone)
 def get_projects(request):
     """API untuk mengambil data projek (digunakan oleh tabel admin dan landing page)"""
     projects = ProjectDone.objects.all().order_by('order', '-created_at')
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ProgramConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'program'
+
+    def ready(self):
+        # Simpan/hapus Program mengganti versinya (juga dari command dan worker):
+        # jumlah total tabel yang di-cache ikut kedaluwarsa (lihat diginus/model_versions.py)
+        from diginus.model_versions import track
+        from .models import Program
+        track(Program)
@@ -0,0 +1,105 @@
+import datetime
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from administrasi.tabular import count_rows
+
+from .importer import import_programs
+from .models import ImportJob
+
+# Worker antrean import program (lihat ImportJob). Import berjalan dalam satu
+# transaksi (semua atau tidak sama sekali), jadi progres per potongan tidak
+# bisa ditulis ke baris ImportJob -- belum terlihat proses lain sebelum
+# commit. Progres sementara disimpan di cache bersama; hasil akhir ditulis
+# ke ImportJob setelah import selesai. Dengan alasan yang sama locked_at tidak
+# bisa diperbarui selama import berjalan: tanda hidup worker ('heartbeat')
+# ikut disimpan bersama progres di cache.
+
+# Job RUNNING tanpa tanda hidup selama ini dianggap ditinggal worker yang mati
+LOCK_TIMEOUT = datetime.timedelta(minutes=30)
+PROGRESS_TIMEOUT = 24 * 60 * 60
+PROGRESS_FIELDS = ('total_rows', 'read_rows', 'processed_rows', 'failed_rows')
+
+
+def _cache():
+    return caches[getattr(settings, 'PROGRAM_IMPORT_CACHE', 'default')]
+
+
+def _key(pk):
+    return f'program-import:{pk}'
+
+
+def with_live_progress(job):
+    """Lengkapi job yang sedang diproses dengan progres terakhir dari worker"""
+    if job.status == 'RUNNING':
+        live = _cache().get(_key(job.pk)) or {}
+        for field in PROGRESS_FIELDS:
+            if field in live:
+                setattr(job, field, live[field])
+    return job
+
+
+def requeue_stale(now=None):
+    """
+    Kembalikan job RUNNING milik worker yang mati ke antrean (import diulang
+    dari awal). Job yang masih mengirim tanda hidup tidak disentuh walaupun
+    sudah berjalan lebih lama dari LOCK_TIMEOUT.
+    """
+    cutoff = (now or timezone.now()) - LOCK_TIMEOUT
+    stale = ImportJob.objects.filter(status='RUNNING', locked_at__lt=cutoff)
+    alive = [
+        pk for pk in stale.values_list('pk', flat=True)
+        if (_cache().get(_key(pk)) or {}).get('heartbeat', cutoff) > cutoff
+    ]
+    return stale.exclude(pk__in=alive).update(status='PENDING', locked_by='', locked_at=None)
+
+
+def claim():
+    """Ambil satu job menunggu yang paling lama untuk worker ini"""
+    token, now = uuid.uuid4().hex, timezone.now()
+    oldest = ImportJob.objects.filter(status='PENDING').order_by('id').values('id')[:1]
+    ImportJob.objects.filter(pk__in=oldest, status='PENDING').update(status='RUNNING', locked_by=token, locked_at=now)
+    return ImportJob.objects.filter(locked_by=token, status='RUNNING').first()
+
+
+def run(job):
+    """Kerjakan satu job lalu simpan hasil akhirnya"""
+    def progress(report, rows_read):
+        job.read_rows, job.processed_rows, job.failed_rows = rows_read, report['total'], report['error_count']
+        live = {field: getattr(job, field) for field in PROGRESS_FIELDS}
+        _cache().set(_key(job.pk), {**live, 'heartbeat': timezone.now()}, PROGRESS_TIMEOUT)
+
+    try:
+        with job.file.open('rb') as fileobj:
+            job.total_rows = count_rows(fileobj, job.filename)
+            progress({'total': 0, 'error_count': 0}, 0)
+            report = import_programs(fileobj, job.filename, dry_run=job.dry_run, progress=progress)
+    except Exception as e:
+        job.status, job.message = 'FAILED', str(e)[:2000]
+    else:
+        job.status = 'DONE'
+        job.processed_rows, job.failed_rows = report['total'], report['error_count']
+        job.created_count, job.updated_count, job.errors = report['created'], report['updated'], report['errors']
+        if report['error_count']:
+            job.message = f"{report['error_count']} baris bermasalah" + ('' if job.dry_run else ', tidak ada data yang disimpan')
+        elif job.dry_run:
+            job.message = f"{report['valid']} baris valid"
+        else:
+            job.message = f"Import berhasil! {report['created']} program baru, {report['updated']} diperbarui"
+
+    # File sumber tidak diperlukan lagi setelah job selesai
+    job.file.delete(save=False)
+    job.file = ''
+    job.finished_at, job.locked_by, job.locked_at = timezone.now(), '', None
+    job.save()
+    _cache().delete(_key(job.pk))
+    return job
+
+
+def process_next():
+    """Proses satu job; None jika antrean kosong"""
+    job = claim()
+    return run(job) if job else None
@@ -0,0 +1,174 @@
+from decimal import Decimal
+
+import pandas as pd
+from django.db import connection, transaction
+
+from administrasi.tabular import CHUNK_SIZE, clean_amounts, parse_dates, read_chunks
+from diginus.model_versions import bump_version
+
+from .models import Program
+
+# Import program dari CSV/XLSX: file dibaca per potongan, setiap potongan
+# divalidasi per kolom dengan pandas, lalu disimpan dengan bulk_create /
+# UPDATE massal. Semua potongan ada dalam satu transaksi: jika ada baris yang
+# salah, tidak ada yang tersimpan. Program yang sudah ada (nama + jenis sama)
+# diperbarui, bukan diduplikasi; hanya kolom yang ada di file yang ditimpa.
+
+MAX_ERRORS = 1000
+
+DATE_FIELDS = ('pendaftaran_mulai', 'pendaftaran_tutup', 'pelaksanaan_mulai', 'pelaksanaan_selesai')
+UPDATE_FIELDS = ['nama', 'deskripsi', 'harga', 'jenis', 'level', *DATE_FIELDS]
+
+COLUMN_ALIASES = {
+    'nama': 'nama', 'nama program': 'nama', 'name': 'nama',
+    'deskripsi': 'deskripsi', 'description': 'deskripsi', 'keterangan': 'deskripsi',
+    'harga': 'harga', 'price': 'harga', 'biaya': 'harga',
+    'jenis': 'jenis', 'type': 'jenis',
+    'level': 'level',
+    **{name: name for name in DATE_FIELDS},
+    **{name.replace('_', ' '): name for name in DATE_FIELDS},
+}
+REQUIRED_COLUMNS = ('nama', 'harga', 'jenis')
+
+# Pilihan boleh ditulis dengan huruf apa pun ("courses", "ADVANCE")
+JENIS_LOOKUP = {code.upper(): code for code, _ in Program.JENIS_CHOICES}
+LEVEL_LOOKUP = {code.upper(): code for code, _ in Program.LEVEL_CHOICES}
+
+
+def natural_key(nama, jenis):
+    return ' '.join(nama.lower().split()), jenis
+
+
+def _text(column):
+    return column.fillna('').astype(str).str.strip()
+
+
+def validate_chunk(chunk, first_row):
+    """
+    Validasi satu potongan sekaligus (per kolom, bukan per baris).
+    Mengembalikan (daftar (nomor baris, Program), daftar error {row, errors}, jumlah baris berisi).
+    """
+    nama, deskripsi = _text(chunk['nama']), _text(chunk['deskripsi'])
+    jenis_text, level_text = _text(chunk['jenis']), _text(chunk['level'])
+    harga_text, harga = clean_amounts(chunk['harga'].fillna(''))
+    date_text = {field: _text(chunk[field]) for field in DATE_FIELDS}
+    dates = {field: parse_dates(chunk[field].fillna('')) for field in DATE_FIELDS}
+
+    blank = nama.eq('') & deskripsi.eq('') & harga_text.eq('') & jenis_text.eq('')
+    jenis = jenis_text.str.upper().map(JENIS_LOOKUP)
+    level = level_text.str.upper().map(LEVEL_LOOKUP)
+    courses = jenis.eq('Courses')
+
+    checks = [
+        (nama.eq(''), "Nama wajib diisi"),
+        (nama.str.len() > 255, "Nama maksimal 255 karakter"),
+        (jenis.isna(), f"Jenis tidak dikenal (pilihan: {', '.join(JENIS_LOOKUP.values())})"),
+        (courses & level_text.ne('') & level.isna(), f"Level tidak dikenal (pilihan: {', '.join(LEVEL_LOOKUP.values())})"),
+        (harga.isna() | harga.lt(0), "Harga tidak valid"),
+        (harga.ge(10 ** 10), "Harga terlalu besar"),
+        *[
+            (date_text[field].ne('') & dates[field].isna(), f"Tanggal {field.replace('_', ' ')} tidak valid")
+            for field in DATE_FIELDS
+        ],
+        (dates['pendaftaran_tutup'] < dates['pendaftaran_mulai'], "Pendaftaran tutup sebelum dibuka"),
+        (dates['pelaksanaan_selesai'] < dates['pelaksanaan_mulai'], "Pelaksanaan selesai sebelum dimulai"),
+    ]
+    invalid = pd.Series(False, index=chunk.index)
+    for mask, _ in checks:
+        invalid |= mask.fillna(True)
+    invalid &= ~blank
+
+    errors = []
+    for position in invalid.to_numpy().nonzero()[0]:
+        index = chunk.index[position]
+        errors.append({
+            'row': first_row + int(position),
+            'errors': [message for mask, message in checks if bool(mask.fillna(True).at[index])],
+        })
+
+    # Services tidak punya level (sama seperti Program.save)
+    level = level.where(courses)
+    valid = ~invalid & ~blank
+    columns = [nama, deskripsi, harga_text, jenis, level, *dates.values()]
+    programs = []
+    for position, values in zip(valid.to_numpy().nonzero()[0], zip(*(column[valid] for column in columns))):
+        nm, desc, hrg, jns, lvl, *days = values
+        programs.append((first_row + int(position), Program(
+            nama=nm, deskripsi=desc, harga=Decimal(hrg).quantize(Decimal('0.01')), jenis=jns,
+            level=None if pd.isna(lvl) else lvl,
+            **{field: None if pd.isna(day) else day.date() for field, day in zip(DATE_FIELDS, days)},
+        )))
+    return programs, errors, int((~blank).sum())
+
+
+def update_programs(programs, fields=UPDATE_FIELDS):
+    """
+    Simpan ulang `fields` program yang sudah ada: satu UPDATE berparameter lewat
+    executemany. bulk_update() membangun CASE per field per baris, yang untuk
+    ribuan baris jauh lebih lambat daripada query-nya sendiri.
+    """
+    fields = [Program._meta.get_field(name) for name in fields]
+    qn = connection.ops.quote_name
+    sql = (
+        f"UPDATE {qn(Program._meta.db_table)} SET {', '.join(f'{qn(field.column)} = %s' for field in fields)} "
+        f"WHERE {qn(Program._meta.pk.column)} = %s"
+    )
+    params = [
+        [field.get_db_prep_save(getattr(program, field.attname), connection) for field in fields] + [program.pk]
+        for program in programs
+    ]
+    if params:
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+
+
+def import_programs(fileobj, filename, chunk_size=CHUNK_SIZE, dry_run=False, progress=None):
+    """
+    Import program dari file CSV/XLSX. Baris bermasalah dilaporkan per nomor
+    baris (maksimal MAX_ERRORS rincian); jika ada satu saja, seluruh import
+    dibatalkan. dry_run=True hanya memvalidasi. `progress(report, rows_read)`
+    dipanggil setiap selesai satu potongan.
+    """
+    report = {'total': 0, 'valid': 0, 'created': 0, 'updated': 0, 'error_count': 0, 'errors': []}
+    existing = {}
+    for pk, nama, jenis in Program.objects.order_by('-id').values_list('id', 'nama', 'jenis'):
+        existing[natural_key(nama, jenis)] = pk
+    seen = {}
+    first_row = 2  # baris 1 = header
+
+    with transaction.atomic():
+        for chunk in read_chunks(fileobj, filename, COLUMN_ALIASES, REQUIRED_COLUMNS, chunk_size):
+            programs, errors, filled = validate_chunk(chunk, first_row)
+            first_row += len(chunk)
+
+            to_create, to_update = [], []
+            for row, program in programs:
+                key = natural_key(program.nama, program.jenis)
+                if key in seen:
+                    errors.append({'row': row, 'errors': [f"Program yang sama sudah ada di baris {seen[key]}"]})
+                    continue
+                seen[key] = row
+                program.pk = existing.get(key)
+                (to_update if program.pk else to_create).append(program)
+
+            report['total'] += filled
+            report['valid'] += len(to_create) + len(to_update)
+            report['error_count'] += len(errors)
+            report['errors'].extend(sorted(errors, key=lambda e: e['row'])[:MAX_ERRORS - len(report['errors'])])
+            if not dry_run and not report['error_count']:
+                Program.objects.bulk_create(to_create)
+                # Kolom yang tidak ada di file tidak ikut ditimpa nilai kosong
+                update_programs(to_update, [name for name in UPDATE_FIELDS if name in chunk.attrs['fields']])
+                report['created'] += len(to_create)
+                report['updated'] += len(to_update)
+            if progress:
+                progress(report, first_row - 2)
+
+        if report['error_count'] and not dry_run:
+            # Semua atau tidak sama sekali: potongan yang sudah tersimpan ikut dibatalkan
+            transaction.set_rollback(True)
+            report['created'] = report['updated'] = 0
+        elif report['created'] or report['updated']:
+            # Operasi massal tidak memicu signal: jumlah total tabel program di-cache per versi
+            bump_version(Program)
+    return report
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from program.import_jobs import process_next, requeue_stale
+
+
+class Command(BaseCommand):
+    help = "Worker antrean import program: proses file yang diunggah dari halaman program"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sleep', type=float, default=2.0, help="Jeda (detik) saat antrean kosong")
+        parser.add_argument('--once', action='store_true', help="Berhenti begitu antrean kosong")
+
+    def handle(self, *args, **options):
+        done = 0
+        while True:
+            requeue_stale()
+            job = process_next()
+            if job:
+                done += 1
+                self.stdout.write(f"{job.filename}: {job.get_status_display()} - {job.message}")
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f"Selesai: {done} import diproses"))
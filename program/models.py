@@ -42,3 +42,64 @@ class Program(models.Model):
     def __str__(self):
         return self.nama
 
+
+class ImportJob(models.Model):
+    """
+    Import program dari file besar yang dikerjakan di latar belakang oleh
+    `manage.py program_import_worker`. Request upload hanya menyimpan file
+    dan baris ini; halaman program memantau progresnya lewat endpoint status.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Menunggu'),
+        ('RUNNING', 'Diproses'),
+        ('DONE', 'Selesai'),
+        ('FAILED', 'Gagal'),
+    ]
+
+    file = models.FileField(upload_to='imports/program/')
+    filename = models.CharField(max_length=255)
+    dry_run = models.BooleanField(default=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+
+    # Progres; total_rows perkiraan dari ukuran file (None = belum/tidak diketahui)
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    read_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    failed_rows = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    message = models.TextField(blank=True)
+
+    locked_by = models.CharField(max_length=32, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'id'], name='importjob_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Import {self.filename} ({self.status})"
+
+    def as_progress(self):
+        remaining = None if self.total_rows is None else max(self.total_rows - self.read_rows, 0)
+        if self.status == 'DONE':
+            remaining = 0
+        return {
+            'id': self.pk,
+            'status': self.status,
+            'filename': self.filename,
+            'dry_run': self.dry_run,
+            'total': self.total_rows,
+            'processed': self.processed_rows,
+            'failed': self.failed_rows,
+            'remaining': remaining,
+            'created': self.created_count,
+            'updated': self.updated_count,
+            'message': self.message,
+            'errors': self.errors,
+        }
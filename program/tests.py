@@ -1,3 +1,191 @@
-from django.test import TestCase
+import csv
+import datetime
+import importlib.util
+import io
+import tempfile
+from decimal import Decimal
+from unittest import skipIf
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from diginus.model_versions import cached_count
+
+from . import import_jobs
+from .importer import import_programs
+from .models import ImportJob, Program
+
+
+def csv_upload(lines):
+    return SimpleUploadedFile('program.csv', '\n'.join(lines).encode(), content_type='text/csv')
+
+
+HEADER = 'nama,deskripsi,harga,jenis,level,pendaftaran_mulai,pendaftaran_tutup'
+
+
+@override_settings(PROGRAM_IMPORT_CACHE='default')
+class ProgramImportTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        media = override_settings(MEDIA_ROOT=self.tmp.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def upload(self, lines):
+        """Unggah lewat halaman, jalankan worker, lalu ambil status akhirnya"""
+        response = self.client.post(reverse('program:import'), {'import_file': csv_upload(lines)})
+        self.assertEqual((response.status_code, response.json()['status']), (202, 'PENDING'))
+        import_jobs.process_next()
+        return self.client.get(response.json()['status_url']).json()
+
+    def test_import_then_reimport_updates_by_natural_key(self):
+        job = self.upload([
+            HEADER,
+            'Kelas Django,Backend,"Rp 1.500.000",courses,basic,2026-01-05,31/01/2026',
+            'Pembuatan Website,Jasa,2500000,Services,Advance,,',
+        ])
+        self.assertEqual((job['status'], job['total'], job['processed'], job['remaining']), ('DONE', 2, 2, 0))
+        self.assertEqual((job['created'], job['updated']), (2, 0))
+        self.assertFalse(ImportJob.objects.get().file)
+        kelas = Program.objects.get(nama='Kelas Django')
+        self.assertEqual((kelas.harga, kelas.jenis, kelas.level), (Decimal('1500000.00'), 'Courses', 'Basic'))
+        self.assertEqual(kelas.pendaftaran_tutup, datetime.date(2026, 1, 31))
+        self.assertIsNone(Program.objects.get(nama='Pembuatan Website').level)
+
+        report = import_programs(csv_upload([HEADER, 'kelas  django,Backend,1750000,Courses,Intermediate,,']), 'program.csv')
+        self.assertEqual((report['created'], report['updated']), (0, 1))
+        kelas.refresh_from_db()
+        self.assertEqual((kelas.harga, kelas.level, kelas.pendaftaran_mulai), (Decimal('1750000.00'), 'Intermediate', None))
+        self.assertEqual(Program.objects.count(), 2)
+
+    def test_reimport_keeps_columns_missing_from_file(self):
+        import_programs(csv_upload([HEADER, 'Kelas Django,Backend,1500000,Courses,Basic,2026-01-05,2026-01-31']), 'program.csv')
+        report = import_programs(csv_upload(['nama,harga,jenis', 'Kelas Django,200,Courses']), 'program.csv')
+        self.assertEqual(report['updated'], 1)
+        kelas = Program.objects.get()
+        self.assertEqual(kelas.harga, Decimal('200.00'))
+        self.assertEqual((kelas.deskripsi, kelas.level), ('Backend', 'Basic'))
+        self.assertEqual((kelas.pendaftaran_mulai, kelas.pendaftaran_tutup), (datetime.date(2026, 1, 5), datetime.date(2026, 1, 31)))
+
+    def test_bad_rows_abort_whole_import(self):
+        rows = [HEADER] + [f'Program {i},-,100000,Courses,Basic,,' for i in range(5)] + [
+            ',-,abc,Kursus,Expert,2026-13-01,',
+            'Program 0,-,100000,Courses,,,',
+        ]
+        dry = import_programs(csv_upload(rows), 'program.csv', chunk_size=2, dry_run=True)
+        self.assertEqual((dry['total'], dry['valid'], dry['error_count']), (7, 5, 2))
+        self.assertEqual(dry['errors'][0]['row'], 7)
+        self.assertEqual(len(dry['errors'][0]['errors']), 4)
+        self.assertEqual(dry['errors'][1], {'row': 8, 'errors': ['Program yang sama sudah ada di baris 2']})
+
+        job = self.upload(rows)
+        self.assertEqual((job['status'], job['processed'], job['failed']), ('DONE', 7, 2))
+        self.assertFalse(Program.objects.exists())
+
+    def test_live_progress_and_stale_jobs(self):
+        job = ImportJob.objects.create(file=csv_upload([HEADER]), filename='program.csv')
+        self.assertEqual(import_jobs.claim().pk, job.pk)
+        self.assertIsNone(import_jobs.claim())
+
+        # Worker menulis progres ke cache selama transaksi import masih terbuka
+        import_jobs._cache().set(import_jobs._key(job.pk), {'total_rows': 10, 'read_rows': 4, 'processed_rows': 4, 'failed_rows': 1})
+        progress = self.client.get(reverse('program:import_status', args=[job.pk])).json()
+        self.assertEqual((progress['status'], progress['processed'], progress['failed'], progress['remaining']), ('RUNNING', 4, 1, 6))
+
+        # Import yang lama tapi masih mengirim tanda hidup tidak diantrekan ulang
+        ImportJob.objects.filter(pk=job.pk).update(locked_at=timezone.now() - import_jobs.LOCK_TIMEOUT * 2)
+        import_jobs._cache().set(import_jobs._key(job.pk), {'read_rows': 8, 'heartbeat': timezone.now()})
+        self.assertEqual(import_jobs.requeue_stale(), 0)
+
+        import_jobs._cache().set(import_jobs._key(job.pk), {'read_rows': 8, 'heartbeat': timezone.now() - import_jobs.LOCK_TIMEOUT * 2})
+        self.assertEqual(import_jobs.requeue_stale(), 1)
+        self.assertEqual(import_jobs.process_next().status, 'DONE')
+
+
+class ProgramExportTest(TestCase):
+    def test_streams_only_exported_columns(self):
+        Program.objects.create(nama='Kelas Django', deskripsi='Backend', harga=Decimal('1500000'), jenis='Courses', level='Basic')
+        Program.objects.create(nama='Website', deskripsi='Jasa', harga=Decimal('2500000'), jenis='Services', level='Advance')
+
+        response = self.client.get(reverse('program:export'), {'format': 'csv'})
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+        self.assertEqual(rows[0][:5], ['nama', 'deskripsi', 'harga', 'jenis', 'level'])
+        self.assertEqual(rows[1][:5], ['Kelas Django', 'Backend', '1500000.00', 'Courses', 'Basic'])
+        self.assertEqual(rows[2][4], '')
+
+        response = self.client.get(reverse('program:export'))
+        sheet = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True).active
+        self.assertEqual([row[0] for row in sheet.iter_rows(values_only=True)], ['nama', 'Kelas Django', 'Website'])
+
+
+    @skipIf(importlib.util.find_spec('pyarrow') is None, "pyarrow tidak terpasang")
+    def test_parquet_keeps_decimal_and_date_types(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        Program.objects.create(
+            nama='Kelas Django', deskripsi='Backend', harga=Decimal('1500000.50'), jenis='Courses', level='Basic',
+            pendaftaran_mulai=datetime.date(2026, 1, 5),
+        )
+        response = self.client.get(reverse('program:export'), {'format': 'parquet'})
+        self.assertEqual(response.status_code, 200)
+        table = pq.read_table(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(table.schema.field('harga').type, pa.decimal128(12, 2))
+        self.assertEqual(table.schema.field('pendaftaran_mulai').type, pa.date32())
+        row = table.to_pylist()[0]
+        self.assertEqual((row['harga'], row['pendaftaran_mulai'], row['pendaftaran_tutup']), (Decimal('1500000.50'), datetime.date(2026, 1, 5), None))
+
+
+@override_settings(MODEL_VERSION_CACHE='default')
+class ProgramDataTablesTest(TestCase):
+    def setUp(self):
+        # Versi model dan jumlah yang di-cache tidak boleh terbawa dari test lain
+        cache.clear()
+        for nama, jenis, harga in [('Django', 'Courses', 300), ('Flask', 'Courses', 100), ('Website', 'Services', 100), ('SEO', 'Services', 200)]:
+            Program.objects.create(nama=nama, deskripsi='-', harga=Decimal(harga), jenis=jenis, level='Basic')
+
+    def params(self, **extra):
+        params = {'draw': '1', 'start': '0', 'length': '2'}
+        for i, name in enumerate(['nama', 'jenis', 'harga', 'level', 'id']):
+            params[f'columns[{i}][data]'] = name
+        params.update(extra)
+        return params
+
+    def test_multi_column_order_and_counts(self):
+        url = reverse('program:datatables')
+        order = {'order[0][column]': '2', 'order[0][dir]': 'asc', 'order[1][column]': '0', 'order[1][dir]': 'desc'}
+        data = self.client.post(url, self.params(length='4', **order)).json()
+        self.assertEqual([r['nama'] for r in data['data']], ['Website', 'Flask', 'SEO', 'Django'])
+        self.assertEqual(data['data'][0]['level'], None)
+        self.assertNotIn('actions', data['data'][0])
+
+        data = self.client.post(url, self.params(**{'search[value]': 'services'})).json()
+        self.assertEqual((data['recordsTotal'], data['recordsFiltered']), (4, 2))
+
+        # Total tanpa filter di-cache: cukup COUNT hasil filter + data halaman
+        with self.assertNumQueries(3):
+            self.client.post(url, self.params(**{'search[value]': 'services'}))
+
+    def test_cached_total_follows_writes_outside_views(self):
+        # Signal versi dipasang di ProgramConfig.ready(), tidak bergantung pada URLconf
+        self.assertEqual(cached_count(Program.objects.all()), 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            Program.objects.create(nama='Odoo', deskripsi='-', harga=Decimal(100), jenis='Services')
+        self.assertEqual(cached_count(Program.objects.all()), 5)
+
+    def test_keyset_pages_follow_offset_pages(self):
+        url = reverse('program:datatables')
+        order = {'order[0][column]': '2', 'order[0][dir]': 'desc'}
+        first = self.client.post(url, self.params(keyset='1', **order)).json()
+        second = self.client.post(url, self.params(keyset='1', after=first['next'], **order)).json()
+        offset = self.client.post(url, self.params(start='2', **order)).json()
+        self.assertEqual([r['id'] for r in second['data']], [r['id'] for r in offset['data']])
+        self.assertEqual(len({r['id'] for r in first['data'] + second['data']}), 4)
+
+        response = self.client.post(url, self.params(after=first['next'], **{'order[0][column]': '0'}))
+        self.assertEqual(response.status_code, 400)
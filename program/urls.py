@@ -9,5 +9,6 @@ urlpatterns = [
     path('create-or-update/', views.create_or_update_program, name='create_or_update'),
     path('delete/', views.delete_program, name='delete'),
     path('import/', views.import_program, name='import'),
+    path('import/<int:pk>/', views.import_status, name='import_status'),
     path('export/', views.export_program, name='export'),
 ]
\ No newline at end of file
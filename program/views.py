@@ -1,85 +1,47 @@
-import pandas as pd
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.urls import reverse
+from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views import View
-from django.core.paginator import Paginator
-from django.db.models import Q
-from .models import Program
-from io import BytesIO
-from openpyxl import Workbook
-from html import escape
+from .models import ImportJob, Program
+from .importer import DATE_FIELDS
+from .import_jobs import with_live_progress
+from administrasi.datatables import Column, DataTable
+from administrasi.exports import CHUNK_SIZE, export_response
 import json
 
 def index(request):
     return render(request, 'program/index.html')
 
+PROGRAM_COLUMNS = {
+    'nama': Column('nama'),
+    'jenis': Column('jenis'),
+    'harga': Column('harga', searchable=False),
+    'level': Column('level'),
+}
+
+def _serialize_program(row):
+    # Data mentah saja; tombol dan format Rupiah dirender di browser
+    return {
+        'id': row['id'],
+        'nama': row['nama'],
+        'deskripsi': row['deskripsi'],
+        'harga': str(row['harga']),
+        'jenis': row['jenis'],
+        'level': row['level'] if row['jenis'] == 'Courses' else None,
+        **{name: row[name].isoformat() if row[name] else None for name in DATE_FIELDS},
+    }
+
 class ProgramDataTablesView(View):
+    """Server-side DataTables: cari, sort multi-kolom, dan paging (offset atau keyset) di database"""
+
     def post(self, request, *args, **kwargs):
-        draw = int(request.POST.get('draw', 1))
-        start = int(request.POST.get('start', 0))
-        length = int(request.POST.get('length', 10))
-        search_value = request.POST.get('search[value]', '')
-
-        programs = Program.objects.all()
-
-        if search_value:
-            programs = programs.filter(
-                Q(nama__icontains=search_value) |
-                Q(jenis__icontains=search_value) |
-                Q(level__icontains=search_value)
-            )
-
-        total_records = programs.count()
-
-        # Pagination
-        paginator = Paginator(programs, length)
-        page_number = start // length + 1
-        page_obj = paginator.get_page(page_number)
-
-        data = []
-        for obj in page_obj:
-            # Escape teks
-            nama_attr = escape(str(obj.nama))
-            deskripsi_attr = escape(str(obj.deskripsi or ''))
-            
-            # Format tanggal (aman untuk string)
-            pendaftaran_mulai_str = obj.pendaftaran_mulai.isoformat() if obj.pendaftaran_mulai else ''
-            pendaftaran_tutup_str = obj.pendaftaran_tutup.isoformat() if obj.pendaftaran_tutup else ''
-            pelaksanaan_mulai_str = obj.pelaksanaan_mulai.isoformat() if obj.pelaksanaan_mulai else ''
-            pelaksanaan_selesai_str = obj.pelaksanaan_selesai.isoformat() if obj.pelaksanaan_selesai else ''
-
-            # Build actions string (gunakan f-string dengan variabel yang sudah dihitung)
-            actions = (
-                f'<button class="btn-edit bg-yellow-500 text-white px-2 py-1 rounded text-xs mr-1" '
-                f'data-id="{obj.id}" '
-                f'data-nama="{nama_attr}" '
-                f'data-deskripsi="{deskripsi_attr}" '
-                f'data-harga="{obj.harga}" '
-                f'data-jenis="{obj.jenis}" '
-                f'data-level="{obj.level or ""}" '
-                f'data-pendaftaran_mulai="{pendaftaran_mulai_str}" '
-                f'data-pendaftaran_tutup="{pendaftaran_tutup_str}" '
-                f'data-pelaksanaan_mulai="{pelaksanaan_mulai_str}" '
-                f'data-pelaksanaan_selesai="{pelaksanaan_selesai_str}" '
-                f'>Edit</button>'
-                f'<button class="btn-delete bg-red-500 text-white px-2 py-1 rounded text-xs" data-id="{obj.id}">Hapus</button>'
-            )
-        
-            data.append({
-                "nama": obj.nama,
-                "jenis": obj.jenis,
-                "harga": f"Rp {obj.harga:,.0f}",
-                "level": obj.get_level_display() if obj.jenis == 'Courses' else '-',
-                "actions": actions
-            })
-        return JsonResponse({
-            "draw": draw,
-            "recordsTotal": total_records,
-            "recordsFiltered": total_records,
-            "data": data
-        })
+        table = DataTable(
+            Program.objects.all(), PROGRAM_COLUMNS, default_order=['-id'],
+            extra_fields=['id', 'deskripsi', *DATE_FIELDS], cache_total=True,
+        )
+        return table.response(request, _serialize_program)
 
 @csrf_exempt
 def create_or_update_program(request):
@@ -124,62 +86,55 @@ def delete_program(request):
 
 @csrf_exempt
 def import_program(request):
+    """
+    Simpan file import (field 'import_file') sebagai ImportJob lalu langsung
+    kembali; worker memprosesnya dan halaman memantau lewat import_status.
+    dry_run=1 hanya memvalidasi.
+    """
     if request.method != 'POST' or 'import_file' not in request.FILES:
         return JsonResponse({'error': 'File tidak ditemukan'}, status=400)
 
     file = request.FILES['import_file']
-    ext = file.name.split('.')[-1].lower()
-
-    try:
-        if ext in ['xlsx', 'xls']:
-            df = pd.read_excel(file, engine='openpyxl' if ext == 'xlsx' else 'xlrd')
-        elif ext == 'csv':
-            df = pd.read_csv(file)
-        else:
-            return JsonResponse({'error': 'Format tidak didukung'}, status=400)
-
-        for _, row in df.iterrows():
-            Program.objects.create(
-                nama=row.get('nama', ''),
-                deskripsi=row.get('deskripsi', ''),
-                harga=row.get('harga', 0),
-                jenis=row.get('jenis', 'Courses'),
-                level=row.get('level') if row.get('jenis') == 'Courses' else None,
-                pendaftaran_mulai=row.get('pendaftaran_mulai'),
-                pendaftaran_tutup=row.get('pendaftaran_tutup'),
-                pelaksanaan_mulai=row.get('pelaksanaan_mulai'),
-                pelaksanaan_selesai=row.get('pelaksanaan_selesai'),
-            )
-        return JsonResponse({'message': 'Import berhasil!'})
-    except Exception as e:
-        return JsonResponse({'error': str(e)}, status=400)
+    if file.name.rsplit('.', 1)[-1].lower() not in ('csv', 'xlsx'):
+        return JsonResponse({'error': 'Format tidak didukung (gunakan .csv atau .xlsx)'}, status=400)
+
+    job = ImportJob.objects.create(file=file, filename=file.name, dry_run=request.POST.get('dry_run') in ('1', 'true'))
+    return JsonResponse({
+        'message': 'File diterima, import diproses di latar belakang',
+        'status_url': reverse('program:import_status', args=[job.pk]),
+        **job.as_progress(),
+    }, status=202)
+
+def import_status(request, pk):
+    job = with_live_progress(get_object_or_404(ImportJob, pk=pk))
+    return JsonResponse(job.as_progress())
+
+PROGRAM_HEADERS = [
+    'nama', 'deskripsi', 'harga', 'jenis', 'level',
+    'pendaftaran_mulai', 'pendaftaran_tutup', 'pelaksanaan_mulai', 'pelaksanaan_selesai',
+]
+
+def program_records():
+    # Hanya kolom yang diekspor, dibaca per potongan (memori tetap walau katalog besar)
+    rows = Program.objects.order_by('id').values_list(*PROGRAM_HEADERS)
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        record = dict(zip(PROGRAM_HEADERS, row))
+        if record['jenis'] != 'Courses':
+            record['level'] = None
+        yield record
+
+def program_parquet_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ('nama', pa.string()), ('deskripsi', pa.string()), ('harga', pa.decimal128(12, 2)),
+        ('jenis', pa.string()), ('level', pa.string()),
+        *[(name, pa.date32()) for name in PROGRAM_HEADERS[5:]],
+    ])
 
 def export_program(request):
-    programs = Program.objects.all()
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Program"
-
-    headers = ['nama', 'deskripsi', 'harga', 'jenis', 'level', 'pendaftaran_mulai', 'pendaftaran_tutup', 'pelaksanaan_mulai', 'pelaksanaan_selesai']
-    ws.append(headers)
-
-    for p in programs:
-        ws.append([
-            p.nama,
-            p.deskripsi,
-            float(p.harga),
-            p.jenis,
-            p.level if p.jenis == 'Courses' else '',
-            p.pendaftaran_mulai,
-            p.pendaftaran_tutup,
-            p.pelaksanaan_mulai,
-            p.pelaksanaan_selesai,
-        ])
-
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-
-    response = HttpResponse(buffer, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=program_export.xlsx'
-    return response
\ No newline at end of file
+    """Ekspor katalog program secara streaming (?format=xlsx|csv|jsonl|parquet, bawaan xlsx)"""
+    return export_response(
+        request.GET.get('format', 'xlsx'), 'program_export', 'Program', PROGRAM_HEADERS, program_records(),
+        parquet_schema=program_parquet_schema,
+    )